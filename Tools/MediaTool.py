@@ -5,18 +5,49 @@ Split a large video into multiple playable chunks that stay under a target size.
 The tool provides both a simple CLI prompt and a Tkinter GUI (when available).
 It requires FFmpeg/ffprobe on PATH because the heavy lifting is done by FFmpeg's
 segment muxer.
+
+ffprobe results are cached on disk (keyed by path, size and mtime) under
+``$XDG_CACHE_HOME/mm-media-tool``; set ``MM_PROBE_CACHE`` to another file path,
+or to ``off`` to disable the cache. Packet indexes used by the split planner
+are stored next to it in ``index/`` (override with ``MM_PACKET_INDEX``).
 """
 from __future__ import annotations
 
 import argparse
+import asyncio
+import atexit
+import bisect
+import csv
+import email.utils
+import fnmatch
+import hashlib
+import io
+import itertools
 import json
 import math
+import mmap
+import os
 import pathlib
-import subprocess
+import re
+import shutil
+import struct
 import sys
+import tempfile
 import threading
 import time
-from typing import Callable, Optional
+import urllib.parse
+import urllib.request
+from array import array
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Collection, Iterable, Iterator, Optional, TextIO
+
+try:  # pragma: no cover - only available on Unix
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore
 
 try:  # pragma: no cover - GUI is optional and not always available
     import tkinter as tk
@@ -40,6 +71,92 @@ SUPPORTED_VIDEO_SUFFIXES = {
 
 MAX_SEGMENT_OVERSHOOT_RATIO = 1.05  # Allow up to 5% container overhead.
 
+SPLIT_PLAN_FILL_RATIO = 0.98  # Leave headroom for per-part container headers.
+
+CHUNKED_ENCODE_MIN_SECONDS = 600.0  # Shorter files finish sooner as one encode.
+CHUNK_DURATION_TOLERANCE = 0.5  # Seconds of drift allowed after joining chunks.
+
+PROBE_CACHE_VERSION = 1
+PROBE_CACHE_MAX_ENTRIES = 20_000  # Roughly 10 MB of JSON for typical anime MKVs.
+
+FINGERPRINT_SAMPLE_BYTES = 1024 * 1024  # Hash this much from the head and the tail.
+PACKET_INDEX_MAGIC = b"MMIDX002"  # 002: packets stored in pts order.
+# magic, fingerprint, packet count, start time, video stream index; 48 bytes so
+# the little-endian pts/size/stream/keyframe columns that follow stay aligned.
+PACKET_INDEX_HEADER = struct.Struct("<8s16sQdi4x")
+
+# Sample-entry fourccs and Matroska CodecIDs mapped to ffprobe codec names.
+# Anything missing here makes the native header reader defer to ffprobe.
+MP4_SAMPLE_CODECS = {
+    b"avc1": "h264",
+    b"avc3": "h264",
+    b"hvc1": "hevc",
+    b"hev1": "hevc",
+    b"av01": "av1",
+    b"vp09": "vp9",
+    b"ac-3": "ac3",
+    b"ec-3": "eac3",
+    b"Opus": "opus",
+    b"fLaC": "flac",
+    b"tx3g": "mov_text",
+    b"wvtt": "webvtt",
+}
+MP4_HANDLER_TYPES = {b"vide": "video", b"soun": "audio", b"subt": "subtitle", b"text": "subtitle", b"sbtl": "subtitle"}
+MATROSKA_CODECS = {
+    "V_MPEG4/ISO/AVC": "h264",
+    "V_MPEGH/ISO/HEVC": "hevc",
+    "V_AV1": "av1",
+    "V_VP8": "vp8",
+    "V_VP9": "vp9",
+    "A_AAC": "aac",
+    "A_OPUS": "opus",
+    "A_VORBIS": "vorbis",
+    "A_AC3": "ac3",
+    "A_EAC3": "eac3",
+    "A_FLAC": "flac",
+    "A_MPEG/L3": "mp3",
+    "S_TEXT/UTF8": "subrip",
+    "S_TEXT/ASS": "ass",
+    "S_TEXT/SSA": "ssa",
+    "S_TEXT/WEBVTT": "webvtt",
+    "S_HDMV/PGS": "hdmv_pgs_subtitle",
+    "S_VOBSUB": "dvd_subtitle",
+}
+MATROSKA_TRACK_TYPES = {1: "video", 2: "audio", 17: "subtitle"}
+
+
+FFMPEG_STDERR_TAIL_LINES = 200  # Lines kept in memory; the rest only go to the spill file.
+FFMPEG_LOG_REPEAT_LIMIT = 5  # Lines of one message class streamed to the log before counting only.
+FFMPEG_SPILL_MAX_BYTES = 16 * 1024 * 1024  # Per spill file; later lines are only counted.
+FFMPEG_SPILL_KEEP = 20  # Newest spill files kept in the cache; older ones are pruned.
+FFMPEG_SPILL_MAX_AGE = 7 * 24 * 3600.0  # Seconds a spill file is kept at most.
+FFMPEG_STALL_SECONDS = 120.0  # Kill ffmpeg when out_time has not advanced for this long.
+# Input options for the one retry after a stall: drop damaged packets instead of waiting on them.
+TOLERANT_INPUT_ARGS = ("-fflags", "+discardcorrupt+genpts", "-err_detect", "ignore_err")
+STDERR_CLASS_PATTERN = re.compile(r"0x[0-9a-fA-F]+|\d+(?:\.\d+)?")
+
+REMOTE_SCHEMES = {"http", "https"}
+REMOTE_TIMEOUT = 30.0  # Seconds an HTTP request may sit idle before it fails.
+REMOTE_READ_BLOCK = 64 * 1024  # Smallest range fetched while hopping between headers.
+REMOTE_HEADER_BYTES = 1024 * 1024  # Matroska Info/Tracks sit well inside the first MiB.
+REMOTE_MOOV_LIMIT = 64 * 1024 * 1024  # Larger moov boxes are left to ffprobe.
+REMOTE_PROBE_BYTES = 2 * 1024 * 1024  # ffprobe probesize for URLs; its default reads 5 MB.
+# Input options placed before every URL: ride out dropped connections and
+# resets instead of failing the job, and keep one connection across seeks.
+REMOTE_INPUT_ARGS = (
+    "-reconnect",
+    "1",
+    "-reconnect_streamed",
+    "1",
+    "-reconnect_on_network_error",
+    "1",
+    "-reconnect_delay_max",
+    "30",
+    "-multiple_requests",
+    "1",
+    "-rw_timeout",
+    str(int(REMOTE_TIMEOUT * 1_000_000)),
+)
 
 DEFAULT_SUPPRESS_TOKENS: tuple[str, ...] = (
     "Past duration",  # benign timestamp jitter that FFmpeg recovers from
@@ -59,73 +176,1059 @@ def format_timespan(seconds: float) -> str:
     return f"{minutes:d}:{secs:02d}"
 
 
-def run_ffprobe_duration(video: pathlib.Path) -> float:
-    """Return the media duration in seconds using ffprobe."""
-    cmd = [
-        "ffprobe",
-        "-v",
-        "error",
-        "-show_entries",
-        "format=duration",
-        "-of",
-        "default=noprint_wrappers=1:nokey=1",
-        str(video),
-    ]
+def _stall_fields(exc: BaseException) -> dict[str, object]:
+    """``out_time``/``timeout``/``attempts`` of the stall behind ``exc``, if one caused it."""
+    seen: set[int] = set()
+    cause: Optional[BaseException] = exc
+    while cause is not None and id(cause) not in seen:
+        if isinstance(cause, FFmpegStalled):
+            return {
+                "stalled": True,
+                "out_time": round(cause.out_time, 3),
+                "timeout": cause.timeout,
+                "attempts": cause.attempts,
+            }
+        seen.add(id(cause))
+        cause = cause.__cause__ or cause.__context__
+    return {}
+
+
+def _failure_reason(error: BaseException) -> str:
+    """One-line reason for batch summaries; keeps the stall details when a stall was wrapped."""
+    reason = str(error) or error.__class__.__name__
+    stall = _stall_fields(error)
+    if stall and not isinstance(error, FFmpegStalled):
+        reason += (
+            f" (ffmpeg stalled at {format_timespan(stall['out_time'])} after {stall['attempts']} attempt(s), "
+            f"{stall['timeout']:.0f}s timeout)"
+        )
+    return reason
+
+
+class EventStream:
+    """
+    Typed JSON-lines events (``job_start``, ``progress``, ``warning``,
+    ``segment``, ``job_end``, ``log``) for orchestration tools. Disabled until
+    ``open`` is called, which ``--events jsonl`` does for stdout. Events are
+    tagged with the job running on the emitting thread.
+    """
+
+    def __init__(self) -> None:
+        self._stream: Optional[TextIO] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._job_ids = itertools.count(1)
+
+    @property
+    def enabled(self) -> bool:
+        return self._stream is not None
+
+    def open(self, stream: TextIO) -> None:
+        self._stream = stream
+
+    def current_job(self) -> Optional[int]:
+        return getattr(self._local, "job", None)
+
+    def emit(self, event: str, *, job: Optional[int] = None, **fields: object) -> None:
+        if self._stream is None:
+            return
+        record: dict[str, object] = {"event": event, "time": round(time.time(), 3)}
+        job = job if job is not None else self.current_job()
+        if job is not None:
+            record["job"] = job
+        record.update(fields)
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._stream.write(line + "\n")
+            self._stream.flush()
+
+    def log(self, message: str) -> None:
+        """Status callback that turns human log lines into ``log``/``warning`` events."""
+        is_warning = message.startswith("Warning") or ": Warning" in message
+        self.emit("warning" if is_warning else "log", message=message)
+
+    @contextmanager
+    def job(self, kind: str, source: pathlib.Path, **fields: object) -> Iterator[int]:
+        """Emit ``job_start``/``job_end`` around a block and tag events raised inside it."""
+        job_id = next(self._job_ids)
+        previous = self.current_job()
+        self._local.job = job_id
+        started_at = time.time()
+        self.emit("job_start", kind=kind, input=str(source), **fields)
+        try:
+            yield job_id
+        except BaseException as exc:
+            self.emit(
+                "job_end",
+                status="failed",
+                error=str(exc) or exc.__class__.__name__,
+                elapsed=round(time.time() - started_at, 3),
+                **_stall_fields(exc),
+            )
+            raise
+        else:
+            self.emit("job_end", status="ok", elapsed=round(time.time() - started_at, 3))
+        finally:
+            self._local.job = previous
+
+    def run_job(self, kind: str, source: pathlib.Path, fn: Callable[..., object], *args: object) -> object:
+        """Call ``fn(*args)`` inside ``job``; convenient as a ``BatchScheduler.submit`` target."""
+        with self.job(kind, source):
+            return fn(*args)
+
+
+EVENTS = EventStream()
+
+PROCESS_LINE_LIMIT = 1024 * 1024  # Longest pipe line handed to a callback.
+PROCESS_READ_CHUNK = 64 * 1024  # Pipe bytes read per wakeup; their lines go to a callback in one batch.
+
+
+@dataclass
+class ProcessResult:
+    returncode: int
+    stop_reason: Optional[str] = None
+    stdout: str = ""
+
+
+class ProcessEngine:
+    """
+    Run ffmpeg/ffprobe processes from one background asyncio loop. Pipes are
+    read without blocking; each chunk's complete lines are handed to the
+    per-line callback as one batch on a small consumer pool, so spill files,
+    event output or packet parsing for one job never hold up the pipes of
+    another, while a slow callback still throttles its own child through the
+    pipe. At most ``max_processes`` children of each program run at once
+    (ffprobe has its own slots, so a probe never queues behind long
+    encodes); further requests wait for a slot and ``on_start`` fires once
+    the child is actually spawned. ``run`` is the blocking wrapper used by
+    the CLI, GUI and batch workers; interrupting it (or ``cancel_all``)
+    terminates the child.
+    """
+
+    def __init__(self, max_processes: Optional[int] = None) -> None:
+        self.max_processes = max_processes or max(4, os.cpu_count() or 4)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: dict[str, asyncio.Semaphore] = {}
+        self._consumers = ThreadPoolExecutor(max_workers=2 * self.max_processes, thread_name_prefix="mm-pipe")
+        self._running: set[asyncio.subprocess.Process] = set()
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="mm-process-loop", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def run_async(
+        self,
+        cmd: list[str],
+        *,
+        stdout_line: Optional[Callable[[str], None]] = None,
+        stderr_line: Optional[Callable[[str], None]] = None,
+        check_stop: Optional[Callable[[], Optional[str]]] = None,
+        capture_stdout: bool = False,
+        poll_interval: float = 0.5,
+        on_start: Optional[Callable[[], None]] = None,
+    ) -> ProcessResult:
+        """
+        Run ``cmd``; ``check_stop`` is polled on the consumer pool every
+        ``poll_interval`` and may return a reason to stop. ``on_start`` is called on the loop thread
+        right after the child is spawned, once it has left the slot queue.
+        """
+        program = pathlib.Path(cmd[0]).name
+        slots = self._slots.get(program)
+        if slots is None:
+            slots = self._slots[program] = asyncio.Semaphore(self.max_processes)
+        loop = asyncio.get_running_loop()
+        async with slots:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE if stderr_line else asyncio.subprocess.DEVNULL,
+                limit=PROCESS_LINE_LIMIT,
+            )
+            self._running.add(process)
+            if on_start is not None:
+                on_start()
+            captured: list[str] = []
+
+            def deliver(callback: Callable[[str], None], lines: list[bytes]) -> None:
+                for raw in lines:
+                    callback(raw.decode("utf-8", "replace"))
+
+            async def pump(stream: Optional[asyncio.StreamReader], callback: Callable[[str], None]) -> None:
+                if stream is None:
+                    return
+                buffered = b""
+                skipping = False  # Inside a line longer than PROCESS_LINE_LIMIT, which is dropped.
+                while True:
+                    chunk = await stream.read(PROCESS_READ_CHUNK)
+                    if not chunk:
+                        if buffered and not skipping:
+                            await loop.run_in_executor(self._consumers, deliver, callback, [buffered])
+                        return
+                    lines = (buffered + chunk).split(b"\n")
+                    buffered = lines.pop()
+                    if skipping:
+                        if lines:
+                            lines.pop(0)
+                            skipping = False
+                        else:
+                            buffered = b""
+                    if len(buffered) > PROCESS_LINE_LIMIT:
+                        buffered = b""
+                        skipping = True
+                    if lines:
+                        await loop.run_in_executor(self._consumers, deliver, callback, lines)
+
+            async def slurp(stream: Optional[asyncio.StreamReader]) -> None:
+                if stream is not None:
+                    captured.append((await stream.read()).decode("utf-8", "replace"))
+
+            readers = asyncio.gather(
+                slurp(process.stdout) if capture_stdout else pump(process.stdout, stdout_line or (lambda _line: None)),
+                pump(process.stderr, stderr_line or (lambda _line: None)),
+            )
+            stop_reason: Optional[str] = None
+            try:
+                while True:
+                    done, _pending = await asyncio.wait({readers}, timeout=poll_interval)
+                    if done:
+                        readers.result()
+                        break
+                    if check_stop is not None and stop_reason is None:
+                        # Stop checks may stat files or read segment lists; keep them off the loop thread.
+                        stop_reason = await loop.run_in_executor(self._consumers, check_stop)
+                        if stop_reason:
+                            await self._stop(process)
+                returncode = await process.wait()
+            except BaseException:
+                readers.cancel()
+                await self._stop(process)
+                raise
+            finally:
+                self._running.discard(process)
+            return ProcessResult(returncode, stop_reason, "".join(captured))
+
+    @staticmethod
+    async def _stop(process: asyncio.subprocess.Process) -> None:
+        if process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), 5)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    def run(self, cmd: list[str], **kwargs: object) -> ProcessResult:
+        """Blocking wrapper around ``run_async`` for synchronous callers."""
+        future = asyncio.run_coroutine_threadsafe(self.run_async(cmd, **kwargs), self._ensure_loop())  # type: ignore[arg-type]
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    def cancel_all(self) -> None:
+        """Terminate every running child and wait for them; their ``run`` calls return with the exit status."""
+        loop = self._loop
+        if loop is None or not self._running:
+            return
+
+        async def stop_all() -> None:
+            await asyncio.gather(*(self._stop(process) for process in list(self._running)), return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(stop_all(), loop).result(timeout=15)
+        except Exception:  # noqa: BLE001
+            pass
+
+
+ENGINE = ProcessEngine()
+
+
+def is_remote_url(text: str) -> bool:
+    """True for http(s) URLs, which ffprobe and ffmpeg read directly."""
+    parts = urllib.parse.urlsplit(text)
+    return parts.scheme.lower() in REMOTE_SCHEMES and bool(parts.netloc)
+
+
+def _fetch_range(url: str, start: int, end: int) -> tuple[bytes, email.message.Message]:
+    """
+    Return bytes ``start``..``end`` (inclusive) of ``url`` and the response
+    headers. Raises OSError when the server ignores the range instead of
+    sending the whole body.
+    """
+    request = urllib.request.Request(url, headers={"Range": f"bytes={start}-{end}", "Accept-Encoding": "identity"})
+    with urllib.request.urlopen(request, timeout=REMOTE_TIMEOUT) as response:
+        if response.status != 206:
+            raise OSError(f"{url} does not answer range requests (HTTP {response.status}).")
+        return response.read(end - start + 1), response.headers
+
+
+@dataclass(frozen=True)
+class RemoteStat:
+    """The ``os.stat_result`` fields the pipeline reads, taken from HTTP response headers."""
+
+    st_size: int
+    st_mtime_ns: int
+
+
+def _remote_stat(url: str) -> RemoteStat:
+    _data, headers = _fetch_range(url, 0, 0)
+    match = re.fullmatch(r"bytes\s+\d+-\d+/(\d+)", (headers.get("Content-Range") or "").strip())
+    if match is None:
+        raise OSError(f"{url} did not report its size.")
+    # Servers without Last-Modified are recognised by size alone.
+    modified = email.utils.parsedate_tz(headers.get("Last-Modified") or "")
+    mtime_ns = email.utils.mktime_tz(modified) * 1_000_000_000 if modified else 0
+    return RemoteStat(int(match.group(1)), mtime_ns)
+
+
+class _RangeReader(io.RawIOBase):
+    """Seekable raw stream over a URL; each ``readinto`` is one range request."""
+
+    def __init__(self, url: str, size: int) -> None:
+        super().__init__()
+        self.url = url
+        self.size = size
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+
+    def readinto(self, buffer: memoryview) -> int:  # type: ignore[override]
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+        data, _headers = _fetch_range(self.url, self.position, self.position + length - 1)
+        buffer[: len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+@dataclass(frozen=True, order=True)
+class RemoteMedia:
+    """
+    An http(s) source that ffprobe and ffmpeg read in place. It stands in for
+    a local source's ``pathlib.Path`` where the pipeline only needs a name,
+    a size and random access: ``stat`` comes from a one-byte range request
+    and ``open`` fetches byte ranges on demand, so fingerprints and header
+    probes never download the file. Outputs always go to local disk.
+    """
+
+    url: str
+    _stat: list = field(default_factory=list, compare=False, repr=False)
+
+    def __str__(self) -> str:
+        return self.url
+
+    @property
+    def name(self) -> str:
+        parts = urllib.parse.urlsplit(self.url)
+        name = urllib.parse.unquote(parts.path.rstrip("/").rsplit("/", 1)[-1])
+        return name.replace("/", "_").replace(os.sep, "_") or parts.hostname or "remote"
+
+    @property
+    def stem(self) -> str:
+        return pathlib.PurePosixPath(self.name).stem
+
+    @property
+    def suffix(self) -> str:
+        return pathlib.PurePosixPath(self.name).suffix
+
+    def resolve(self) -> "RemoteMedia":
+        return self
+
+    def stat(self) -> RemoteStat:
+        # Fetched once per run so every caller sees the size the job started with.
+        if not self._stat:
+            self._stat.append(_remote_stat(self.url))
+        return self._stat[0]
+
+    def open(self, mode: str = "rb") -> BinaryIO:
+        if mode != "rb":
+            raise ValueError(f"{self.url} can only be opened for binary reading.")
+        return io.BufferedReader(_RangeReader(self.url, self.stat().st_size), REMOTE_READ_BLOCK)  # type: ignore[return-value]
+
+
+def media_source(text: str) -> pathlib.Path | RemoteMedia:
+    """Parse a ``--video`` value: http(s) URLs stay remote, anything else is a local path."""
+    return RemoteMedia(text) if is_remote_url(text) else pathlib.Path(text).expanduser()
+
+
+def with_remote_input(cmd: list[str]) -> list[str]:
+    """Insert ``REMOTE_INPUT_ARGS`` before each http(s) input of an ffmpeg or ffprobe command."""
+    result: list[str] = []
+    for arg in cmd:
+        if is_remote_url(arg):
+            position = len(result) - 1 if result and result[-1] == "-i" else len(result)
+            result[position:position] = REMOTE_INPUT_ARGS
+        result.append(arg)
+    return result
+
+
+@dataclass
+class MediaProbe:
+    """Container, stream and bitrate details gathered by a single ffprobe call."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    duration: float
+    format: dict[str, object]
+    streams: list[dict[str, object]]
+
+    @property
+    def format_bit_rate(self) -> Optional[int]:
+        return _parse_bit_rate(self.format.get("bit_rate"))
+
+    @property
+    def video_bit_rate(self) -> Optional[int]:
+        """Bitrate of the first video stream, falling back to the container bitrate."""
+        for stream in self.streams:
+            if stream.get("codec_type") == "video":
+                bit_rate = _parse_bit_rate(stream.get("bit_rate"))
+                if bit_rate:
+                    return bit_rate
+                break
+        return self.format_bit_rate
+
+    def to_json(self) -> dict[str, object]:
+        return {
+            "path": self.path,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "duration": self.duration,
+            "format": self.format,
+            "streams": self.streams,
+        }
+
+    @classmethod
+    def from_json(cls, payload: dict[str, object]) -> "MediaProbe":
+        return cls(
+            path=str(payload["path"]),
+            size=int(payload["size"]),  # type: ignore[arg-type]
+            mtime_ns=int(payload["mtime_ns"]),  # type: ignore[arg-type]
+            duration=float(payload["duration"]),  # type: ignore[arg-type]
+            format=dict(payload.get("format") or {}),  # type: ignore[arg-type]
+            streams=list(payload.get("streams") or []),  # type: ignore[arg-type]
+        )
+
+
+def _parse_bit_rate(raw: object) -> Optional[int]:
+    if raw in (None, "", "N/A"):
+        return None
     try:
-        raw = subprocess.check_output(cmd, text=True).strip()
-    except FileNotFoundError as exc:  # pragma: no cover - handled elsewhere
-        raise RuntimeError("ffprobe not found on PATH.") from exc
-    except subprocess.CalledProcessError as exc:
-        raise RuntimeError(f"ffprobe failed to read duration: {exc}") from exc
+        value = int(float(raw))  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def _cache_root() -> pathlib.Path:
+    base = os.environ.get("XDG_CACHE_HOME", "").strip()
+    cache_root = pathlib.Path(base).expanduser() if base else pathlib.Path.home() / ".cache"
+    return cache_root / "mm-media-tool"
+
+
+def default_probe_cache_path() -> Optional[pathlib.Path]:
+    """Return the on-disk probe cache location, or None when caching is disabled."""
+    override = os.environ.get("MM_PROBE_CACHE", "").strip()
+    if override.lower() in {"0", "off", "none", "false"}:
+        return None
+    if override:
+        return pathlib.Path(override).expanduser()
+    return _cache_root() / "probe-cache.json"
+
+
+class ProbeCache:
+    """
+    LRU cache of ffprobe results keyed by path, size and mtime. Entries are kept
+    in memory for the lifetime of the process and persisted as JSON so repeated
+    batch runs skip probing unchanged files entirely. A flush merges this
+    process's additions and removals into whatever is on disk by then, so
+    batches running side by side keep each other's entries.
+    """
+
+    def __init__(self, path: Optional[pathlib.Path], max_entries: int = PROBE_CACHE_MAX_ENTRIES) -> None:
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, MediaProbe]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+        # Keys written (probe) or dropped (None) since the last flush.
+        self._changes: dict[str, Optional[MediaProbe]] = {}
+
+    def _read(self) -> "OrderedDict[str, MediaProbe]":
+        entries: "OrderedDict[str, MediaProbe]" = OrderedDict()
+        if self.path is None or not self.path.is_file():
+            return entries
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return entries
+        if not isinstance(payload, dict) or payload.get("version") != PROBE_CACHE_VERSION:
+            return entries
+        for item in payload.get("entries") or []:
+            try:
+                probe = MediaProbe.from_json(item)
+            except (KeyError, TypeError, ValueError):
+                continue
+            entries[probe.path] = probe
+        return entries
+
+    def _trim(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        self._entries = self._read()
+        self._trim()
+
+    def get(self, key: str, size: int, mtime_ns: int) -> Optional[MediaProbe]:
+        with self._lock:
+            self._load()
+            probe = self._entries.get(key)
+            if probe is None:
+                return None
+            if probe.size != size or probe.mtime_ns != mtime_ns:
+                del self._entries[key]
+                self._changes[key] = None
+                return None
+            self._entries.move_to_end(key)
+            return probe
+
+    def put(self, probe: MediaProbe) -> None:
+        with self._lock:
+            self._load()
+            self._entries[probe.path] = probe
+            self._entries.move_to_end(probe.path)
+            self._trim()
+            self._changes[probe.path] = probe
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._load()
+            self._entries.pop(key, None)
+            self._changes[key] = None
+
+    def flush(self) -> None:
+        """Merge this process's changes into the file on disk, if there are any."""
+        with self._lock:
+            if self.path is None or not self._changes:
+                return
+            merged = self._read()
+            for key, probe in self._changes.items():
+                merged.pop(key, None)
+                if probe is not None:
+                    merged[key] = probe
+            self._entries = merged
+            self._trim()
+            payload = {
+                "version": PROBE_CACHE_VERSION,
+                "entries": [probe.to_json() for probe in self._entries.values()],
+            }
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                temp_path.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+                os.replace(temp_path, self.path)
+            except OSError:
+                return
+            self._changes.clear()
 
+
+PROBE_CACHE = ProbeCache(default_probe_cache_path())
+atexit.register(PROBE_CACHE.flush)
+
+
+def _probe_cache_key(video: pathlib.Path) -> str:
     try:
-        return float(raw)
-    except (TypeError, ValueError) as exc:
-        raise RuntimeError(f"ffprobe provided an invalid duration: {raw!r}") from exc
+        return str(video.resolve())
+    except OSError:
+        return str(video.absolute())
 
 
-def run_ffprobe_bitrate(video: pathlib.Path) -> int:
-    """Return the video stream bitrate in bits per second using ffprobe."""
+def probe_media(video: pathlib.Path, *, use_cache: bool = True) -> MediaProbe:
+    """Return format and stream metadata for ``video`` using one cached ffprobe call."""
+    try:
+        stat = video.stat()
+    except OSError as exc:
+        raise RuntimeError(f"Could not stat {video}: {exc}") from exc
+
+    key = _probe_cache_key(video)
+    if use_cache:
+        cached = PROBE_CACHE.get(key, stat.st_size, stat.st_mtime_ns)
+        if cached is not None:
+            return cached
+
     cmd = [
         "ffprobe",
         "-v",
         "error",
-        "-select_streams",
-        "v:0",
-        "-show_entries",
-        "stream=bit_rate",
-        "-of",
-        "default=noprint_wrappers=1:nokey=1",
+        "-print_format",
+        "json",
+        "-show_format",
+        "-show_streams",
         str(video),
     ]
+    if isinstance(video, RemoteMedia):
+        # Stream parameters sit near the start; don't pull the default 5 MB over the network.
+        cmd[1:1] = ["-probesize", str(REMOTE_PROBE_BYTES)]
     try:
-        raw = subprocess.check_output(cmd, text=True).strip()
+        result = ENGINE.run(with_remote_input(cmd), capture_stdout=True)
     except FileNotFoundError as exc:  # pragma: no cover - handled elsewhere
         raise RuntimeError("ffprobe not found on PATH.") from exc
-    except subprocess.CalledProcessError as exc:
-        raise RuntimeError(f"ffprobe failed to read bitrate: {exc}") from exc
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed to inspect media (exit code {result.returncode}).")
 
-    if not raw or raw == "N/A":
-        # Fallback to format bitrate if stream bitrate not available
-        cmd = [
-            "ffprobe",
-            "-v",
-            "error",
-            "-show_entries",
-            "format=bit_rate",
-            "-of",
-            "default=noprint_wrappers=1:nokey=1",
-            str(video),
-        ]
-        try:
-            raw = subprocess.check_output(cmd, text=True).strip()
-        except subprocess.CalledProcessError as exc:
-            raise RuntimeError(f"ffprobe failed to read format bitrate: {exc}") from exc
+    try:
+        payload = json.loads(result.stdout)
+    except json.JSONDecodeError as exc:
+        raise RuntimeError("ffprobe produced invalid JSON media data.") from exc
+
+    format_info = payload.get("format")
+    streams = payload.get("streams")
+    if not isinstance(format_info, dict):
+        format_info = {}
+    if not isinstance(streams, list):
+        raise RuntimeError("ffprobe did not return stream information.")
+
+    raw_duration = format_info.get("duration")
+    try:
+        duration = float(raw_duration)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        duration = -1.0
+
+    probe = MediaProbe(
+        path=key,
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        duration=duration,
+        format=format_info,
+        streams=[stream for stream in streams if isinstance(stream, dict)],
+    )
+    if use_cache:
+        PROBE_CACHE.put(probe)
+    return probe
+
+
+def _mp4_children(buf: mmap.mmap, start: int, end: int) -> Iterator[tuple[bytes, int, int]]:
+    """Yield ``(kind, payload_start, box_end)`` for each box in ``buf[start:end]``."""
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", buf, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise ValueError(f"bad {kind!r} box")
+        yield kind, offset + header, offset + size
+        offset += size
+
+
+def _mp4_find(buf: mmap.mmap, start: int, end: int, *path: bytes) -> Optional[tuple[int, int]]:
+    for kind, child_start, child_end in _mp4_children(buf, start, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return child_start, child_end
+            return _mp4_find(buf, child_start, child_end, *path[1:])
+    return None
+
+
+def _mp4_time_header(buf: mmap.mmap, offset: int) -> tuple[int, int]:
+    """Return ``(timescale, duration)`` from an mvhd/mdhd payload."""
+    if buf[offset] == 1:
+        return struct.unpack_from(">IQ", buf, offset + 20)
+    return struct.unpack_from(">II", buf, offset + 12)
+
+
+def _mp4a_codec(buf: mmap.mmap, entry_start: int, entry_end: int) -> Optional[str]:
+    """Resolve an mp4a sample entry to aac/mp3 from the esds object type."""
+    esds = _mp4_find(buf, entry_start + 36, entry_end, b"esds")
+    if esds is None:
+        return None
+    offset = esds[0] + 4
+    while offset < esds[1]:
+        tag = buf[offset]
+        offset += 1
+        length = 0
+        for _ in range(4):
+            byte = buf[offset]
+            offset += 1
+            length = (length << 7) | (byte & 0x7F)
+            if not byte & 0x80:
+                break
+        if tag == 0x03:
+            flags = buf[offset + 2]
+            offset += 3
+            if flags & 0x80:
+                offset += 2
+            if flags & 0x40:
+                offset += 1 + buf[offset]
+            if flags & 0x20:
+                offset += 2
+            continue
+        if tag == 0x04:
+            object_type = buf[offset]
+            if object_type in (0x40, 0x66, 0x67, 0x68):
+                return "aac"
+            if object_type in (0x69, 0x6B):
+                return "mp3"
+            return None
+        offset += length
+    return None
+
+
+def _read_mp4_header(buf: mmap.mmap) -> Optional[tuple[dict[str, object], list[dict[str, object]], float]]:
+    moov = _mp4_find(buf, 0, len(buf), b"moov")
+    if moov is None:
+        return None
+    mvhd = _mp4_find(buf, *moov, b"mvhd")
+    if mvhd is None:
+        return None
+    timescale, duration_units = _mp4_time_header(buf, mvhd[0])
+    if not duration_units:
+        mehd = _mp4_find(buf, *moov, b"mvex", b"mehd")
+        if mehd is not None:
+            fmt = ">Q" if buf[mehd[0]] == 1 else ">I"
+            duration_units = struct.unpack_from(fmt, buf, mehd[0] + 4)[0]
+    if not timescale or not duration_units:
+        return None
+    duration = duration_units / timescale
+
+    streams: list[dict[str, object]] = []
+    for kind, trak_start, trak_end in _mp4_children(buf, *moov):
+        if kind != b"trak":
+            continue
+        mdia = _mp4_find(buf, trak_start, trak_end, b"mdia")
+        if mdia is None:
+            return None
+        hdlr = _mp4_find(buf, *mdia, b"hdlr")
+        mdhd = _mp4_find(buf, *mdia, b"mdhd")
+        stbl = _mp4_find(buf, *mdia, b"minf", b"stbl")
+        if hdlr is None or mdhd is None or stbl is None:
+            return None
+        codec_type = MP4_HANDLER_TYPES.get(bytes(buf[hdlr[0] + 8 : hdlr[0] + 12]))
+        if codec_type is None:
+            continue  # Chapter/timecode tracks are not exposed as streams either.
+        stsd = _mp4_find(buf, *stbl, b"stsd")
+        if stsd is None:
+            return None
+        entry_start = stsd[0] + 8
+        entry_size, fourcc = struct.unpack_from(">I4s", buf, entry_start)
+        entry_end = entry_start + entry_size
+        codec = MP4_SAMPLE_CODECS.get(fourcc)
+        if fourcc == b"mp4a":
+            codec = _mp4a_codec(buf, entry_start, entry_end)
+        if codec is None:
+            return None
+
+        stream: dict[str, object] = {"index": len(streams), "codec_type": codec_type, "codec_name": codec}
+        if codec_type == "video":
+            stream["width"], stream["height"] = struct.unpack_from(">HH", buf, entry_start + 32)
+        elif codec_type == "audio":
+            stream["channels"] = struct.unpack_from(">H", buf, entry_start + 24)[0]
+            stream["sample_rate"] = str(struct.unpack_from(">I", buf, entry_start + 32)[0] >> 16)
+
+        track_timescale, track_units = _mp4_time_header(buf, mdhd[0])
+        stsz = _mp4_find(buf, *stbl, b"stsz")
+        if stsz is not None and track_timescale and track_units:
+            sample_size, count = struct.unpack_from(">II", buf, stsz[0] + 4)
+            if sample_size:
+                total = sample_size * count
+            else:
+                sizes = array("I", buf[stsz[0] + 12 : stsz[0] + 12 + 4 * count])
+                if sys.byteorder == "little":
+                    sizes.byteswap()
+                total = sum(sizes)
+            stream["bit_rate"] = str(int(total * 8 * track_timescale / track_units))
+        streams.append(stream)
+
+    return {"format_name": "mov,mp4,m4a,3gp,3g2,mj2"}, streams, duration
+
+
+def _ebml_vint(buf: mmap.mmap, offset: int, *, keep_marker: bool = False) -> tuple[int, int]:
+    """Decode an EBML variable-length integer; returns ``(value, length)``. Unknown sizes map to -1."""
+    first = buf[offset]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError("bad EBML vint")
+    value = first if keep_marker else first & (mask - 1)
+    for index in range(1, length):
+        value = (value << 8) | buf[offset + index]
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return -1, length
+    return value, length
+
+
+def _ebml_elements(buf: mmap.mmap, start: int, end: int) -> Iterator[tuple[int, int, int]]:
+    """Yield ``(element_id, data_start, data_end)`` for each element in ``buf[start:end]``."""
+    offset = start
+    while offset < end:
+        element_id, id_length = _ebml_vint(buf, offset, keep_marker=True)
+        size, size_length = _ebml_vint(buf, offset + id_length)
+        data_start = offset + id_length + size_length
+        data_end = end if size < 0 else min(end, data_start + size)
+        yield element_id, data_start, data_end
+        offset = data_end
+
+
+def _ebml_uint(buf: mmap.mmap, start: int, end: int) -> int:
+    return int.from_bytes(buf[start:end], "big")
+
+
+def _ebml_float(buf: mmap.mmap, start: int, end: int) -> float:
+    if end - start == 4:
+        return struct.unpack_from(">f", buf, start)[0]
+    if end - start == 8:
+        return struct.unpack_from(">d", buf, start)[0]
+    return 0.0
+
+
+def _read_matroska_header(buf: mmap.mmap) -> Optional[tuple[dict[str, object], list[dict[str, object]], float]]:
+    elements = _ebml_elements(buf, 0, len(buf))
+    header_id, header_start, header_end = next(elements)
+    if header_id != 0x1A45DFA3:
+        return None
+    doc_type = "matroska"
+    for element_id, start, end in _ebml_elements(buf, header_start, header_end):
+        if element_id == 0x4282:
+            doc_type = bytes(buf[start:end]).rstrip(b"\0").decode("ascii", "replace")
+    segment = next((item for item in elements if item[0] == 0x18538067), None)
+    if segment is None:
+        return None
+    _segment_id, segment_start, segment_end = segment
+
+    # Level-1 elements of interest, located via SeekHead when present so we
+    # never walk the clusters.
+    wanted = {0x1549A966: None, 0x1654AE6B: None, 0x1941A469: None}
+    for element_id, start, end in _ebml_elements(buf, segment_start, segment_end):
+        if element_id == 0x114D9B74:
+            for seek_id, seek_start, seek_end in _ebml_elements(buf, start, end):
+                if seek_id != 0x4DBB:
+                    continue
+                target = position = None
+                for child_id, child_start, child_end in _ebml_elements(buf, seek_start, seek_end):
+                    if child_id == 0x53AB:
+                        target = _ebml_uint(buf, child_start, child_end)
+                    elif child_id == 0x53AC:
+                        position = _ebml_uint(buf, child_start, child_end)
+                if target in wanted and position is not None and wanted[target] is None:
+                    offset = segment_start + position
+                    if offset < segment_end:
+                        found_id, found_start, found_end = next(_ebml_elements(buf, offset, segment_end))
+                        if found_id == target:
+                            wanted[target] = (found_start, found_end)
+        elif element_id in wanted and wanted[element_id] is None:
+            wanted[element_id] = (start, end)
+        elif element_id == 0x1F43B675:
+            break
+        if wanted[0x1549A966] and wanted[0x1654AE6B] and wanted[0x1941A469]:
+            break
+
+    info, tracks, attachments = wanted[0x1549A966], wanted[0x1654AE6B], wanted[0x1941A469]
+    if info is None or tracks is None:
+        return None
+    timecode_scale = 1_000_000
+    raw_duration = 0.0
+    for element_id, start, end in _ebml_elements(buf, *info):
+        if element_id == 0x2AD7B1:
+            timecode_scale = _ebml_uint(buf, start, end)
+        elif element_id == 0x4489:
+            raw_duration = _ebml_float(buf, start, end)
+    if raw_duration <= 0:
+        return None
+    duration = raw_duration * timecode_scale / 1e9
+
+    streams: list[dict[str, object]] = []
+    for element_id, entry_start, entry_end in _ebml_elements(buf, *tracks):
+        if element_id != 0xAE:
+            continue
+        stream: dict[str, object] = {"index": len(streams)}
+        codec_id = ""
+        for child_id, start, end in _ebml_elements(buf, entry_start, entry_end):
+            if child_id == 0x83:
+                track_type = MATROSKA_TRACK_TYPES.get(_ebml_uint(buf, start, end))
+                if track_type is None:
+                    return None
+                stream["codec_type"] = track_type
+            elif child_id == 0x86:
+                codec_id = bytes(buf[start:end]).rstrip(b"\0").decode("ascii", "replace")
+            elif child_id == 0xE0:
+                for video_id, video_start, video_end in _ebml_elements(buf, start, end):
+                    if video_id == 0xB0:
+                        stream["width"] = _ebml_uint(buf, video_start, video_end)
+                    elif video_id == 0xBA:
+                        stream["height"] = _ebml_uint(buf, video_start, video_end)
+            elif child_id == 0xE1:
+                for audio_id, audio_start, audio_end in _ebml_elements(buf, start, end):
+                    if audio_id == 0xB5:
+                        stream["sample_rate"] = str(int(_ebml_float(buf, audio_start, audio_end)))
+                    elif audio_id == 0x9F:
+                        stream["channels"] = _ebml_uint(buf, audio_start, audio_end)
+        codec = MATROSKA_CODECS.get(codec_id)
+        if codec is None or "codec_type" not in stream:
+            return None
+        stream["codec_name"] = codec
+        streams.append(stream)
+
+    if attachments is not None:
+        for element_id, _start, _end in _ebml_elements(buf, *attachments):
+            if element_id == 0x61A7:
+                streams.append({"index": len(streams), "codec_type": "attachment", "codec_name": "none"})
+
+    format_name = "matroska,webm" if doc_type in {"matroska", "webm"} else doc_type
+    return {"format_name": format_name}, streams, duration
+
+
+MP4_TOP_LEVEL_MAGIC = {b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"}
+
+
+def _parse_container_header(
+    buf: mmap.mmap | bytes,
+) -> Optional[tuple[dict[str, object], list[dict[str, object]], float]]:
+    magic = bytes(buf[:12])
+    if magic[:4] == b"\x1a\x45\xdf\xa3":
+        return _read_matroska_header(buf)  # type: ignore[arg-type]
+    if magic[4:8] in MP4_TOP_LEVEL_MAGIC:
+        return _read_mp4_header(buf)  # type: ignore[arg-type]
+    return None
+
+
+def _remote_header_bytes(video: RemoteMedia, size: int) -> bytes:
+    """
+    Fetch just the bytes the native readers need from a URL: the first MiB
+    for Matroska, or the ``moov`` box found by hopping over the top-level mp4
+    box headers (one small range request per box, skipping ``mdat``).
+    Returns an empty buffer for anything else.
+    """
+    with video.open() as handle:
+        head = handle.read(min(size, REMOTE_HEADER_BYTES))
+        if head[:4] == b"\x1a\x45\xdf\xa3":
+            return head
+        if head[4:8] not in MP4_TOP_LEVEL_MAGIC:
+            return b""
+        offset = 0
+        while offset + 8 <= size:
+            if offset + 16 <= len(head):
+                header = head[offset : offset + 16]
+            else:
+                handle.seek(offset)
+                header = handle.read(16)
+            box_size, kind = struct.unpack_from(">I4s", header)
+            header_size = 8
+            if box_size == 1:
+                box_size = struct.unpack_from(">Q", header, 8)[0]
+                header_size = 16
+            elif box_size == 0:
+                box_size = size - offset
+            if box_size < header_size:
+                return b""
+            if kind == b"moov":
+                if box_size > REMOTE_MOOV_LIMIT:
+                    return b""
+                if offset + box_size <= len(head):
+                    return head[offset : offset + box_size]
+                handle.seek(offset)
+                return handle.read(box_size)
+            offset += box_size
+    return b""
+
+
+def read_container_header(video: pathlib.Path) -> Optional[MediaProbe]:
+    """
+    Read duration, bitrate and track codecs straight from the mp4 moov or
+    Matroska Info/Tracks headers through a memory map, or for a URL from the
+    few byte ranges holding them. Returns None for any container or codec the
+    reader does not fully understand, so callers can fall back to ffprobe.
+    """
+    try:
+        stat = video.stat()
+        if not stat.st_size:
+            return None
+        if isinstance(video, RemoteMedia):
+            parsed = _parse_container_header(_remote_header_bytes(video, stat.st_size))
+        else:
+            with video.open("rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                parsed = _parse_container_header(buf)
+    except (OSError, ValueError, IndexError, struct.error, StopIteration):
+        return None
+    if parsed is None:
+        return None
+
+    format_info, streams, duration = parsed
+    format_info["duration"] = f"{duration:.6f}"
+    format_info["size"] = str(stat.st_size)
+    if duration > 0:
+        format_info["bit_rate"] = str(int(stat.st_size * 8 / duration))
+    return MediaProbe(
+        path=_probe_cache_key(video),
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        duration=duration,
+        format=format_info,
+        streams=streams,
+    )
 
+
+def probe_header(video: pathlib.Path) -> MediaProbe:
+    """
+    Return duration/bitrate metadata as cheaply as possible: a cached ffprobe
+    result, then the native header reader, then a fresh ffprobe call. Native
+    results are not cached because they omit fields (dispositions, frame
+    rates) that stream planning needs from ``probe_media``.
+    """
     try:
-        return int(float(raw))
-    except (TypeError, ValueError) as exc:
-        raise RuntimeError(f"ffprobe provided an invalid bitrate: {raw!r}") from exc
+        stat = video.stat()
+    except OSError as exc:
+        raise RuntimeError(f"Could not stat {video}: {exc}") from exc
+    cached = PROBE_CACHE.get(_probe_cache_key(video), stat.st_size, stat.st_mtime_ns)
+    if cached is not None:
+        return cached
+    return read_container_header(video) or probe_media(video)
+
+
+def run_ffprobe_duration(video: pathlib.Path) -> float:
+    """Return the media duration in seconds, reading container headers before falling back to ffprobe."""
+    duration = probe_header(video).duration
+    if duration < 0:
+        raise RuntimeError(f"ffprobe provided an invalid duration for {video.name}.")
+    return duration
+
+
+def run_ffprobe_bitrate(video: pathlib.Path) -> int:
+    """Return the video stream bitrate in bits per second, reading container headers when possible."""
+    bit_rate = probe_header(video).video_bit_rate
+    if bit_rate is None:
+        raise RuntimeError(f"ffprobe did not report a bitrate for {video.name}.")
+    return bit_rate
 
 
 def ask_target_size_mb(default: float = 180.0) -> float:
@@ -171,305 +1274,1059 @@ def ask_path(prompt: str, expect_file: Optional[bool] = None) -> pathlib.Path:
 
 def probe_streams(video: pathlib.Path) -> list[dict[str, object]]:
     """Return stream metadata from ffprobe."""
-    cmd = [
-        "ffprobe",
-        "-v",
-        "error",
-        "-print_format",
-        "json",
-        "-show_streams",
-        str(video),
-    ]
-    try:
-        raw = subprocess.check_output(cmd, text=True)
-    except FileNotFoundError as exc:  # pragma: no cover - handled elsewhere
-        raise RuntimeError("ffprobe not found on PATH.") from exc
-    except subprocess.CalledProcessError as exc:
-        raise RuntimeError(f"ffprobe failed to inspect streams: {exc}") from exc
+    return probe_media(video).streams
 
-    try:
-        payload = json.loads(raw)
-    except json.JSONDecodeError as exc:
-        raise RuntimeError("ffprobe produced invalid JSON stream data.") from exc
 
-    streams = payload.get("streams")
-    if not isinstance(streams, list):
-        raise RuntimeError("ffprobe did not return stream information.")
-    return [stream for stream in streams if isinstance(stream, dict)]
+STREAM_COPY_CODECS: dict[str, dict[str, set[str]]] = {
+    "mp4": {"video": {"h264"}, "audio": {"aac", "mp3"}, "subtitle": {"mov_text"}},
+    "webm": {"video": {"vp8", "vp9"}, "audio": {"vorbis", "opus"}, "subtitle": set()},
+}
+
+STREAM_ENCODERS: dict[str, dict[str, str]] = {
+    "mp4": {"video": "libx264", "audio": "aac", "subtitle": "mov_text"},
+    "webm": {"video": "libvpx-vp9", "audio": "libopus"},
+}
+
+TEXT_SUBTITLE_CODECS = {"subrip", "srt", "ass", "ssa", "webvtt", "text", "mov_text"}
 
 
-def plan_stream_copy(video: pathlib.Path, target_format: str) -> dict[str, object]:
-    """Determine whether the target container can be produced via stream copy."""
+def plan_stream_copy(
+    video: pathlib.Path,
+    target_format: str,
+    *,
+    force_transcode: bool = False,
+) -> dict[str, object]:
+    """
+    Decide per stream whether the target container can take it via stream copy,
+    needs a transcode, or has to be dropped. ``use_copy`` is only true when
+    every kept stream is copied; ``copy_video`` reports whether the expensive
+    video encode can be skipped.
+    """
     try:
         streams = probe_streams(video)
     except Exception as exc:  # noqa: BLE001
         return {
             "use_copy": False,
+            "copy_video": False,
             "reason": str(exc),
             "has_attachment_streams": False,
             "has_data_streams": False,
             "has_subtitle_streams": False,
+            "streams": [],
         }
 
-    video_codecs = {
-        str(stream.get("codec_name", "")).lower()
-        for stream in streams
-        if stream.get("codec_type") == "video"
-    }
-    audio_codecs = {
-        str(stream.get("codec_name", "")).lower()
-        for stream in streams
-        if stream.get("codec_type") == "audio"
-    }
-    subtitle_codecs = {
-        str(stream.get("codec_name", "")).lower()
-        for stream in streams
-        if stream.get("codec_type") == "subtitle"
-    }
-
     has_attachments = any(stream.get("codec_type") == "attachment" for stream in streams)
     has_data = any(stream.get("codec_type") == "data" for stream in streams)
-    has_subs = bool(subtitle_codecs)
+    has_subs = any(stream.get("codec_type") == "subtitle" for stream in streams)
 
     plan: dict[str, object] = {
         "use_copy": False,
+        "copy_video": False,
         "reason": None,
         "has_attachment_streams": has_attachments,
         "has_data_streams": has_data,
         "has_subtitle_streams": has_subs,
         "drop_subtitles": False,
         "dropped_subtitle_codecs": [],
+        "streams": [],
     }
 
-    if target_format == "mp4":
-        allowed_video = {"h264"}
-        allowed_audio = {"aac", "mp3"}
-        unsupported_video = sorted(codec for codec in video_codecs if codec not in allowed_video)
-        unsupported_audio = sorted(codec for codec in audio_codecs if codec not in allowed_audio)
-        if unsupported_video:
-            plan["reason"] = (
-                "Video codec(s) incompatible with mp4: " + ", ".join(unsupported_video)
-            )
-            return plan
-        if unsupported_audio:
-            plan["reason"] = (
-                "Audio codec(s) incompatible with mp4: " + ", ".join(unsupported_audio)
-            )
-            return plan
-        unsupported_subs = sorted(codec for codec in subtitle_codecs if codec != "mov_text")
-        plan.update(
-            {
-                "use_copy": True,
-                "drop_subtitles": bool(unsupported_subs and subtitle_codecs),
-                "dropped_subtitle_codecs": unsupported_subs,
-            }
-        )
-        if not plan["drop_subtitles"]:
-            plan["reason"] = None
-        else:
-            plan["reason"] = (
-                "Dropping subtitle stream(s) not supported by mp4: "
-                + ", ".join(unsupported_subs)
-            )
+    if target_format not in CONVERSION_FORMATS:
+        plan["reason"] = f"Unsupported target format: {target_format}"
         return plan
 
-    if target_format == "mkv":
-        plan.update({"use_copy": True, "drop_subtitles": False, "reason": None})
-        return plan
+    allowed = STREAM_COPY_CODECS.get(target_format)
+    encoders = STREAM_ENCODERS.get(target_format, {})
+    actions: list[dict[str, object]] = []
+    transcoded: dict[str, set[str]] = {"video": set(), "audio": set(), "subtitle": set()}
+    dropped_subs: set[str] = set()
 
-    if target_format == "webm":
-        allowed_video = {"vp8", "vp9"}
-        allowed_audio = {"vorbis", "opus"}
-        unsupported_video = sorted(codec for codec in video_codecs if codec not in allowed_video)
-        unsupported_audio = sorted(codec for codec in audio_codecs if codec not in allowed_audio)
-        if unsupported_video:
-            plan["reason"] = (
-                "Video codec(s) incompatible with webm: " + ", ".join(unsupported_video)
-            )
-            return plan
-        if unsupported_audio:
-            plan["reason"] = (
-                "Audio codec(s) incompatible with webm: " + ", ".join(unsupported_audio)
-            )
-            return plan
-        plan.update(
+    for stream in streams:
+        codec_type = str(stream.get("codec_type", ""))
+        codec = str(stream.get("codec_name", "")).lower()
+        if codec_type not in {"video", "audio", "subtitle"}:
+            continue
+        action = "copy"
+        if allowed is not None:
+            is_cover = bool((stream.get("disposition") or {}).get("attached_pic"))  # type: ignore[union-attr]
+            if codec_type == "video" and is_cover:
+                action = "drop"
+            elif codec_type == "subtitle":
+                if codec in allowed["subtitle"]:
+                    action = "copy"
+                elif "subtitle" in encoders and codec in TEXT_SUBTITLE_CODECS:
+                    action = "transcode"
+                else:
+                    action = "drop"
+                    dropped_subs.add(codec)
+            elif force_transcode or codec not in allowed[codec_type]:
+                action = "transcode"
+        if action == "transcode":
+            transcoded[codec_type].add(codec)
+        actions.append(
             {
-                "use_copy": True,
-                "drop_subtitles": bool(subtitle_codecs),
-                "dropped_subtitle_codecs": sorted(subtitle_codecs),
-                "reason": None if not subtitle_codecs else "Dropping subtitle stream(s) — webm does not support them.",
+                "index": int(stream.get("index", len(actions))),  # type: ignore[arg-type]
+                "codec_type": codec_type,
+                "codec": codec,
+                "action": action,
+                "encoder": encoders.get(codec_type) if action == "transcode" else None,
             }
         )
-        return plan
 
-    plan["reason"] = f"Unsupported target format: {target_format}"
+    kept = [item for item in actions if item["action"] != "drop"]
+    plan["streams"] = actions
+    plan["copy_video"] = not any(
+        item["codec_type"] == "video" and item["action"] == "transcode" for item in kept
+    )
+    plan["use_copy"] = all(item["action"] == "copy" for item in kept)
+    plan["drop_subtitles"] = bool(dropped_subs)
+    plan["dropped_subtitle_codecs"] = sorted(dropped_subs)
+
+    reasons = []
+    for codec_type, label in (("video", "Video"), ("audio", "Audio"), ("subtitle", "Subtitle")):
+        if transcoded[codec_type]:
+            reasons.append(
+                f"{label} codec(s) incompatible with {target_format}: "
+                + ", ".join(sorted(transcoded[codec_type]))
+            )
+    if dropped_subs:
+        reasons.append(
+            f"Dropping subtitle stream(s) not supported by {target_format}: " + ", ".join(sorted(dropped_subs))
+        )
+    plan["reason"] = "; ".join(reasons) or None
     return plan
 
 
-def run_ffmpeg_command(
-    cmd: list[str],
-    log: Callable[[str], None],
-    suppress_tokens: tuple[str, ...] = DEFAULT_SUPPRESS_TOKENS,
-    total_duration: Optional[float] = None,
-    progress_cb: Optional[Callable[[float, float], None]] = None,
-) -> int:
-    """Run ffmpeg, provide optional progress, and return the count of suppressed lines."""
-    cmd_local = cmd.copy()
-    if progress_cb is not None and "-progress" not in cmd_local:
-        insert_pos = 1
-        if len(cmd_local) > 1 and cmd_local[1] == "-hide_banner":
-            insert_pos = 2
-        cmd_local.insert(insert_pos, "-progress")
-        cmd_local.insert(insert_pos + 1, "pipe:1")
-        cmd_local.insert(insert_pos + 2, "-nostats")
+_SUPPRESS_MATCHERS: dict[tuple[str, ...], Optional[re.Pattern[str]]] = {}
 
-    log("Running: " + " ".join(cmd_local))
 
-    started_at = time.time()
+def _suppress_matcher(tokens: tuple[str, ...]) -> Optional[re.Pattern[str]]:
+    """One compiled alternation per token set instead of an ``any()`` scan per line."""
+    matcher = _SUPPRESS_MATCHERS.get(tokens)
+    if matcher is None and tokens:
+        matcher = re.compile("|".join(re.escape(token) for token in tokens))
+        _SUPPRESS_MATCHERS[tokens] = matcher
+    return matcher
 
-    try:
-        process = subprocess.Popen(
-            cmd_local,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1,
-        )
-    except FileNotFoundError as exc:
-        log("Failed to launch ffmpeg; is it installed and on PATH?")
-        raise RuntimeError("ffmpeg not found on PATH.") from exc
 
-    filtered_messages = 0
-    stderr_messages: list[str] = []
-    stderr_error: Optional[BaseException] = None
+def _prune_spill_files(spill_dir: pathlib.Path) -> None:
+    """Delete spill files older than ``FFMPEG_SPILL_MAX_AGE`` and all but the newest ``FFMPEG_SPILL_KEEP - 1``."""
+    dated: list[tuple[float, pathlib.Path]] = []
+    for path in spill_dir.glob("ffmpeg-*.log"):
+        try:
+            dated.append((path.stat().st_mtime, path))
+        except OSError:
+            continue
+    dated.sort(reverse=True)
+    cutoff = time.time() - FFMPEG_SPILL_MAX_AGE
+    for position, (mtime, path) in enumerate(dated):
+        if position >= FFMPEG_SPILL_KEEP - 1 or mtime < cutoff:
+            path.unlink(missing_ok=True)
+
 
-    def drain_stderr() -> None:
-        nonlocal filtered_messages, stderr_error
+class StderrCapture:
+    """
+    Bounded handling of ffmpeg stderr. The first few lines of each message
+    class (numbers and addresses masked) stream to ``log`` as they arrive,
+    later repeats are only counted, and the last ``tail_lines`` lines stay in
+    memory. Once output outgrows the tail, lines are spilled to a file under
+    the cache directory for diagnostics, up to ``FFMPEG_SPILL_MAX_BYTES``;
+    opening a spill file prunes old ones.
+    """
+
+    def __init__(
+        self,
+        log: Callable[[str], None],
+        suppress_tokens: tuple[str, ...],
+        *,
+        job: Optional[int] = None,
+        tail_lines: int = FFMPEG_STDERR_TAIL_LINES,
+        repeat_limit: int = FFMPEG_LOG_REPEAT_LIMIT,
+    ) -> None:
+        self.log = log
+        self.job = job
+        self.tail_lines = tail_lines
+        self.repeat_limit = repeat_limit
+        self.tail: deque[str] = deque(maxlen=tail_lines)
+        self.class_counts: Counter[str] = Counter()
+        self.suppressed = 0
+        self.total = 0
+        self.spill_path: Optional[pathlib.Path] = None
+        self._head: list[str] = []
+        self._spill: Optional[TextIO] = None
+        self._spilled = 0
+        self._matcher = _suppress_matcher(suppress_tokens)
+
+    def feed(self, line: str) -> None:
+        self.total += 1
+        self._record(line)
+        if self._matcher is not None and self._matcher.search(line):
+            self.suppressed += 1
+            return
+        self.tail.append(line)
+        key = STDERR_CLASS_PATTERN.sub("#", line)
+        self.class_counts[key] += 1
+        count = self.class_counts[key]
+        if count <= self.repeat_limit:
+            if EVENTS.enabled:
+                # The status callback is EVENTS.log here; emit the tagged warning only.
+                EVENTS.emit("warning", job=self.job, source="ffmpeg", message=line)
+            else:
+                self.log(line)
+        elif count == self.repeat_limit + 1:
+            self.log(f"Further repeats of this ffmpeg message are counted, not shown: {line[:120]}")
+
+    def _write_spill(self, text: str) -> None:
+        assert self._spill is not None
+        if self._spilled >= FFMPEG_SPILL_MAX_BYTES:
+            return
+        self._spilled += len(text)
+        if self._spilled >= FFMPEG_SPILL_MAX_BYTES:
+            text += f"[spill file capped at {FFMPEG_SPILL_MAX_BYTES // (1024 * 1024)} MiB; later lines omitted]\n"
+        self._spill.write(text)
+
+    def _record(self, line: str) -> None:
+        if self._spill is not None:
+            self._write_spill(line + "\n")
+            return
+        self._head.append(line)
+        if len(self._head) <= self.tail_lines:
+            return
         try:
-            if process.stderr is None:
-                return
-            for raw_line in iter(process.stderr.readline, ""):
-                line = raw_line.strip()
-                if not line or line.startswith("frame="):
-                    continue
-                if any(token in line for token in suppress_tokens):
-                    filtered_messages += 1
-                    continue
-                stderr_messages.append(line)
-        except BaseException as exc:  # noqa: BLE001
-            stderr_error = exc
+            spill_dir = _cache_root() / "logs"
+            spill_dir.mkdir(parents=True, exist_ok=True)
+            _prune_spill_files(spill_dir)
+            handle = tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=spill_dir, prefix="ffmpeg-", suffix=".log", delete=False
+            )
+        except OSError:
+            self._head.clear()  # Keep memory bounded even without a spill file.
+            return
+        self._spill = handle
+        self.spill_path = pathlib.Path(handle.name)
+        self._write_spill("\n".join(self._head) + "\n")
+        self._head.clear()
+
+    @property
+    def repeated(self) -> list[tuple[str, int]]:
+        """Message classes that went past the repeat limit, most frequent first."""
+        return [(key, count) for key, count in self.class_counts.most_common() if count > self.repeat_limit]
+
+    def close(self, *, failed: bool) -> None:
+        """Log repeat counts and keep the spill file only when it holds lines the log did not."""
+        for key, count in self.repeated[:5]:
+            self.log(f"FFmpeg repeated {count}x: {key[:120]}")
+        if self._spill is None:
+            return
+        self._spill.close()
+        self._spill = None
+        assert self.spill_path is not None
+        if failed or self.repeated:
+            self.log(f"Full ffmpeg output ({self.total} lines) saved to {self.spill_path}")
+        else:
+            try:
+                self.spill_path.unlink()
+            except OSError:
+                pass
+            self.spill_path = None
 
-    stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
-    stderr_thread.start()
 
+def _progress_value(raw: str) -> object:
+    """Convert an ffmpeg ``-progress`` value to a number where possible (``1.5x`` → 1.5, ``N/A`` → None)."""
+    value = raw.strip()
+    if value == "N/A":
+        return None
+    for unit in ("kbits/s", "x"):
+        if value.endswith(unit):
+            value = value[: -len(unit)]
+            break
     try:
-        if process.stdout is not None:
-            for raw_line in iter(process.stdout.readline, ""):
-                line = raw_line.strip()
-                if not line:
-                    continue
-                if progress_cb is not None and total_duration and total_duration > 0:
-                    if line.startswith("out_time_ms="):
-                        try:
-                            out_time_ms = int(line.split("=", 1)[1])
-                            processed_seconds = out_time_ms / 1_000_000
-                            processed_seconds = max(0.0, min(processed_seconds, total_duration))
-                            progress_cb(processed_seconds, total_duration)
-                        except ValueError:
-                            continue
-                    elif line.startswith("out_time="):
-                        # Fallback if only HH:MM:SS provided
-                        try:
-                            time_str = line.split("=", 1)[1]
-                            h, m, s = time_str.split(":")
-                            seconds = int(h) * 3600 + int(m) * 60 + float(s)
-                            processed_seconds = max(0.0, min(seconds, total_duration))
-                            progress_cb(processed_seconds, total_duration)
-                        except Exception:
-                            continue
-                    elif line.startswith("progress="):
-                        value = line.split("=", 1)[1].strip()
-                        if value == "end" and total_duration and total_duration > 0:
-                            progress_cb(total_duration, total_duration)
-        process.wait()
-
-        stderr_thread.join()
-        for message in stderr_messages:
-            log(message)
-
-        elapsed = time.time() - started_at
-        log(f"FFmpeg exited with code {process.returncode} after {elapsed:.1f}s.")
-
-        if process.returncode != 0:
-            raise RuntimeError(f"FFmpeg reported an error (exit code {process.returncode}).")
-        if stderr_error is not None:
-            raise RuntimeError(f"Failed to read ffmpeg stderr: {stderr_error}")
-    finally:
-        if process.stdout:
-            process.stdout.close()
-        if process.stderr:
-            process.stderr.close()
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return raw.strip()
 
-    if progress_cb is not None and total_duration and total_duration > 0:
-        progress_cb(total_duration, total_duration)
 
-    return filtered_messages
+@dataclass
+class StallPolicy:
+    """How long ffmpeg may go without ``out_time`` advancing, and whether to retry tolerantly."""
 
+    timeout: float = FFMPEG_STALL_SECONDS
+    retry_tolerant: bool = True
 
-IgnoredReason = tuple[pathlib.Path, str]
 
+STALL_POLICY = StallPolicy()
 
-def collect_video_files(source: pathlib.Path) -> tuple[list[pathlib.Path], list[IgnoredReason]]:
-    """Return candidate video files plus a list of skipped entries."""
-    ignored: list[IgnoredReason] = []
 
-    def is_hidden(path: pathlib.Path) -> bool:
-        return path.name.startswith(".")
+class FFmpegStalled(RuntimeError):
+    """ffmpeg stopped making progress and was killed by the stall watchdog."""
 
-    def validate_file(file_path: pathlib.Path) -> bool:
-        if is_hidden(file_path):
-            ignored.append((file_path, "hidden file"))
-            return False
-        if file_path.suffix.lower() not in SUPPORTED_VIDEO_SUFFIXES:
-            ignored.append((file_path, "unsupported extension"))
-            return False
-        return True
+    def __init__(self, message: str, *, out_time: float, timeout: float, attempts: int) -> None:
+        super().__init__(message)
+        self.out_time = out_time
+        self.timeout = timeout
+        self.attempts = attempts
 
-    if source.is_file():
-        if validate_file(source):
-            return [source], ignored
-        return [], ignored
-
-    if source.is_dir():
-        videos = []
-        for item in sorted(source.iterdir()):
-            if not item.is_file():
-                continue
-            if validate_file(item):
-                videos.append(item)
-        if not videos:
-            supported = ", ".join(sorted(SUPPORTED_VIDEO_SUFFIXES))
-            if ignored:
-                skipped = ", ".join(f"{path.name} ({reason})" for path, reason in ignored[:5])
-                if len(ignored) > 5:
-                    skipped += ", ..."
-                raise RuntimeError(
-                    f"No usable video files found in {source}. "
-                    f"Skipped {len(ignored)} item(s): {skipped}. "
-                    f"Expected extensions: {supported}"
-                )
-            raise RuntimeError(
-                f"No supported video files found in {source}. Expected extensions: {supported}"
-            )
-        return videos, ignored
 
-    raise RuntimeError("Source path must be a file or directory.")
+def with_tolerant_input(cmd: list[str]) -> list[str]:
+    """Insert ``TOLERANT_INPUT_ARGS`` before the first ``-i`` of an ffmpeg command."""
+    if "-i" not in cmd:
+        return list(cmd)
+    position = cmd.index("-i")
+    return [*cmd[:position], *TOLERANT_INPUT_ARGS, *cmd[position:]]
 
 
-def prune_trailing_empty_segments(
+class FFmpegAborted(RuntimeError):
+    """ffmpeg was terminated early because an ``abort_check`` reported a reason."""
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(f"FFmpeg stopped early: {reason}")
+        self.reason = reason
+
+
+def _progress_microseconds(line: str) -> Optional[int]:
+    """Output position from an ffmpeg ``-progress`` line (``out_time_ms`` is microseconds too), if it has one."""
+    key, _, value = line.partition("=")
+    try:
+        if key in ("out_time_us", "out_time_ms"):
+            return int(value)
+        if key == "out_time":
+            h, m, sec = value.split(":")
+            return int((int(h) * 3600 + int(m) * 60 + float(sec)) * 1_000_000)
+    except ValueError:
+        return None
+    return None
+
+
+def run_ffmpeg_command(
+    cmd: list[str],
+    log: Callable[[str], None],
+    suppress_tokens: tuple[str, ...] = DEFAULT_SUPPRESS_TOKENS,
+    total_duration: Optional[float] = None,
+    progress_cb: Optional[Callable[[float, float], None]] = None,
+    abort_check: Optional[Callable[[], Optional[str]]] = None,
+) -> int:
+    """
+    Run ffmpeg, provide optional progress, and return the count of suppressed lines.
+    ``abort_check`` is polled while ffmpeg runs; when it returns a reason the
+    process is terminated and ``FFmpegAborted`` is raised. If ``out_time``
+    stops advancing for ``STALL_POLICY.timeout`` seconds the process is
+    killed, retried once with tolerant input flags when the policy allows,
+    and otherwise ``FFmpegStalled`` is raised.
+    """
+    args = (log, suppress_tokens, total_duration, progress_cb, abort_check)
+    suppressed, stalled_at = _run_ffmpeg_attempt(cmd, *args, attempt=1)
+    attempts = 1
+    tolerant = with_tolerant_input(cmd)
+    if stalled_at is not None and STALL_POLICY.retry_tolerant and tolerant != cmd:
+        log("Retrying once with tolerant demux flags: " + " ".join(TOLERANT_INPUT_ARGS))
+        retried, stalled_at = _run_ffmpeg_attempt(tolerant, *args, attempt=2)
+        suppressed += retried
+        attempts = 2
+    if stalled_at is not None:
+        raise FFmpegStalled(
+            f"FFmpeg stalled at {format_timespan(stalled_at)} (no progress for {STALL_POLICY.timeout:.0f}s, "
+            f"{attempts} attempt(s)).",
+            out_time=stalled_at,
+            timeout=STALL_POLICY.timeout,
+            attempts=attempts,
+        )
+    return suppressed
+
+
+def _run_ffmpeg_attempt(
+    cmd: list[str],
+    log: Callable[[str], None],
+    suppress_tokens: tuple[str, ...],
+    total_duration: Optional[float],
+    progress_cb: Optional[Callable[[float, float], None]],
+    abort_check: Optional[Callable[[], Optional[str]]],
+    *,
+    attempt: int,
+) -> tuple[int, Optional[float]]:
+    """One ``run_ffmpeg_command`` run: suppressed line count and, when the watchdog killed it, where it stalled."""
+    cmd_local = with_remote_input(cmd)
+    job = EVENTS.current_job()
+    stall_timeout = STALL_POLICY.timeout
+    wants_progress = progress_cb is not None or EVENTS.enabled or stall_timeout > 0
+    if wants_progress and "-progress" not in cmd_local:
+        insert_pos = 1
+        if len(cmd_local) > 1 and cmd_local[1] == "-hide_banner":
+            insert_pos = 2
+        cmd_local.insert(insert_pos, "-progress")
+        cmd_local.insert(insert_pos + 1, "pipe:1")
+        cmd_local.insert(insert_pos + 2, "-nostats")
+
+    log("Running: " + " ".join(cmd_local))
+
+    started_at = time.time()
+    capture = StderrCapture(log, suppress_tokens, job=job)
+    stalled = False
+    last_out_time = -1
+    last_advance = time.time()
+    progress_fields: dict[str, object] = {}
+
+    def handle_start() -> None:
+        # Time spent waiting for a process slot is not a stall.
+        nonlocal started_at, last_advance
+        started_at = last_advance = time.time()
+
+    def handle_stderr(raw_line: str) -> None:
+        line = raw_line.strip()
+        if line and not line.startswith("frame="):
+            capture.feed(line)
+
+    def handle_progress(raw_line: str) -> None:
+        nonlocal last_out_time, last_advance, progress_fields
+        line = raw_line.strip()
+        if not line:
+            return
+        out_time = _progress_microseconds(line)
+        if out_time is not None and out_time > last_out_time:
+            last_out_time = out_time
+            last_advance = time.time()
+        if EVENTS.enabled and "=" in line:
+            key, _, value = line.partition("=")
+            progress_fields[key] = _progress_value(value)
+            if key == "progress":
+                if total_duration and "out_time_us" in progress_fields:
+                    progress_fields["total_seconds"] = total_duration
+                EVENTS.emit("progress", job=job, **progress_fields)
+                progress_fields = {}
+        if progress_cb is None or not total_duration or total_duration <= 0:
+            return
+        if line.startswith("out_time_ms="):
+            try:
+                out_time_ms = int(line.split("=", 1)[1])
+            except ValueError:
+                return
+            processed_seconds = max(0.0, min(out_time_ms / 1_000_000, total_duration))
+            progress_cb(processed_seconds, total_duration)
+        elif line.startswith("out_time="):
+            # Fallback if only HH:MM:SS provided
+            try:
+                h, m, sec = line.split("=", 1)[1].split(":")
+                seconds = int(h) * 3600 + int(m) * 60 + float(sec)
+            except ValueError:
+                return
+            progress_cb(max(0.0, min(seconds, total_duration)), total_duration)
+        elif line.startswith("progress=") and line.split("=", 1)[1].strip() == "end":
+            progress_cb(total_duration, total_duration)
+
+    def check_stop() -> Optional[str]:
+        nonlocal stalled
+        if stall_timeout > 0 and time.time() - last_advance > stall_timeout:
+            stalled = True
+            return f"no progress for {stall_timeout:.0f}s"
+        if abort_check is None:
+            return None
+        try:
+            return abort_check()
+        except Exception:  # noqa: BLE001
+            return None
+
+    try:
+        result = ENGINE.run(
+            cmd_local,
+            stdout_line=handle_progress,
+            stderr_line=handle_stderr,
+            check_stop=check_stop,
+            on_start=handle_start,
+        )
+    except FileNotFoundError as exc:
+        log("Failed to launch ffmpeg; is it installed and on PATH?")
+        raise RuntimeError("ffmpeg not found on PATH.") from exc
+
+    abort_reason = None if stalled else result.stop_reason
+    capture.close(failed=result.returncode != 0 and abort_reason is None)
+    elapsed = time.time() - started_at
+    if abort_reason is not None:
+        log(f"Stopped FFmpeg after {elapsed:.1f}s: {abort_reason}.")
+        raise FFmpegAborted(abort_reason)
+
+    if stalled:
+        position = max(last_out_time, 0) / 1_000_000
+        log(
+            f"FFmpeg made no progress for {stall_timeout:.0f}s (stuck at {format_timespan(position)}); "
+            f"killed after {elapsed:.1f}s."
+        )
+        EVENTS.emit(
+            "stall",
+            job=job,
+            out_time=position,
+            timeout=stall_timeout,
+            attempt=attempt,
+            elapsed=round(elapsed, 3),
+        )
+        return capture.suppressed, position
+
+    log(f"FFmpeg exited with code {result.returncode} after {elapsed:.1f}s.")
+    if result.returncode != 0:
+        if capture.tail:
+            log("Last ffmpeg output: " + " | ".join(list(capture.tail)[-3:]))
+        raise RuntimeError(f"FFmpeg reported an error (exit code {result.returncode}).")
+
+    if progress_cb is not None and total_duration and total_duration > 0:
+        progress_cb(total_duration, total_duration)
+
+    return capture.suppressed, None
+
+
+IgnoredReason = tuple[pathlib.Path, str]
+
+
+@dataclass
+class ScanFilter:
+    """
+    Which files a directory scan yields. Globs are matched against the path
+    relative to the scanned directory (``Season 1/*.mkv``) and against the
+    bare name (``*.mkv``); an excluded directory is not descended into.
+    """
+
+    recursive: bool = False
+    include: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+
+    def _matches(self, relative: str, patterns: tuple[str, ...]) -> bool:
+        name = relative.rsplit("/", 1)[-1]
+        return any(fnmatch.fnmatchcase(relative, pattern) or fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+    def excluded(self, relative: str) -> bool:
+        return self._matches(relative, self.exclude)
+
+    def included(self, relative: str) -> bool:
+        return not self.include or self._matches(relative, self.include)
+
+
+def iter_video_files(
+    source: pathlib.Path,
+    scan: Optional[ScanFilter] = None,
+    ignored: Optional[list[IgnoredReason]] = None,
+    outputs: Collection[pathlib.Path] = (),
+) -> Iterator[pathlib.Path]:
+    """
+    Yield supported video files under ``source`` as the scan reaches them, so
+    work can start before a large tree has been listed. ``os.scandir``
+    supplies the entry types without a stat per file. Hidden entries are
+    skipped and hidden or excluded directories are not entered. A directory
+    reached twice (through a symlink) is only scanned once. ``outputs`` holds
+    resolved paths the running batch writes to; it is consulted as the walk
+    goes, so folders and files created by jobs already started are never
+    picked up as new inputs. Files come in directory-listing order; sort them
+    when order matters. Skipped entries are appended to ``ignored``.
+    """
+    scan = scan or ScanFilter()
+    skipped = ignored if ignored is not None else []
+
+    def written(path: str) -> bool:
+        return bool(outputs) and pathlib.Path(os.path.realpath(path)) in outputs
+
+    def accept(path: pathlib.Path, relative: str) -> bool:
+        if path.name.startswith("."):
+            skipped.append((path, "hidden file"))
+        elif scan.excluded(relative):
+            skipped.append((path, "excluded"))
+        elif path.suffix.lower() not in SUPPORTED_VIDEO_SUFFIXES:
+            skipped.append((path, "unsupported extension"))
+        elif not scan.included(relative):
+            skipped.append((path, "not included"))
+        else:
+            return True
+        return False
+
+    if source.is_file():
+        if accept(source, source.name):
+            yield source
+        return
+    if not source.is_dir():
+        raise RuntimeError("Source path must be a file or directory.")
+
+    try:
+        root = source.stat()
+    except OSError as exc:
+        raise RuntimeError(f"Could not read {source}: {exc}") from exc
+    visited = {(root.st_dev, root.st_ino)}
+    pending: list[tuple[pathlib.Path, str]] = [(source, "")]
+    while pending:
+        directory, prefix = pending.pop()
+        subdirectories: list[tuple[pathlib.Path, str]] = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    relative = prefix + entry.name
+                    try:
+                        is_dir = entry.is_dir()
+                        is_file = not is_dir and entry.is_file()
+                    except OSError:
+                        continue
+                    if is_dir:
+                        if not scan.recursive:
+                            continue
+                        if entry.name.startswith("."):
+                            skipped.append((pathlib.Path(entry.path), "hidden directory"))
+                        elif scan.excluded(relative):
+                            skipped.append((pathlib.Path(entry.path), "excluded"))
+                        elif written(entry.path):
+                            skipped.append((pathlib.Path(entry.path), "output directory"))
+                        else:
+                            try:
+                                info = entry.stat()
+                            except OSError:
+                                continue
+                            if (info.st_dev, info.st_ino) in visited:
+                                skipped.append((pathlib.Path(entry.path), "directory already scanned"))
+                                continue
+                            visited.add((info.st_dev, info.st_ino))
+                            subdirectories.append((pathlib.Path(entry.path), relative + "/"))
+                    elif is_file and not written(entry.path) and accept(pathlib.Path(entry.path), relative):
+                        yield pathlib.Path(entry.path)
+        except OSError as exc:
+            skipped.append((directory, f"unreadable directory ({exc.strerror or exc})"))
+        # Depth first, visiting subdirectories in listing order.
+        pending.extend(reversed(subdirectories))
+
+
+def stream_video_files(
+    source: pathlib.Path | RemoteMedia,
+    scan: Optional[ScanFilter],
+    ignored: list[IgnoredReason],
+    outputs: Collection[pathlib.Path] = (),
+) -> tuple[bool, Iterator[pathlib.Path]]:
+    """
+    Start a scan and return whether it holds more than one video along with
+    every video it finds. Only the first two are read ahead, so callers keep
+    the single-file layout without waiting for the whole listing. A URL is
+    always a single video. ``outputs`` is passed on to ``iter_video_files``.
+    """
+    if isinstance(source, RemoteMedia):
+        return False, iter([source])
+    found = iter_video_files(source, scan, ignored, outputs)
+    head = list(itertools.islice(found, 2))
+    return len(head) > 1, itertools.chain(head, found)
+
+
+def collect_video_files(
+    source: pathlib.Path, scan: Optional[ScanFilter] = None
+) -> tuple[list[pathlib.Path], list[IgnoredReason]]:
+    """Return candidate video files, sorted, plus a list of skipped entries."""
+    ignored: list[IgnoredReason] = []
+    videos = sorted(iter_video_files(source, scan, ignored))
+    if source.is_dir() and not videos:
+        supported = ", ".join(sorted(SUPPORTED_VIDEO_SUFFIXES))
+        if ignored:
+            skipped = ", ".join(f"{path.name} ({reason})" for path, reason in ignored[:5])
+            if len(ignored) > 5:
+                skipped += ", ..."
+            raise RuntimeError(
+                f"No usable video files found in {source}. "
+                f"Skipped {len(ignored)} item(s): {skipped}. "
+                f"Expected extensions: {supported}"
+            )
+        raise RuntimeError(
+            f"No supported video files found in {source}. Expected extensions: {supported}"
+        )
+    return videos, ignored
+
+
+REPORT_NAME = ".mm-report.tsv"
+
+
+def write_order_report(
+    directory: pathlib.Path,
+    source: pathlib.Path,
+    outcomes: dict[pathlib.Path, str],
+    log: Callable[[str], None],
+) -> None:
+    """
+    Write one ``path<TAB>outcome`` line per input, sorted by path relative to
+    ``source``. Jobs start in scan order and finish in any order; the
+    report is always listed the same way.
+    """
+    base = source if source.is_dir() else source.parent
+
+    def relative(path: pathlib.Path) -> str:
+        try:
+            return path.relative_to(base).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    rows = sorted((relative(path), outcome) for path, outcome in outcomes.items())
+    report = directory / REPORT_NAME
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        report.write_text("".join(f"{path}\t{outcome}\n" for path, outcome in rows), encoding="utf-8")
+    except OSError as exc:
+        log(f"Could not write the ordering report ({exc}).")
+        return
+    log(f"Ordering report for {len(rows)} video(s): {report}")
+
+
+@dataclass
+class PacketTable:
+    """
+    Per-packet timing and size data for every stream in a file. Columns are
+    arrays, or memoryviews straight over a loaded packet index; once
+    ``sort_by_pts`` has run (every indexed table is sorted) ``window`` is a
+    bisection plus zero-copy slices.
+    """
+
+    pts: "array[float] | memoryview"
+    size: "array[int] | memoryview"
+    keyframe: "array[int] | memoryview"
+    stream: "array[int] | memoryview"
+    video_stream: int
+    start_time: float = 0.0
+    ordered: bool = False  # True when ``pts`` is ascending.
+    _keyframe_pts: Optional[list[float]] = field(default=None, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return len(self.pts)
+
+    def sort_by_pts(self) -> None:
+        """Reorder packets from decode order to presentation order (a near-sorted pass for most files)."""
+        if not self.ordered:
+            order = sorted(range(len(self.pts)), key=self.pts.__getitem__)
+            self.pts = array("d", (self.pts[i] for i in order))
+            self.size = array("q", (self.size[i] for i in order))
+            self.keyframe = array("b", (self.keyframe[i] for i in order))
+            self.stream = array("i", (self.stream[i] for i in order))
+            self.ordered = True
+            self._keyframe_pts = None
+
+    def window(self, start: float, end: float) -> "PacketTable":
+        """Return the packets between ``start`` and ``end`` (file-relative) re-based to ``start``."""
+        self.sort_by_pts()
+        bounds = (self.start_time + start - 1e-6, self.start_time + end - 1e-6)
+        lower = bisect.bisect_left(self.pts, bounds[0])
+        upper = max(lower, bisect.bisect_left(self.pts, bounds[1]))
+        keyframes = None
+        if self._keyframe_pts is not None:
+            first = bisect.bisect_left(self._keyframe_pts, bounds[0])
+            keyframes = self._keyframe_pts[first : max(first, bisect.bisect_left(self._keyframe_pts, bounds[1]))]
+        return PacketTable(
+            pts=self.pts[lower:upper],
+            size=self.size[lower:upper],
+            keyframe=self.keyframe[lower:upper],
+            stream=self.stream[lower:upper],
+            video_stream=self.video_stream,
+            start_time=self.start_time + start,
+            ordered=True,
+            _keyframe_pts=keyframes,
+        )
+
+    def keyframe_times(self) -> list[float]:
+        """Return sorted keyframe timestamps of the video stream relative to the file start."""
+        if self._keyframe_pts is None:
+            self._keyframe_pts = sorted(
+                self.pts[i] for i in range(len(self.pts)) if self.keyframe[i] and self.stream[i] == self.video_stream
+            )
+        return sorted({round(value - self.start_time, 6) for value in self._keyframe_pts})
+
+
+def content_fingerprint(video: pathlib.Path) -> bytes:
+    """Hash the size plus the first and last MiB; stable across renames and moves."""
+    digest = hashlib.blake2b(digest_size=16)
+    size = video.stat().st_size
+    digest.update(size.to_bytes(8, "little"))
+    with video.open("rb") as handle:
+        digest.update(handle.read(FINGERPRINT_SAMPLE_BYTES))
+        if size > FINGERPRINT_SAMPLE_BYTES:
+            handle.seek(max(FINGERPRINT_SAMPLE_BYTES, size - FINGERPRINT_SAMPLE_BYTES))
+            digest.update(handle.read(FINGERPRINT_SAMPLE_BYTES))
+    return digest.digest()
+
+
+def default_packet_index_dir() -> Optional[pathlib.Path]:
+    """Return the packet index directory, or None when ``MM_PACKET_INDEX`` disables it."""
+    override = os.environ.get("MM_PACKET_INDEX", "").strip()
+    if override.lower() in {"0", "off", "none", "false"}:
+        return None
+    if override:
+        return pathlib.Path(override).expanduser()
+    return _cache_root() / "index"
+
+
+def _packet_index_path(fingerprint: bytes) -> Optional[pathlib.Path]:
+    index_dir = default_packet_index_dir()
+    return index_dir / f"{fingerprint.hex()}.mmidx" if index_dir is not None else None
+
+
+def _little_endian(column: array) -> bytes:
+    if sys.byteorder == "little":
+        return column.tobytes()
+    swapped = array(column.typecode, column)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def save_packet_index(table: PacketTable, fingerprint: bytes) -> Optional[pathlib.Path]:
+    """
+    Persist ``table`` as a ``.mmidx`` file: a fixed header followed by raw
+    little-endian columns (float64 pts, int64 size, int32 stream, int8
+    keyframe) in pts order, so it can be memory-mapped or read with
+    ``numpy.frombuffer``.
+    """
+    path = _packet_index_path(fingerprint)
+    if path is None:
+        return None
+    table.sort_by_pts()
+    header = PACKET_INDEX_HEADER.pack(
+        PACKET_INDEX_MAGIC, fingerprint, len(table), table.start_time, table.video_stream
+    )
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with temp_path.open("wb") as handle:
+            handle.write(header)
+            for column in (table.pts, table.size, table.stream, table.keyframe):
+                handle.write(_little_endian(column))
+        os.replace(temp_path, path)
+    except OSError:
+        return None
+    return path
+
+
+def load_packet_index(fingerprint: bytes) -> Optional[PacketTable]:
+    """
+    Load a packet table saved by ``save_packet_index``; None if missing or
+    stale. On little-endian hosts the columns are views over the mapped file,
+    so a hit costs no copying; the mapping lives as long as the table.
+    """
+    path = _packet_index_path(fingerprint)
+    if path is None:
+        return None
+    try:
+        with path.open("rb") as handle:
+            buf = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, stored, count, start_time, video_stream = PACKET_INDEX_HEADER.unpack_from(buf)
+        if magic != PACKET_INDEX_MAGIC or stored != fingerprint:
+            buf.close()
+            return None
+        view = memoryview(buf)
+        columns: list[array | memoryview] = []
+        offset = PACKET_INDEX_HEADER.size
+        for typecode, itemsize in (("d", 8), ("q", 8), ("i", 4), ("b", 1)):
+            end = offset + count * itemsize
+            if end > len(buf):
+                return None
+            if sys.byteorder == "little":
+                columns.append(view[offset:end].cast(typecode))
+            else:
+                column = array(typecode, view[offset:end].tobytes())
+                column.byteswap()
+                columns.append(column)
+            offset = end
+    except (OSError, ValueError, struct.error):
+        return None
+    pts, size, stream, keyframe = columns
+    return PacketTable(
+        pts=pts,
+        size=size,
+        keyframe=keyframe,
+        stream=stream,
+        video_stream=video_stream,
+        start_time=start_time,
+        ordered=True,
+    )
+
+
+def read_packet_table(video: pathlib.Path, probe: Optional[MediaProbe] = None) -> PacketTable:
+    """
+    Return packet timestamps, sizes and keyframe flags, from the persistent
+    packet index when this content was seen before, otherwise from a single
+    ffprobe pass whose result is then indexed.
+    """
+    try:
+        fingerprint: Optional[bytes] = content_fingerprint(video)
+    except OSError:
+        fingerprint = None
+    if fingerprint is not None:
+        indexed = load_packet_index(fingerprint)
+        if indexed is not None:
+            return indexed
+    if isinstance(video, RemoteMedia):
+        raise RuntimeError("scanning the packets of a URL would download all of it")
+
+    if probe is None:
+        probe = probe_media(video)
+    video_stream = next(
+        (
+            int(stream.get("index", 0))  # type: ignore[arg-type]
+            for stream in probe.streams
+            if stream.get("codec_type") == "video"
+            and not (stream.get("disposition") or {}).get("attached_pic")  # type: ignore[union-attr]
+        ),
+        -1,
+    )
+    if video_stream < 0:
+        raise RuntimeError(f"No video stream found in {video.name}.")
+    try:
+        start_time = float(probe.format.get("start_time") or 0.0)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        start_time = 0.0
+
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "packet=stream_index,pts_time,dts_time,size,flags",
+        "-of",
+        "compact=p=0",
+        str(video),
+    ]
+    table = PacketTable(
+        pts=array("d"),
+        size=array("q"),
+        keyframe=array("b"),
+        stream=array("i"),
+        video_stream=video_stream,
+        start_time=start_time,
+    )
+    last_time = 0.0
+
+    def add_packet(line: str) -> None:
+        nonlocal last_time
+        fields = dict(item.split("=", 1) for item in line.strip().split("|") if "=" in item)
+        if not fields:
+            return
+        try:
+            stream_index = int(fields.get("stream_index", "-1"))
+            size = int(fields.get("size", "0"))
+        except ValueError:
+            return
+        raw_time = fields.get("pts_time", "N/A")
+        if raw_time == "N/A":
+            raw_time = fields.get("dts_time", "N/A")
+        try:
+            packet_time = float(raw_time)
+        except ValueError:
+            packet_time = last_time
+        last_time = packet_time
+        table.pts.append(packet_time)
+        table.size.append(size)
+        table.keyframe.append(1 if "K" in fields.get("flags", "") else 0)
+        table.stream.append(stream_index)
+
+    try:
+        result = ENGINE.run(cmd, stdout_line=add_packet)
+    except FileNotFoundError as exc:  # pragma: no cover - handled elsewhere
+        raise RuntimeError("ffprobe not found on PATH.") from exc
+
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed to read packets (exit code {result.returncode}).")
+    if not len(table):
+        raise RuntimeError(f"ffprobe returned no packets for {video.name}.")
+    table.sort_by_pts()
+    if fingerprint is not None:
+        save_packet_index(table, fingerprint)
+    return table
+
+
+@dataclass
+class SplitPlan:
+    """Cut points chosen on keyframe boundaries plus the predicted size of every part."""
+
+    cut_times: list[float]
+    part_sizes: list[int]
+    budget_bytes: int
+    oversize_intervals: list[tuple[float, int]]
+
+    @property
+    def part_count(self) -> int:
+        return len(self.part_sizes)
+
+
+def plan_keyframe_cuts(
+    table: PacketTable,
+    target_bytes: float,
+    *,
+    fill_ratio: float = SPLIT_PLAN_FILL_RATIO,
+) -> SplitPlan:
+    """
+    Sum packet bytes per keyframe interval and choose cut times so every part
+    stays under ``target_bytes * fill_ratio``. The minimum part count is found
+    greedily; cuts are then re-balanced so parts come out roughly even.
+    """
+    keyframes = table.keyframe_times()
+    if not keyframes or keyframes[0] > 0:
+        keyframes.insert(0, 0.0)
+
+    interval_bytes = [0] * len(keyframes)
+    for i in range(len(table)):
+        relative = table.pts[i] - table.start_time
+        slot = bisect.bisect_right(keyframes, relative + 1e-6) - 1
+        interval_bytes[max(slot, 0)] += table.size[i]
+
+    budget = int(target_bytes * fill_ratio)
+    oversize = [
+        (keyframes[i], size) for i, size in enumerate(interval_bytes) if size > budget
+    ]
+
+    greedy_cuts: list[int] = []
+    running = 0
+    for i, size in enumerate(interval_bytes):
+        if running and running + size > budget:
+            greedy_cuts.append(i)
+            running = 0
+        running += size
+
+    part_total = len(greedy_cuts) + 1
+    cuts = greedy_cuts
+    if part_total > 1:
+        # Re-balance: cut where the running total crosses each even share.
+        total_bytes = sum(interval_bytes)
+        balanced: list[int] = []
+        running = 0
+        share_index = 1
+        for i, size in enumerate(interval_bytes):
+            if share_index < part_total and running >= total_bytes * share_index / part_total:
+                balanced.append(i)
+                share_index += 1
+            running += size
+        if len(balanced) == len(greedy_cuts) and all(
+            size <= budget for size in _part_sizes(interval_bytes, balanced)
+        ):
+            cuts = balanced
+
+    return SplitPlan(
+        cut_times=[keyframes[i] for i in cuts],
+        part_sizes=_part_sizes(interval_bytes, cuts),
+        budget_bytes=budget,
+        oversize_intervals=oversize,
+    )
+
+
+def _part_sizes(interval_bytes: list[int], cuts: list[int]) -> list[int]:
+    bounds = [0, *cuts, len(interval_bytes)]
+    return [sum(interval_bytes[bounds[i] : bounds[i + 1]]) for i in range(len(bounds) - 1)]
+
+
+def _segment_time_delta(probe: MediaProbe) -> float:
+    """Half a frame duration, so ``-segment_times`` snaps onto the planned keyframes."""
+    for stream in probe.streams:
+        if stream.get("codec_type") != "video":
+            continue
+        raw = str(stream.get("avg_frame_rate") or stream.get("r_frame_rate") or "")
+        num, _, den = raw.partition("/")
+        try:
+            fps = float(num) / float(den or 1)
+        except (ValueError, ZeroDivisionError):
+            break
+        if fps > 0:
+            return 0.5 / fps
+        break
+    return 0.02
+
+
+def prune_trailing_empty_segments(
     segments: list[pathlib.Path],
     log: Callable[[str], None],
     *,
+    durations: Optional[list[float]] = None,
     duration_threshold: float = 0.5,
     size_threshold: int = 512 * 1024,
 ) -> int:
@@ -477,23 +2334,30 @@ def prune_trailing_empty_segments(
     Drop trailing segments that contain no real video. FFmpeg occasionally emits
     a final container with headers only; those appear as near-zero duration and
     very small size. We only touch the newest outputs so we do not interfere
-    with pre-existing files.
+    with pre-existing files. ``durations`` (from the segment list) avoids
+    probing each small part.
     """
     if len(segments) <= 1:
         return 0
 
     removed = 0
-    for path in reversed(segments):
+    for position in range(len(segments) - 1, -1, -1):
+        path = segments[position]
         try:
             size = path.stat().st_size
         except OSError:
             continue
 
         if size == 0 or size <= size_threshold:
-            try:
-                duration = run_ffprobe_duration(path) if size else 0.0
-            except Exception:
+            if not size:
                 duration = 0.0
+            elif durations is not None:
+                duration = durations[position]
+            else:
+                try:
+                    duration = run_ffprobe_duration(path)
+                except Exception:
+                    duration = 0.0
             if size == 0 or duration <= duration_threshold:
                 try:
                     size_mb = size / (1024 * 1024)
@@ -513,14 +2377,428 @@ def prune_trailing_empty_segments(
     return removed
 
 
+@dataclass
+class SplitSegment:
+    """A produced part together with the source time range it covers."""
+
+    path: pathlib.Path
+    start: float
+    end: float
+
+
+def segment_list_args(list_path: pathlib.Path) -> list[str]:
+    """Ask the segment muxer to record every finished part in a CSV list."""
+    return ["-segment_list", str(list_path), "-segment_list_type", "csv"]
+
+
+def read_segment_list(list_path: pathlib.Path) -> list[SplitSegment]:
+    """
+    Parse a segment muxer CSV list (``name,start,end`` per finished part).
+    Parts are resolved next to the list and times are re-based so the first
+    part starts at zero.
+    """
+    segments: list[SplitSegment] = []
+    try:
+        handle = list_path.open(newline="", encoding="utf-8")
+    except FileNotFoundError:
+        return segments
+    with handle:
+        for row in csv.reader(handle):
+            if len(row) < 3:
+                continue
+            try:
+                start, end = float(row[1]), float(row[2])
+            except ValueError:
+                continue
+            segments.append(SplitSegment(list_path.parent / row[0], start, end))
+    if segments:
+        origin = segments[0].start
+        for segment in segments:
+            segment.start = max(segment.start - origin, 0.0)
+            segment.end = max(segment.end - origin, segment.start)
+    return segments
+
+
+def _finish_segment_list(
+    list_path: pathlib.Path,
+    log: Callable[[str], None],
+    duration: float,
+) -> list[SplitSegment]:
+    """Read and remove a segment list, drop empty trailing parts and stretch the last range to ``duration``."""
+    try:
+        segments = read_segment_list(list_path)
+    finally:
+        try:
+            list_path.unlink()
+        except OSError:
+            pass
+    removed = prune_trailing_empty_segments(
+        [segment.path for segment in segments],
+        log,
+        durations=[segment.end - segment.start for segment in segments],
+    )
+    if removed:
+        plural = "s" if removed != 1 else ""
+        log(f"Removed {removed} trailing empty segment{plural}.")
+        segments = segments[: len(segments) - removed]
+    if segments:
+        segments[-1].end = max(segments[-1].end, duration)
+    return segments
+
+
+def _raise_if_unsplittable(plan: SplitPlan, target_bytes: float, target_size_mb: float) -> None:
+    unsplittable = [
+        (start, size)
+        for start, size in plan.oversize_intervals
+        if size > target_bytes * MAX_SEGMENT_OVERSHOOT_RATIO
+    ]
+    if unsplittable:
+        start, size = max(unsplittable, key=lambda item: item[1])
+        raise RuntimeError(
+            f"Keyframe interval at {format_timespan(start)} holds {size / (1024 * 1024):.2f} MB, "
+            f"more than the {target_size_mb:.2f} MB target; stream copy cannot cut inside it. "
+            "Consider increasing the target size or re-encoding with shorter keyframe intervals."
+        )
+
+
+def segment_overshoot_watch(list_path: pathlib.Path, limit_bytes: float) -> Callable[[], Optional[str]]:
+    """Return an ``abort_check`` that flags the first finished part above ``limit_bytes``."""
+    checked = 0
+
+    def check() -> Optional[str]:
+        nonlocal checked
+        finished = read_segment_list(list_path)
+        for segment in finished[checked:]:
+            try:
+                size = segment.path.stat().st_size
+            except OSError:
+                return None
+            if size > limit_bytes:
+                return f"{segment.path.name} finished at {size / (1024 * 1024):.2f} MB"
+            checked += 1
+        return None
+
+    return check
+
+
+def build_segment_command(
+    video: pathlib.Path,
+    output_pattern: pathlib.Path,
+    segment_args: list[str],
+    *,
+    start: Optional[float] = None,
+    length: Optional[float] = None,
+    segment_list: Optional[pathlib.Path] = None,
+    start_number: int = 1,
+) -> list[str]:
+    """Return a stream-copy segment muxer command, optionally limited to a time range."""
+    cmd = ["ffmpeg", "-hide_banner", "-y"]
+    if start is not None:
+        cmd.extend(["-ss", f"{start:.6f}"])
+    if length is not None:
+        cmd.extend(["-t", f"{length:.6f}"])
+    cmd.extend(
+        [
+            "-i",
+            str(video),
+            "-c",
+            "copy",
+            "-map",
+            "0",
+            "-f",
+            "segment",
+            *segment_args,
+            *(segment_list_args(segment_list) if segment_list is not None else []),
+            "-reset_timestamps",
+            "1",
+            "-segment_start_number",
+            str(start_number),
+            str(output_pattern),
+        ]
+    )
+    return cmd
+
+
+def segment_time_ranges(
+    parts: list[pathlib.Path],
+    planned_cuts: Optional[list[float]],
+    duration: float,
+) -> list[SplitSegment]:
+    """Map each produced part to its source time range, probing durations only when no plan exists."""
+    if planned_cuts is not None and len(planned_cuts) + 1 == len(parts):
+        bounds = [0.0, *planned_cuts, duration]
+        return [SplitSegment(part, bounds[i], bounds[i + 1]) for i, part in enumerate(parts)]
+
+    segments: list[SplitSegment] = []
+    position = 0.0
+    for part in parts:
+        try:
+            part_duration = run_ffprobe_duration(part)
+        except Exception:  # noqa: BLE001
+            part_duration = 0.0
+        segments.append(SplitSegment(part, position, position + part_duration))
+        position += part_duration
+    if segments:
+        segments[-1].end = max(segments[-1].end, duration)
+    return segments
+
+
+def repair_oversize_segments(
+    video: pathlib.Path,
+    segments: list[SplitSegment],
+    oversize_names: set[str],
+    target_bytes: float,
+    output_pattern: pathlib.Path,
+    log: Callable[[str], None],
+    *,
+    table: Optional[PacketTable] = None,
+    probe: Optional[MediaProbe] = None,
+    fill_ratio: float = SPLIT_PLAN_FILL_RATIO,
+    recut_from_part: bool = False,
+) -> tuple[list[SplitSegment], int]:
+    """
+    Re-cut only the time ranges of oversized parts into smaller pieces, keep
+    the parts that already fit, and renumber everything so the ``Part_#NNN``
+    sequence stays contiguous. With ``recut_from_part`` the oversized part
+    itself is split instead of seeking into ``video`` (used when the parts were
+    encoded rather than copied). Returns the new segment list and the number of
+    suppressed ffmpeg lines. Originals stay in place until every re-cut has
+    succeeded; if a re-cut or rename fails, every moved part is put back
+    under its old name and only the scratch pieces are deleted.
+    """
+    output_dir = output_pattern.parent
+    suffix = output_pattern.suffix
+    staging = pathlib.Path(tempfile.mkdtemp(prefix=".split-repair-", dir=output_dir))
+    suppressed_total = 0
+    rebuilt: list[SplitSegment] = []
+    replaced: list[pathlib.Path] = []
+    moves: list[tuple[pathlib.Path, pathlib.Path]] = []  # Undo log of completed renames.
+
+    def move(source: pathlib.Path, target: pathlib.Path) -> None:
+        source.rename(target)
+        moves.append((source, target))
+
+    try:
+        for index, segment in enumerate(segments, start=1):
+            if segment.path.name not in oversize_names:
+                rebuilt.append(segment)
+                continue
+
+            length = max(segment.end - segment.start, 0.0)
+            try:
+                part_size = segment.path.stat().st_size
+            except OSError:
+                part_size = int(target_bytes * 2)
+            sub_cuts: Optional[list[float]] = None
+            if table is not None and not recut_from_part:
+                sub_plan = plan_keyframe_cuts(
+                    table.window(segment.start, segment.end), target_bytes, fill_ratio=fill_ratio
+                )
+                if sub_plan.part_count < 2:
+                    sub_plan = plan_keyframe_cuts(
+                        table.window(segment.start, segment.end),
+                        sub_plan.part_sizes[0] / 2 / fill_ratio + 1,
+                        fill_ratio=fill_ratio,
+                    )
+                sub_cuts = sub_plan.cut_times
+            if sub_cuts:
+                segment_args = ["-segment_times", ",".join(f"{cut:.6f}" for cut in sub_cuts)]
+                if probe is not None:
+                    segment_args.extend(["-segment_time_delta", f"{_segment_time_delta(probe):.4f}"])
+            else:
+                pieces = max(2, math.ceil(part_size / (target_bytes * fill_ratio)))
+                segment_args = ["-segment_time", f"{max(length / pieces, 1.0):.2f}"]
+
+            sub_pattern = staging / f"repair-{index:03d}-%03d{suffix}"
+            sub_list = staging / f"repair-{index:03d}.csv"
+            log(
+                f"Re-cutting {segment.path.name} ({format_timespan(segment.start)}–"
+                f"{format_timespan(segment.end)}) from the source."
+            )
+            if recut_from_part:
+                recut_cmd = build_segment_command(
+                    segment.path, sub_pattern, segment_args, segment_list=sub_list
+                )
+            else:
+                recut_cmd = build_segment_command(
+                    video,
+                    sub_pattern,
+                    segment_args,
+                    start=segment.start,
+                    length=length if index < len(segments) else None,
+                    segment_list=sub_list,
+                )
+            suppressed_total += run_ffmpeg_command(recut_cmd, log)
+            sub_segments = _finish_segment_list(sub_list, log, length)
+            if not sub_segments:
+                raise RuntimeError(f"Re-cutting {segment.path.name} produced no output.")
+
+            replaced.append(segment.path)
+            for sub in sub_segments:
+                rebuilt.append(SplitSegment(sub.path, segment.start + sub.start, segment.start + sub.end))
+
+        # Park the oversized originals, then rename in two phases so new
+        # numbers never collide with parts still waiting to move.
+        for position, original in enumerate(replaced, start=1):
+            move(original, staging / f"orig-{position:05d}{suffix}")
+        staged: list[SplitSegment] = []
+        for position, segment in enumerate(rebuilt, start=1):
+            staged_path = staging / f"stage-{position:05d}{suffix}"
+            move(segment.path, staged_path)
+            staged.append(SplitSegment(staged_path, segment.start, segment.end))
+        renumbered: list[SplitSegment] = []
+        for position, segment in enumerate(staged, start=1):
+            final_path = pathlib.Path(str(output_pattern) % position)
+            move(segment.path, final_path)
+            renumbered.append(SplitSegment(final_path, segment.start, segment.end))
+    except BaseException:
+        for source, target in reversed(moves):
+            try:
+                target.rename(source)
+            except OSError:
+                log(f"Could not restore {source.name} from {target}.")
+        _remove_scratch(staging, "repair-*")
+        raise
+    _remove_scratch(staging, "*")
+
+    log(f"Renumbered parts: {len(segments)} → {len(renumbered)}.")
+    return renumbered, suppressed_total
+
+
+def _remove_scratch(directory: pathlib.Path, pattern: str) -> None:
+    """Delete files matching ``pattern`` in a scratch directory, then the directory if it is empty."""
+    for leftover in directory.glob(pattern):
+        try:
+            leftover.unlink()
+        except OSError:
+            pass
+    try:
+        directory.rmdir()
+    except OSError:
+        pass
+
+
+def enforce_segment_sizes(
+    video: pathlib.Path,
+    final_segments: list[pathlib.Path],
+    *,
+    target_size_mb: float,
+    output_pattern: pathlib.Path,
+    duration: float,
+    log: Callable[[str], None],
+    planned_cuts: Optional[list[float]] = None,
+    table: Optional[PacketTable] = None,
+    probe: Optional[MediaProbe] = None,
+    recut_from_part: bool = False,
+    max_attempts: int = 5,
+    segments: Optional[list[SplitSegment]] = None,
+) -> tuple[list[SplitSegment], int]:
+    """
+    Log part sizes and re-cut any part above the overshoot limit until all fit
+    or ``max_attempts`` is reached. ``segments`` carries the time ranges from
+    the segment list when available. Returns the final parts with their time
+    ranges and the number of suppressed ffmpeg lines.
+    """
+    target_bytes = target_size_mb * 1024 * 1024
+    fill_ratio = SPLIT_PLAN_FILL_RATIO
+    suppressed_total = 0
+    attempt = 1
+
+    while True:
+        segment_sizes: list[tuple[pathlib.Path, float]] = []
+        oversize_segments: list[tuple[pathlib.Path, float]] = []
+        for part in final_segments:
+            try:
+                size_bytes = part.stat().st_size
+            except OSError as exc:
+                log(f"Warning: could not determine size for {part.name} ({exc}).")
+                continue
+            size_mb = size_bytes / (1024 * 1024)
+            segment_sizes.append((part, size_mb))
+            log(f"{part.name}: {size_mb:.2f} MB")
+            if size_bytes > target_bytes * MAX_SEGMENT_OVERSHOOT_RATIO:
+                oversize_segments.append((part, size_mb))
+
+        if segment_sizes:
+            largest_part, largest_size = max(segment_sizes, key=lambda item: item[1])
+            smallest_part, smallest_size = min(segment_sizes, key=lambda item: item[1])
+            log(
+                "Segment size summary — largest: "
+                f"{largest_part.name} ({largest_size:.2f} MB); "
+                f"smallest: {smallest_part.name} ({smallest_size:.2f} MB)."
+            )
+
+        if not oversize_segments:
+            break
+
+        summary = ", ".join(f"{part.name}={size:.2f} MB" for part, size in oversize_segments[:5])
+        if len(oversize_segments) > 5:
+            summary += f", ... ({len(oversize_segments) - 5} more)"
+
+        if attempt >= max_attempts:
+            for part in final_segments:
+                try:
+                    part.unlink()
+                except OSError as exc:
+                    log(f"Warning: failed to remove oversize segment {part.name} ({exc}).")
+            raise RuntimeError(
+                f"Segment size limit exceeded after {attempt} attempt(s) (target {target_size_mb:.2f} MB): {summary}. "
+                "Consider increasing the target size or re-encoding to a lower bitrate."
+            )
+
+        if segments is None:
+            segments = segment_time_ranges(final_segments, planned_cuts, duration)
+        largest_size = max(size for _, size in oversize_segments)
+        # Container overhead was larger than the plan assumed; shrink the budget to match.
+        fill_ratio = min(fill_ratio * 0.95, fill_ratio * (target_size_mb / largest_size) * 0.98)
+        attempt += 1
+        log(
+            f"Re-cutting {len(oversize_segments)} oversized part(s) (attempt {attempt}); "
+            f"keeping {len(final_segments) - len(oversize_segments)} part(s) that fit."
+        )
+        oversize_names = {part.name for part, _ in oversize_segments}
+        segments, suppressed = repair_oversize_segments(
+            video,
+            segments,
+            oversize_names,
+            target_bytes,
+            output_pattern,
+            log,
+            table=table,
+            probe=probe,
+            fill_ratio=fill_ratio,
+            recut_from_part=recut_from_part,
+        )
+        suppressed_total += suppressed
+        final_segments = [segment.path for segment in segments]
+
+    if segments is None:
+        segments = segment_time_ranges(final_segments, planned_cuts, duration)
+    if EVENTS.enabled:
+        for index, segment in enumerate(segments, start=1):
+            EVENTS.emit(
+                "segment",
+                index=index,
+                path=str(segment.path),
+                size=segment.path.stat().st_size if segment.path.exists() else None,
+                start=segment.start,
+                end=segment.end,
+            )
+    return segments, suppressed_total
+
+
 def split_video(
     video: pathlib.Path,
     target_size_mb: float,
     output_dir: pathlib.Path,
     status_cb: StatusCallback = None,
     progress_cb: Optional[Callable[[float, float], None]] = None,
-) -> None:
-    """Run FFmpeg segment muxing with a rough duration per chunk."""
+) -> list[SplitSegment]:
+    """
+    Run FFmpeg segment muxing with cut points planned from the keyframe index,
+    falling back to a rough duration per chunk when packets cannot be read.
+    Returns the parts written, in order, with the source range each covers.
+    """
 
     def log(message: str) -> None:
         if status_cb:
@@ -539,167 +2817,971 @@ def split_video(
 
     if video_size <= target_bytes:
         log("The file is already within the requested size; nothing to split.")
-        return
+        return []
 
     duration = run_ffprobe_duration(video)
     log(f"Source duration: {format_timespan(duration)} ({duration:.2f}s).")
 
     output_dir.mkdir(parents=True, exist_ok=True)
-    existing_files = {child.name for child in output_dir.iterdir() if child.is_file()}
     suffix = video.suffix or ".mp4"
     output_pattern = output_dir / f"Part_#%03d{suffix}"
-    glob_pattern = output_pattern.name
-    if "%" in glob_pattern:
-        percent = glob_pattern.index("%")
-        end = percent
-        while end < len(glob_pattern) and glob_pattern[end].lower() != "d":
-            end += 1
-        if end < len(glob_pattern):
-            glob_pattern = f"{glob_pattern[:percent]}*{glob_pattern[end + 1 :]}"
+    segment_list = output_dir / f".{video.stem}.segments.csv"
     log(f"Output filename pattern: {output_pattern}")
     chunk_count = max(2, math.ceil(video_size / target_bytes))
-    log(f"Estimated chunk count: {chunk_count} part(s).")
 
-    attempt = 1
-    max_attempts = 5
+    probe = probe_media(video)
+    table: Optional[PacketTable] = None
+    fill_ratio = SPLIT_PLAN_FILL_RATIO
+    try:
+        index_started_at = time.time()
+        table = read_packet_table(video, probe)
+        log(
+            f"Indexed {len(table)} packets ({len(table.keyframe_times())} keyframes) "
+            f"in {time.time() - index_started_at:.1f}s."
+        )
+    except Exception as exc:  # noqa: BLE001
+        log(f"Packet index unavailable ({exc}); falling back to duration-based segments.")
+        log(f"Estimated chunk count: {chunk_count} part(s).")
+
+    predicted: Optional[tuple[int, int]] = None
+    delta = _segment_time_delta(probe)
+    segment_seconds = max(duration / chunk_count, 1.0)
+
+    def plan_from(start: float) -> list[str]:
+        """Segment muxer arguments covering ``start``..end of the source."""
+        nonlocal predicted
+        if table is None:
+            log(f"Segment duration target: {segment_seconds:.2f}s per chunk.")
+            return ["-segment_time", f"{segment_seconds:.2f}"]
+        remaining = table.window(start, duration) if start else table
+        plan = plan_keyframe_cuts(remaining, target_bytes, fill_ratio=fill_ratio)
+        if plan.part_count < 2 and not start:
+            plan = plan_keyframe_cuts(table, sum(table.size) / 2 / fill_ratio + 1, fill_ratio=fill_ratio)
+        _raise_if_unsplittable(plan, target_bytes, target_size_mb)
+        log(
+            f"Keyframe plan: {plan.part_count} part(s); "
+            f"largest predicted part {max(plan.part_sizes) / (1024 * 1024):.2f} MB."
+        )
+        kept_count = len(listed)
+        kept_largest = max((segment.path.stat().st_size for segment in listed), default=0)
+        predicted = (kept_count + plan.part_count, max(kept_largest, max(plan.part_sizes)))
+        if not plan.cut_times:
+            return ["-segment_time", f"{duration + 1:.0f}"]
+        return [
+            "-segment_times",
+            ",".join(f"{cut:.6f}" for cut in plan.cut_times),
+            "-segment_time_delta",
+            f"{delta:.4f}",
+        ]
+
+    listed: list[SplitSegment] = []
+    resume_at = 0.0
+    early_aborts = 0
     suppressed_total = 0
-    final_segments: list[pathlib.Path] = []
+    segment_args = plan_from(0.0)
+
+    if progress_cb and duration > 0:
+        progress_cb(0.0, duration)
 
     while True:
-        segment_seconds = max(duration / chunk_count, 1.0)
-        if attempt == 1:
-            log(f"Segment duration target: {segment_seconds:.2f}s per chunk.")
-        else:
+        ffmpeg_started_at = time.time()
+        cmd = build_segment_command(
+            video,
+            output_pattern,
+            segment_args,
+            start=resume_at or None,
+            segment_list=segment_list,
+            start_number=len(listed) + 1,
+        )
+        offset = resume_at
+        pass_progress = (
+            (lambda done, _total: progress_cb(offset + done, duration)) if progress_cb else None
+        )
+        # Stop watching after a few re-plans so a stubborn overshoot still ends in the repair pass.
+        watch = (
+            segment_overshoot_watch(segment_list, target_bytes * MAX_SEGMENT_OVERSHOOT_RATIO)
+            if early_aborts < 3
+            else None
+        )
+        try:
+            suppressed_total += run_ffmpeg_command(
+                cmd,
+                log,
+                total_duration=duration - resume_at,
+                progress_cb=pass_progress,
+                abort_check=watch,
+            )
+        except FFmpegAborted:
+            early_aborts += 1
+            finished = read_segment_list(segment_list)
+            segment_list.unlink(missing_ok=True)
+            limit = target_bytes * MAX_SEGMENT_OVERSHOOT_RATIO
+            sizes = [segment.path.stat().st_size if segment.path.exists() else 0 for segment in finished]
+            first_bad = next((i for i, size in enumerate(sizes) if size > limit), len(finished))
+            overshoot_size = sizes[first_bad] if first_bad < len(finished) else 0
+            # Drop the oversized part and everything written after it, including the part in progress.
+            number = len(listed) + first_bad + 1
+            while True:
+                leftover = pathlib.Path(str(output_pattern) % number)
+                if not leftover.exists():
+                    break
+                leftover.unlink()
+                number += 1
+            for segment in finished[:first_bad]:
+                listed.append(SplitSegment(segment.path, offset + segment.start, offset + segment.end))
+            if first_bad < len(finished):
+                resume_at = offset + finished[first_bad].start
+            elif listed:
+                resume_at = listed[-1].end
+            if overshoot_size:
+                shrink = min(0.95, target_bytes / overshoot_size * 0.98)
+                fill_ratio *= shrink
+                segment_seconds = max(segment_seconds * shrink, 1.0)
             log(
-                f"Retrying with smaller segments (attempt {attempt}) — "
-                f"targeting {chunk_count} part(s) at ~{segment_seconds:.2f}s each."
+                f"Kept {len(listed)} finished part(s); re-planning from {format_timespan(resume_at)} "
+                f"with fill ratio {fill_ratio:.3f}."
             )
+            segment_args = plan_from(resume_at)
+            continue
+        break
 
-        ffmpeg_started_at = time.time()
-
-        cmd = [
-            "ffmpeg",
-            "-hide_banner",
-            "-y",
-            "-i",
-            str(video),
-            "-c",
-            "copy",
-            "-map",
-            "0",
-            "-f",
-            "segment",
-            "-segment_time",
-            f"{segment_seconds:.2f}",
-            "-reset_timestamps",
-            "1",
-            "-segment_start_number",
-            "1",
-            str(output_pattern),
-        ]
-
-        if progress_cb and duration > 0:
-            progress_cb(0.0, duration)
+    ffmpeg_elapsed = time.time() - ffmpeg_started_at
+    log(f"FFmpeg processing finished in {ffmpeg_elapsed:.1f}s; collecting generated segments.")
+
+    for segment in _finish_segment_list(segment_list, log, duration - resume_at):
+        listed.append(SplitSegment(segment.path, resume_at + segment.start, resume_at + segment.end))
+    log(f"Segment list reports {len(listed)} part(s).")
+    final_segments, suppressed = enforce_segment_sizes(
+        video,
+        [segment.path for segment in listed],
+        target_size_mb=target_size_mb,
+        output_pattern=output_pattern,
+        duration=duration,
+        log=log,
+        table=table,
+        probe=probe,
+        segments=listed,
+    )
+    suppressed_total += suppressed
+    final_count = len(final_segments)
 
-        suppressed = run_ffmpeg_command(
-            cmd,
-            log,
-            total_duration=duration,
-            progress_cb=progress_cb,
+    if predicted is not None and final_segments:
+        largest = max(segment.path.stat().st_size for segment in final_segments)
+        log(
+            f"Prediction check: planned {predicted[0]} part(s), largest {predicted[1] / (1024 * 1024):.2f} MB; "
+            f"got {final_count}, largest {largest / (1024 * 1024):.2f} MB "
+            f"({(largest - predicted[1]) / predicted[1] * 100:+.1f}%)."
         )
-        suppressed_total += suppressed
 
-        ffmpeg_elapsed = time.time() - ffmpeg_started_at
-        log(f"FFmpeg processing finished in {ffmpeg_elapsed:.1f}s; collecting generated segments.")
-
-        produced_parts = sorted(
-            (
-                child
-                for child in output_dir.iterdir()
-                if child.is_file()
-                and (
-                    child.name not in existing_files
-                    or child.stat().st_mtime >= ffmpeg_started_at - 1.0
-                )
-                and child.match(glob_pattern)
-            ),
-            key=lambda item: item.name,
+    if suppressed_total:
+        log(
+            f"Suppressed {suppressed_total} corrupted packet warnings from FFmpeg; damaged frames were skipped."
         )
-        parts_count = len(produced_parts)
-        log(f"Detected {parts_count} candidate segment file(s).")
 
-        removed = prune_trailing_empty_segments(produced_parts, log)
-        if removed:
-            plural = "s" if removed != 1 else ""
-            log(f"Removed {removed} trailing empty segment{plural}.")
-        final_segments = [part for part in produced_parts if part.exists()]
-        final_count = len(final_segments)
+    overall_elapsed = time.time() - overall_started_at
+    log(f"Done! {final_count} part(s) saved under: {output_dir} ({overall_elapsed:.1f}s total).")
+    return final_segments
 
-        segment_sizes: list[tuple[pathlib.Path, float]] = []
-        oversize_segments: list[tuple[pathlib.Path, float]] = []
-        for part in final_segments:
+
+BATCH_IO = "io"
+BATCH_CPU = "cpu"
+
+GOVERNOR_POLL_SECONDS = 2.0
+GOVERNOR_MIN_THREADS = 2
+GOVERNOR_LOAD_WINDOW = 60.0  # Seconds; the decay constant of the 1-minute load average.
+GOVERNOR_DISK_BUSY = 0.85  # Fraction of wall time a device may spend servicing I/O before copies queue.
+GOVERNOR_MEMORY_RESERVE = {BATCH_CPU: 768 * 1024 * 1024, BATCH_IO: 128 * 1024 * 1024}
+
+
+@dataclass
+class JobSlot:
+    kind: str
+    threads: int
+    device: Optional[str]
+    ticket: Optional[pathlib.Path] = None
+
+
+def _usable_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def _load_average() -> float:
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return 0.0
+
+
+def _children_cpu_seconds() -> float:
+    """CPU time used by this process's finished children (the encoders it has already waited for)."""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _process_start(pid: int) -> Optional[int]:
+    """Start time of ``pid`` in clock ticks since boot, or None where ``/proc`` is unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="ascii", errors="replace") as handle:
+            fields = handle.read().rsplit(")", 1)[1].split()
+        return int(fields[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _available_memory() -> Optional[int]:
+    try:
+        with open("/proc/meminfo", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _block_device(path: pathlib.Path) -> Optional[str]:
+    """Return ``major:minor`` of the whole disk holding ``path`` (the partition's parent when known)."""
+    if isinstance(path, RemoteMedia):
+        return None
+    try:
+        dev = path.stat().st_dev
+    except OSError:
+        return None
+    key = f"{os.major(dev)}:{os.minor(dev)}"
+    sysfs = pathlib.Path("/sys/dev/block") / key
+    try:
+        if (sysfs / "partition").exists():
+            return (sysfs.resolve().parent / "dev").read_text().strip() or key
+    except OSError:
+        pass
+    return key
+
+
+def _disk_io_ticks() -> dict[str, int]:
+    """Milliseconds each block device has spent doing I/O, keyed by ``major:minor``."""
+    ticks: dict[str, int] = {}
+    try:
+        with open("/proc/diskstats", encoding="ascii") as handle:
+            for line in handle:
+                fields = line.split()
+                if len(fields) >= 13:
+                    ticks[f"{fields[0]}:{fields[1]}"] = int(fields[12])
+    except (OSError, ValueError):
+        pass
+    return ticks
+
+
+class ResourceGovernor:
+    """
+    Admit batch jobs according to host load rather than a fixed worker count.
+    CPU jobs wait until enough cores are idle and then receive a ``-threads``
+    budget so every admitted encoder together matches the core count. Copy
+    jobs are throttled per disk once it is saturated. Admitted jobs leave a
+    ticket file in the cache directory, so separate MediaTool processes on
+    the same host see each other's reservations before the load average
+    catches up. The load this process's own finished encodes left in the
+    load average is subtracted, and a job that runs alone gets no
+    ``-threads`` cap. Signals that the platform lacks (``/proc``,
+    ``getloadavg``) are treated as idle, so a job always starts when nothing
+    else holds a reservation. Peer tickets are re-read at most once per poll
+    interval and never while the admission lock is held.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.cores = _usable_cores()
+        self._cond = threading.Condition()
+        self._slots: list[JobSlot] = []
+        self._waiting: Counter[str] = Counter()
+        self._local = threading.local()
+        self._ticks: tuple[float, dict[str, int]] = (time.monotonic(), _disk_io_ticks())
+        self._last_copy: dict[str, float] = {}
+        self._ticket_ids = itertools.count(1)
+        self._own_load = (time.monotonic(), _children_cpu_seconds(), 0.0)
+        self._peers: tuple[float, list[dict[str, object]]] = (-math.inf, [])
+        self._peers_lock = threading.Lock()
+
+    @staticmethod
+    def _ticket_dir() -> pathlib.Path:
+        return _cache_root() / "slots"
+
+    def thread_budget(self) -> Optional[int]:
+        """``-threads`` value for the job running on this thread, or None to leave ffmpeg's default."""
+        slot: Optional[JobSlot] = getattr(self._local, "slot", None)
+        return slot.threads if slot is not None and slot.threads > 0 else None
+
+    def _peer_slots(self) -> list[dict[str, object]]:
+        peers: list[dict[str, object]] = []
+        try:
+            tickets = list(self._ticket_dir().glob("*.json"))
+        except OSError:
+            return peers
+        for ticket in tickets:
+            pid_text = ticket.name.split("-", 1)[0]
+            if not pid_text.isdigit() or int(pid_text) == os.getpid():
+                continue
+            try:
+                os.kill(int(pid_text), 0)
+            except ProcessLookupError:
+                ticket.unlink(missing_ok=True)  # Left behind by a crashed run.
+                continue
+            except OSError:
+                pass
+            try:
+                peer = json.loads(ticket.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            started = peer.get("started") if isinstance(peer, dict) else None
+            if started is not None and started != _process_start(int(pid_text)):
+                ticket.unlink(missing_ok=True)  # The PID now belongs to another process.
+                continue
+            peers.append(peer)
+        return peers
+
+    def _peer_snapshot(self) -> list[dict[str, object]]:
+        """``_peer_slots``, reused for one poll interval so waiting threads do not all rescan the tickets."""
+        with self._peers_lock:
+            taken_at, peers = self._peers
+        if time.monotonic() - taken_at < GOVERNOR_POLL_SECONDS:
+            return peers
+        peers = self._peer_slots()
+        with self._peers_lock:
+            self._peers = (time.monotonic(), peers)
+        return peers
+
+    def _own_recent_load(self) -> float:
+        """
+        Estimate how much of the 1-minute load average this process's own
+        finished encodes account for, decayed the same way the kernel does.
+        """
+        now = time.monotonic()
+        cpu = _children_cpu_seconds()
+        then, previous_cpu, estimate = self._own_load
+        elapsed = now - then
+        if elapsed > 0:
+            decay = math.exp(-elapsed / GOVERNOR_LOAD_WINDOW)
+            estimate = estimate * decay + (cpu - previous_cpu) / elapsed * (1 - decay)
+            self._own_load = (now, cpu, estimate)
+        return estimate
+
+    def _disk_busy(self, device: str) -> float:
+        now = time.monotonic()
+        current = _disk_io_ticks()
+        then, previous = self._ticks
+        if now - then >= GOVERNOR_POLL_SECONDS / 2:
+            self._ticks = (now, current)
+        if device not in current or device not in previous or now <= then:
+            return 0.0
+        return (current[device] - previous[device]) / 1000.0 / (now - then)
+
+    def _try_admit(
+        self, kind: str, device: Optional[str], concurrency: int, peers: list[dict[str, object]]
+    ) -> tuple[Optional[JobSlot], str]:
+        own = [slot for slot in self._slots if slot.kind == kind]
+        memory = _available_memory()
+        if own and memory is not None and memory < GOVERNOR_MEMORY_RESERVE[kind]:
+            return None, f"{memory / (1024 * 1024):.0f} MB memory available"
+
+        if kind == BATCH_CPU:
+            committed = sum(slot.threads for slot in self._slots) + sum(
+                int(peer.get("threads") or 0) for peer in peers  # type: ignore[call-overload]
+            )
+            load = max(0.0, _load_average() - self._own_recent_load())
+            spare = self.cores - max(committed, load)
+            if committed and spare < GOVERNOR_MIN_THREADS:
+                return None, f"load {load:.1f}, {committed} thread(s) reserved on {self.cores} core(s)"
+            expected = max(1, self._waiting[kind], concurrency - len(own))
+            if not committed:
+                if expected == 1:
+                    return JobSlot(kind, 0, device), ""  # Alone: leave ffmpeg's own thread choice.
+                spare = self.cores - load
+            # Split the idle cores between this job and the ones expected to start alongside it.
+            share = int(spare) // expected
+            threads = min(self.cores, max(GOVERNOR_MIN_THREADS if self.cores > 1 else 1, share))
+            return JobSlot(kind, threads, device), ""
+
+        if device is not None:
+            same_disk = sum(1 for slot in own if slot.device == device) + sum(
+                1 for peer in peers if peer.get("kind") == BATCH_IO and peer.get("device") == device
+            )
+            if same_disk:
+                busy = self._disk_busy(device)
+                if busy >= GOVERNOR_DISK_BUSY:
+                    return None, f"disk {device} busy {busy * 100:.0f}% with {same_disk} copy job(s)"
+                # Give the last copy time to ramp up before judging the disk again.
+                if time.monotonic() - self._last_copy.get(device, 0.0) < GOVERNOR_POLL_SECONDS:
+                    return None, f"disk {device} ramping up"
+        return JobSlot(kind, 0, device), ""
+
+    def _issue_ticket(self, slot: JobSlot) -> None:
+        ticket = self._ticket_dir() / f"{os.getpid()}-{next(self._ticket_ids)}.json"
+        try:
+            ticket.parent.mkdir(parents=True, exist_ok=True)
+            ticket.write_text(
+                json.dumps(
+                    {
+                        "kind": slot.kind,
+                        "threads": slot.threads,
+                        "device": slot.device,
+                        "started": _process_start(os.getpid()),
+                    }
+                ),
+                encoding="utf-8",
+            )
+        except OSError:
+            return
+        slot.ticket = ticket
+
+    @contextmanager
+    def admit(
+        self, kind: str, source: Optional[pathlib.Path] = None, log: StatusCallback = None, concurrency: int = 1
+    ) -> Iterator[JobSlot]:
+        """
+        Block until the host can take another ``kind`` job, then hold its slot
+        for the ``with`` body. ``concurrency`` is how many ``kind`` jobs the
+        caller means to run side by side, used to size the thread budget.
+        """
+        if not self.enabled:
+            yield JobSlot(kind, 0, None)
+            return
+        device = _block_device(source) if source is not None and kind == BATCH_IO else None
+        reported = ""
+        with self._cond:
+            self._waiting[kind] += 1
+        try:
+            while True:
+                # Ticket files are read outside the lock; admission and release never wait on them.
+                peers = self._peer_snapshot()
+                with self._cond:
+                    slot, reason = self._try_admit(kind, device, concurrency, peers)
+                    if slot is not None:
+                        self._waiting[kind] -= 1
+                        self._slots.append(slot)
+                        if device is not None:
+                            self._last_copy[device] = time.monotonic()
+                        break
+                    if log and reason != reported:
+                        log(f"Waiting to start {source.name if source else kind} job: {reason}.")
+                        reported = reason
+                    self._cond.wait(GOVERNOR_POLL_SECONDS)
+        except BaseException:
+            with self._cond:
+                self._waiting[kind] -= 1
+            raise
+        self._issue_ticket(slot)
+        previous = getattr(self._local, "slot", None)
+        self._local.slot = slot
+        try:
+            yield slot
+        finally:
+            self._local.slot = previous
+            if slot.ticket is not None:
+                slot.ticket.unlink(missing_ok=True)
+            with self._cond:
+                self._slots.remove(slot)
+                self._cond.notify_all()
+
+    def release_tickets(self) -> None:
+        with self._cond:
+            tickets = [slot.ticket for slot in self._slots if slot.ticket is not None]
+        for ticket in tickets:
+            ticket.unlink(missing_ok=True)
+
+
+GOVERNOR = ResourceGovernor()
+atexit.register(GOVERNOR.release_tickets)
+
+
+def encoder_thread_args() -> list[str]:
+    """``-threads`` for an encode started by an admitted CPU job; empty outside the governor."""
+    threads = GOVERNOR.thread_budget()
+    return ["-threads", str(threads)] if threads else []
+
+
+class BatchScheduler:
+    """
+    Run per-file batch jobs on worker pools. Stream-copy jobs go to an I/O pool
+    sized by ``jobs``; re-encodes go to a smaller CPU pool because every
+    encoder already spreads across several cores. With ``jobs == 1`` jobs run
+    inline in the calling thread, which keeps the sequential behaviour intact.
+    Either way each job passes ``GOVERNOR`` admission before it starts;
+    ``total`` (the batch size, when known up front) lets the first encodes
+    leave cores for the ones that follow. Jobs whose pool depends on a probe
+    go through ``submit_classified``, which probes on the I/O pool so the
+    submitting thread keeps scanning. The scheduler is safe to drive from a
+    GUI worker thread.
+    """
+
+    def __init__(
+        self,
+        jobs: int = 1,
+        cpu_jobs: Optional[int] = None,
+        status_cb: StatusCallback = None,
+        total: Optional[int] = None,
+    ) -> None:
+        self.jobs = max(1, jobs)
+        self.cpu_jobs = max(1, cpu_jobs if cpu_jobs else self.jobs // 2)
+        self.status_cb = status_cb
+        self._unfinished: Counter[str] = Counter()
+        self._remaining = total
+        self._unfinished_lock = threading.Lock()
+        self._pools: dict[str, ThreadPoolExecutor] = {}
+        self._pools_lock = threading.Lock()
+        self._futures: list[Future] = []
+        self._queued: list[Future] = []
+
+    def __enter__(self) -> "BatchScheduler":
+        return self
+
+    def __exit__(self, exc_type: Optional[type], *_exc: object) -> None:
+        if exc_type is not None:
+            # Interrupted while submitting or waiting: drop queued jobs and stop running children.
+            for future in (*self._futures, *self._queued):
+                future.cancel()
+            ENGINE.cancel_all()
+        self.shutdown()
+
+    def _pool(self, kind: str) -> ThreadPoolExecutor:
+        with self._pools_lock:
+            pool = self._pools.get(kind)
+            if pool is None:
+                workers = self.cpu_jobs if kind == BATCH_CPU else self.jobs
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"mm-{kind}")
+                self._pools[kind] = pool
+            return pool
+
+    def _run(self, kind: str, source: Optional[pathlib.Path], fn: Callable[..., None], *args: object) -> None:
+        workers = 1 if self.jobs <= 1 else self.cpu_jobs if kind == BATCH_CPU else self.jobs
+        with self._unfinished_lock:
+            pending = self._unfinished[kind] if self._remaining is None else self._remaining
+        try:
+            with GOVERNOR.admit(kind, source, self.status_cb, min(workers, pending)):
+                return fn(*args)
+        finally:
+            with self._unfinished_lock:
+                self._unfinished[kind] -= 1
+                if self._remaining is not None:
+                    self._remaining -= 1
+
+    def submit(
+        self, kind: str, fn: Callable[..., None], *args: object, source: Optional[pathlib.Path] = None
+    ) -> Future:
+        """
+        Queue ``fn(*args)`` on the pool for ``kind`` (``BATCH_IO`` or ``BATCH_CPU``).
+        ``source`` is the file the job reads, used to throttle copies per disk.
+        """
+        with self._unfinished_lock:
+            self._unfinished[kind] += 1
+        if self.jobs <= 1:
+            future: Future = Future()
+            try:
+                future.set_result(self._run(kind, source, fn, *args))
+            except Exception as exc:  # noqa: BLE001
+                future.set_exception(exc)
+        else:
+            future = self._pool(kind).submit(self._run, kind, source, fn, *args)
+        self._futures.append(future)
+        return future
+
+    def submit_classified(
+        self,
+        classify: Callable[[], str],
+        fn: Callable[..., None],
+        *args: object,
+        source: Optional[pathlib.Path] = None,
+    ) -> Future:
+        """
+        Like ``submit``, but the pool is picked by ``classify()`` (which may
+        probe the file) on an I/O worker, so the caller is not held up by it.
+        The returned future settles when ``fn`` finishes.
+        """
+        if self.jobs <= 1:
+            return self.submit(classify(), fn, *args, source=source)
+        job: Future = Future()
+
+        def settle(inner: Future) -> None:
+            if inner.cancelled():
+                job.set_exception(CancelledError())
+            elif inner.exception() is not None:
+                job.set_exception(inner.exception())
+            else:
+                job.set_result(inner.result())
+
+        def dispatch() -> None:
+            if not job.set_running_or_notify_cancel():
+                return
+            try:
+                kind = classify()
+                with self._unfinished_lock:
+                    self._unfinished[kind] += 1
+                inner = self._pool(kind).submit(self._run, kind, source, fn, *args)
+            except BaseException as exc:  # noqa: BLE001
+                job.set_exception(exc)
+                return
+            self._queued.append(inner)
+            inner.add_done_callback(settle)
+
+        self._queued.append(self._pool(BATCH_IO).submit(dispatch))
+        self._futures.append(job)
+        return job
+
+    def results(self) -> list[Optional[BaseException]]:
+        """Wait for every submitted job; return each job's exception (or None) in submission order."""
+        errors: list[Optional[BaseException]] = []
+        for future in self._futures:
+            try:
+                future.result()
+            except Exception as exc:  # noqa: BLE001
+                errors.append(exc)
+            else:
+                errors.append(None)
+        return errors
+
+    def shutdown(self) -> None:
+        # Classifying workers may still open a pool while earlier ones drain.
+        while True:
+            with self._pools_lock:
+                if not self._pools:
+                    break
+                _kind, pool = self._pools.popitem()
+            pool.shutdown(wait=True)
+
+
+JOURNAL_NAME = ".mm-journal.jsonl"
+
+
+class JobJournal:
+    """
+    Append-only record of a batch run, kept as ``.mm-journal.jsonl`` in the
+    output directory. Each input gets a ``started`` line naming where it
+    writes and a ``done`` line listing its outputs with content checksums.
+    A rerun with the same settings skips inputs whose outputs are still
+    intact, deletes whatever an interrupted job left half-written, and
+    reuses the output names reserved earlier. Size and mtime are stored
+    next to every checksum, so unchanged files are recognised from a
+    ``stat`` alone and only touched files are hashed again. With
+    ``resume=False`` old records are ignored but new ones are still
+    appended.
+    """
+
+    def __init__(self, directory: pathlib.Path, settings: dict[str, object], resume: bool = True) -> None:
+        self.directory = directory
+        self.path = directory / JOURNAL_NAME
+        self.settings = json.loads(json.dumps(settings))
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+        self._produced: dict[str, dict] = {}
+        if resume:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            with self.path.open(encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn last line from a crashed run.
+                    if isinstance(record, dict) and record.get("settings") == self.settings:
+                        self._remember(record)
+        except OSError:
+            pass
+
+    def _remember(self, record: dict) -> None:
+        self._entries[record["source"]] = record
+        if record.get("stage") == "done":
+            for output in record.get("outputs") or []:
+                self._produced[str(self._absolute(output["path"]))] = record
+
+    @staticmethod
+    def _key(path: pathlib.Path) -> str:
+        return str(path.resolve())
+
+    def _relative(self, path: pathlib.Path) -> str:
+        try:
+            return str(path.resolve().relative_to(self.directory.resolve()))
+        except ValueError:
+            return str(path.resolve())
+
+    def _absolute(self, text: str) -> pathlib.Path:
+        return (self.directory / text).resolve()
+
+    @staticmethod
+    def _stat(path: pathlib.Path) -> Optional[list[int]]:
+        try:
+            info = path.stat()
+        except OSError:
+            return None
+        return [info.st_size, info.st_mtime_ns]
+
+    def _checksum(self, path: pathlib.Path, recorded: Optional[str], recorded_stat: object) -> str:
+        if recorded and recorded_stat is not None and recorded_stat == self._stat(path):
+            return recorded
+        return content_fingerprint(path).hex()
+
+    def known_fingerprint(self, source: pathlib.Path) -> Optional[str]:
+        """Fingerprint the journal holds for ``source`` if its size and mtime still match; never reads the file."""
+        key = self._key(source)
+        current = self._stat(source)
+        record = self._entries.get(key)
+        if record is not None and record.get("stat") is not None and record.get("stat") == current:
+            return record["fingerprint"]
+        produced = self._produced.get(key)
+        if produced is not None:
+            for output in produced.get("outputs") or []:
+                if str(self._absolute(output["path"])) == key and output.get("stat") == current:
+                    return output.get("checksum")
+        return None
+
+    def fingerprint(self, source: pathlib.Path) -> str:
+        """Content fingerprint of ``source``, reused from the journal while its size and mtime are unchanged."""
+        return self.known_fingerprint(source) or content_fingerprint(source).hex()
+
+    def reserved_targets(self) -> set[pathlib.Path]:
+        """Every destination reserved by an earlier run, so new inputs cannot claim one."""
+        return {self._absolute(record["target"]) for record in self._entries.values() if record.get("target")}
+
+    def reserved(self, source: pathlib.Path) -> Optional[pathlib.Path]:
+        """Destination an earlier run recorded for ``source``, if any."""
+        record = self._entries.get(self._key(source))
+        return self._absolute(record["target"]) if record and record.get("target") else None
+
+    def finished(self, source: pathlib.Path, fingerprint: str) -> Optional[list[pathlib.Path]]:
+        """
+        Outputs of a completed earlier run for ``source``, or None when it
+        must be (re)done. A source that is itself a recorded output (an
+        in-place conversion) also counts as finished. Every output must still
+        match its checksum.
+        """
+        record = self._entries.get(self._key(source))
+        if record is None or record.get("stage") != "done" or record.get("fingerprint") != fingerprint:
+            record = self._produced.get(self._key(source))
+        if record is None:
+            return None
+        outputs: list[pathlib.Path] = []
+        for output in record.get("outputs") or []:
+            path = self._absolute(output["path"])
+            try:
+                if self._checksum(path, output.get("checksum"), output.get("stat")) != output.get("checksum"):
+                    return None
+            except OSError:
+                return None
+            outputs.append(path)
+        return outputs
+
+    def outputs(self, source: pathlib.Path) -> Optional[list[tuple[pathlib.Path, Optional[float]]]]:
+        """Outputs and durations of the last completed run for ``source``, or None when it never finished."""
+        record = self._entries.get(self._key(source))
+        if record is None or record.get("stage") != "done":
+            return None
+        return [(self._absolute(output["path"]), output.get("duration")) for output in record.get("outputs") or []]
+
+    def recover(self, source: pathlib.Path, log: Callable[[str], None]) -> None:
+        """Delete what an interrupted earlier attempt at ``source`` left behind."""
+        record = self._entries.get(self._key(source))
+        if record is None or record.get("stage") != "started" or not record.get("target"):
+            return
+        target = self._absolute(record["target"])
+        if target.is_dir():
+            leftovers = [*target.glob("Part_#*"), *target.glob(f".{source.stem}.*")]
+        else:
+            leftovers = [target] if target.is_file() and target != source.resolve() else []
+        removed = 0
+        for leftover in leftovers:
             try:
-                size_bytes = part.stat().st_size
-            except OSError as exc:
-                log(f"Warning: could not determine size for {part.name} ({exc}).")
+                leftover.unlink()
+                removed += 1
+            except OSError:
                 continue
-            size_mb = size_bytes / (1024 * 1024)
-            segment_sizes.append((part, size_mb))
-            log(f"{part.name}: {size_mb:.2f} MB")
-            if size_bytes > target_bytes * MAX_SEGMENT_OVERSHOOT_RATIO:
-                oversize_segments.append((part, size_mb))
+        if removed:
+            log(f"Removed {removed} half-written file(s) left by an interrupted run.")
+
+    def record(
+        self,
+        source: pathlib.Path,
+        stage: str,
+        fingerprint: str,
+        target: pathlib.Path,
+        outputs: Iterable[SplitSegment] = (),
+    ) -> None:
+        entry = {
+            "source": self._key(source),
+            "stage": stage,
+            "fingerprint": fingerprint,
+            "stat": self._stat(source),
+            "settings": self.settings,
+            "target": self._relative(target),
+            "outputs": [
+                {
+                    "path": self._relative(output.path),
+                    "checksum": content_fingerprint(output.path).hex(),
+                    "stat": self._stat(output.path),
+                    "duration": round(output.end - output.start, 3),
+                }
+                for output in outputs
+            ],
+            "time": round(time.time(), 3),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._remember(entry)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write(line)
+                handle.flush()
+                os.fsync(handle.fileno())
 
-        if segment_sizes:
-            largest_part, largest_size = max(segment_sizes, key=lambda item: item[1])
-            smallest_part, smallest_size = min(segment_sizes, key=lambda item: item[1])
-            log(
-                "Segment size summary — largest: "
-                f"{largest_part.name} ({largest_size:.2f} MB); "
-                f"smallest: {smallest_part.name} ({smallest_size:.2f} MB)."
-            )
 
-        if not oversize_segments:
-            break
+@dataclass
+class ManifestOptions:
+    """Where a batch writes its Media-Manager manifest fragment, and the series/category it files under."""
 
-        summary = ", ".join(f"{part.name}={size:.2f} MB" for part, size in oversize_segments[:5])
-        if len(oversize_segments) > 5:
-            summary += f", ... ({len(oversize_segments) - 5} more)"
+    path: pathlib.Path
+    title: str = ""
+    category: str = "Season 1"
 
-        for part in final_segments:
-            try:
-                part.unlink()
-            except OSError as exc:
-                log(f"Warning: failed to remove oversize segment {part.name} ({exc}).")
 
-        if attempt >= max_attempts:
-            raise RuntimeError(
-                f"Segment size limit exceeded after {attempt} attempt(s) (target {target_size_mb:.2f} MB): {summary}. "
-                "Consider increasing the target size or re-encoding to a lower bitrate."
-            )
+def manifest_episode(
+    title: str, parts: list[tuple[pathlib.Path, Optional[float]]], base_dir: pathlib.Path
+) -> dict[str, object]:
+    """
+    Build a Media-Manager episode entry from finished outputs and the
+    durations recorded while producing them. Several parts become a
+    ``separated`` item with per-part ``sources``, as the Creator writes them.
+    ``src`` values are relative to ``base_dir`` (the manifest's folder).
+    """
+    entries: list[dict[str, object]] = []
+    for index, (path, duration) in enumerate(parts, start=1):
+        entry: dict[str, object] = {
+            "title": f"Part {index}",
+            "src": pathlib.Path(os.path.relpath(path, base_dir)).as_posix(),
+        }
+        try:
+            entry["fileSizeBytes"] = path.stat().st_size
+        except OSError:
+            pass
+        if duration and duration > 0:
+            entry["durationSeconds"] = round(duration)
+        entries.append(entry)
+
+    total_size = sum(int(entry.get("fileSizeBytes") or 0) for entry in entries)  # type: ignore[call-overload]
+    durations = [entry.get("durationSeconds") for entry in entries]
+    episode: dict[str, object] = {"title": title}
+    if len(entries) == 1:
+        episode["src"] = entries[0]["src"]
+    if total_size:
+        episode["fileSizeBytes"] = total_size
+    if durations and all(durations):
+        episode["durationSeconds"] = sum(durations)  # type: ignore[arg-type]
+    if len(entries) > 1:
+        if total_size:
+            episode["ItemfileSizeBytes"] = total_size
+        episode["separated"] = 1
+        episode["sources"] = entries
+    return episode
+
+
+def write_manifest_fragment(options: ManifestOptions, episodes: list[dict[str, object]]) -> None:
+    """
+    Merge ``episodes`` into the category named by ``options`` in the fragment
+    at ``options.path`` (replacing entries with the same title) and refresh
+    the series totals the same way the duration backfill tool does: the
+    total duration is only written when every episode has one.
+    """
+    data: dict[str, object] = {}
+    try:
+        loaded = json.loads(options.path.read_text(encoding="utf-8"))
+        if isinstance(loaded, dict):
+            data = loaded
+    except (OSError, ValueError):
+        pass
+    data["title"] = options.title or data.get("title") or options.path.stem
+    categories = data.get("categories")
+    if not isinstance(categories, list):
+        categories = []
+    data["categories"] = categories
+    category = next(
+        (item for item in categories if isinstance(item, dict) and item.get("category") == options.category), None
+    )
+    if category is None:
+        category = {"category": options.category, "episodes": []}
+        categories.append(category)
+    existing = category.get("episodes") if isinstance(category.get("episodes"), list) else []
+    replaced = {episode["title"] for episode in episodes}
+    category["episodes"] = [
+        item for item in existing if not (isinstance(item, dict) and item.get("title") in replaced)
+    ] + episodes
+
+    all_episodes = [
+        item
+        for group in categories
+        if isinstance(group, dict) and isinstance(group.get("episodes"), list)
+        for item in group["episodes"]
+        if isinstance(item, dict)
+    ]
+    data["LatestTime"] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+    total_size = sum(int(item.get("fileSizeBytes") or 0) for item in all_episodes)
+    if total_size:
+        data["totalFileSizeBytes"] = total_size
+    if all_episodes and all(item.get("durationSeconds") for item in all_episodes):
+        data["totalDurationSeconds"] = round(sum(item["durationSeconds"] for item in all_episodes))
+    else:
+        data.pop("totalDurationSeconds", None)
 
-        largest_size = max(size for _, size in oversize_segments)
-        overshoot_ratio = max(1.2, (largest_size / target_size_mb) * 1.1)
-        chunk_count = max(chunk_count + 1, math.ceil(chunk_count * overshoot_ratio))
-        attempt += 1
+    options.path.parent.mkdir(parents=True, exist_ok=True)
+    staged = options.path.with_name(f".{options.path.name}.tmp")
+    staged.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    os.replace(staged, options.path)
 
-    if suppressed_total:
-        log(
-            f"Suppressed {suppressed_total} corrupted packet warnings from FFmpeg; damaged frames were skipped."
-        )
 
-    overall_elapsed = time.time() - overall_started_at
-    log(f"Done! {final_count} part(s) saved under: {output_dir} ({overall_elapsed:.1f}s total).")
+def _write_batch_manifest(
+    options: ManifestOptions, videos: list[pathlib.Path], journal: JobJournal, log: Callable[[str], None]
+) -> None:
+    base_dir = options.path.parent.resolve()
+    episodes: list[dict[str, object]] = []
+    for video in videos:
+        outputs = journal.outputs(video)
+        if outputs is None:
+            continue
+        if not outputs:
+            # Already within the size limit, so the source itself is the episode.
+            if isinstance(video, RemoteMedia) or not video.exists():
+                continue
+            outputs = [(video.resolve(), run_ffprobe_duration(video))]
+        episodes.append(manifest_episode(video.stem, outputs, base_dir))
+    if not episodes:
+        log("No finished videos to add to the manifest fragment.")
+        return
+    write_manifest_fragment(options, episodes)
+    log(f"Wrote {len(episodes)} episode(s) to manifest fragment: {options.path}")
 
 
 def split_source(
-    source: pathlib.Path,
+    source: pathlib.Path | RemoteMedia,
     target_size_mb: float,
     output_dir: pathlib.Path,
     status_cb: StatusCallback = None,
     progress_cb: Optional[Callable[[pathlib.Path, float, float], None]] = None,
     delete_source: bool = False,
+    jobs: int = 1,
+    resume: bool = True,
+    manifest: Optional[ManifestOptions] = None,
+    scan: Optional[ScanFilter] = None,
 ) -> None:
-    """Split a single file or every supported file within a directory."""
+    """
+    Split a single file or every supported file within a directory, running up
+    to ``jobs`` files at once. Files are queued while ``scan`` is still
+    walking the directory. Progress is journaled in ``output_dir``; with
+    ``resume`` a rerun skips files that were already split. ``manifest``
+    writes a Media-Manager fragment from the parts' known sizes and durations.
+    A ``RemoteMedia`` source is split straight from its URL into
+    ``output_dir`` and is never deleted.
+    """
 
     def log(message: str) -> None:
         if status_cb:
@@ -707,8 +3789,14 @@ def split_source(
         else:
             print(message)
 
-    videos, ignored = collect_video_files(source)
-    if not videos:
+    ignored: list[IgnoredReason] = []
+    # Everything this batch writes, so a scan of the same tree never takes it for input.
+    written: set[pathlib.Path] = set()
+    if isinstance(source, pathlib.Path) and output_dir.resolve() != source.resolve():
+        written.add(output_dir.resolve())
+    multiple, found = stream_video_files(source, scan, ignored, written)
+    first = next(found, None)
+    if first is None:
         if ignored:
             skipped_summary = ", ".join(f"{path.name} ({reason})" for path, reason in ignored[:5])
             if len(ignored) > 5:
@@ -716,48 +3804,57 @@ def split_source(
             raise RuntimeError(f"No valid video files to split. Skipped {len(ignored)} item(s): {skipped_summary}")
         raise RuntimeError("No video files to split.")
 
-    source_type = "directory" if source.exists() and source.is_dir() else "file"
+    remote = isinstance(source, RemoteMedia)
+    source_type = "URL" if remote else "directory" if source.exists() and source.is_dir() else "file"
     log(f"Preparing to split {source_type}: {source}")
     log(f"Target chunk size: {target_size_mb:.2f} MB; output directory: {output_dir}")
-    if delete_source:
+    if delete_source and remote:
+        log("The source is a URL and will not be deleted.")
+    elif delete_source:
         log("Source file(s) will be deleted after successful splitting.")
 
-    total = len(videos)
-    multiple = total > 1
-
     if output_dir.exists() and not output_dir.is_dir():
         raise RuntimeError("Output path must refer to a directory, not a file.")
 
-    if ignored:
-        skipped_summary = ", ".join(f"{path.name} ({reason})" for path, reason in ignored[:5])
-        if len(ignored) > 5:
-            skipped_summary += f", ... ({len(ignored) - 5} more)"
-        log(f"Skipped {len(ignored)} item(s): {skipped_summary}")
-
     if multiple:
-        log(f"Found {total} videos to process in {source}.")
+        log(f"Scanning {source} and starting jobs as videos are found.")
     else:
-        log(f"Processing single video: {videos[0].name}")
+        log(f"Processing single video: {first.name}")
 
-    used_folder_names: set[str] = set()
+    journal = JobJournal(
+        output_dir,
+        {"mode": "split", "size_mb": target_size_mb, "fill_ratio": SPLIT_PLAN_FILL_RATIO},
+        resume=resume,
+    )
+    used_folders = journal.reserved_targets()
+    written.update(used_folders)
+    total: Optional[int] = None  # Known once the scan finishes.
     failures: list[tuple[pathlib.Path, str]] = []
+    outcomes: dict[pathlib.Path, str] = {}
     completed = 0
+    if jobs > 1 and multiple:
+        log(f"Running up to {jobs} split job(s) in parallel.")
+
+    def remove_source(video: pathlib.Path, message_cb: Callable[[str], None]) -> None:
+        if not delete_source or remote or not video.is_file():
+            return
+        try:
+            video.unlink()
+            if multiple:
+                message_cb("Deleted source file.")
+            else:
+                message_cb(f"Deleted source file: {video}")
+        except OSError as exc:
+            message_cb(f"Failed to delete source file ({exc}).")
 
-    for index, video in enumerate(videos, start=1):
+    def split_one(
+        index: int, video: pathlib.Path, video_output: pathlib.Path, fingerprint: Optional[str]
+    ) -> None:
         if multiple:
-            log(f"[{index}/{total}] Processing {video.name}")
+            log(f"[{index}/{total}] Processing {video.name}" if total else f"[{index}] Processing {video.name}")
             child_cb: StatusCallback = lambda msg, name=video.name: log(f"{name}: {msg}")
-            folder_name = video.stem or video.name
-            candidate = folder_name
-            counter = 1
-            while candidate in used_folder_names:
-                candidate = f"{folder_name}_{counter}"
-                counter += 1
-            used_folder_names.add(candidate)
-            video_output = output_dir / candidate
         else:
             child_cb = status_cb
-            video_output = output_dir
         message_cb = child_cb or log
 
         if progress_cb:
@@ -772,35 +3869,113 @@ def split_source(
             message_cb(f"Input size: {size_mb:.2f} MB")
         except OSError:
             message_cb("Could not determine file size before splitting.")
+        if fingerprint is None:
+            # New or touched input: hash it here rather than on the scanning thread.
+            fingerprint = journal.fingerprint(video)
+            done = journal.finished(video, fingerprint)
+            if done is not None:
+                message_cb(f"Already split into {len(done)} part(s) by an earlier run; skipping.")
+                outcomes[video] = "up to date"
+                remove_source(video, message_cb)
+                return
         message_cb(f"Planned output directory: {video_output}")
 
+        journal.recover(video, message_cb)
+        journal.record(video, "started", fingerprint, video_output)
         try:
-            split_video(
+            parts = split_video(
                 video,
                 target_size_mb,
                 video_output,
                 status_cb=child_cb,
                 progress_cb=progress_wrapper,
             )
-            completed += 1
         except Exception as exc:
             reason = str(exc) or exc.__class__.__name__
             log(f"Failed to split {video}: {reason}")
-            failures.append((video, reason))
-            continue
+            raise
+        journal.record(video, "done", fingerprint, video_output, parts)
+        outcomes[video] = f"split into {len(parts)} part(s)" if parts else "within size"
+        remove_source(video, message_cb)
+
+    videos: list[pathlib.Path] = []
+    submitted: list[pathlib.Path] = []
+    up_to_date = 0
+    with BatchScheduler(jobs, status_cb=log) as scheduler:
+        for index, video in enumerate(itertools.chain([first], found), start=1):
+            videos.append(video)
+            # Unchanged inputs are settled from a stat before any probing or scheduling;
+            # anything else is hashed by its own job.
+            fingerprint = journal.known_fingerprint(video)
+            done = journal.finished(video, fingerprint) if fingerprint is not None else None
+            if done is not None:
+                if not multiple:
+                    log(f"Already split into {len(done)} part(s) by an earlier run; skipping.")
+                outcomes[video] = "up to date"
+                remove_source(video, log)
+                up_to_date += 1
+                continue
+            reserved = journal.reserved(video)
+            if reserved is not None:
+                video_output = reserved
+            elif multiple:
+                # Mirror the source tree so the same stem in different folders cannot collide.
+                folder = output_dir / video.parent.relative_to(source) / (video.stem or video.name)
+                candidate = folder
+                counter = 1
+                while candidate.resolve() in used_folders:
+                    candidate = folder.with_name(f"{folder.name}_{counter}")
+                    counter += 1
+                used_folders.add(candidate.resolve())
+                written.add(candidate.resolve())
+                video_output = candidate
+            else:
+                video_output = output_dir
+            # Stream-copy splits are bound by disk throughput rather than CPU.
+            scheduler.submit(
+                BATCH_IO,
+                EVENTS.run_job,
+                "split",
+                video,
+                split_one,
+                index,
+                video,
+                video_output,
+                fingerprint,
+                source=video,
+            )
+            submitted.append(video)
+        total = len(videos)
+        if multiple:
+            log(f"Scan finished: found {total} videos to process in {source}.")
+        if ignored:
+            skipped_summary = ", ".join(f"{path.name} ({reason})" for path, reason in ignored[:5])
+            if len(ignored) > 5:
+                skipped_summary += f", ... ({len(ignored) - 5} more)"
+            log(f"Skipped {len(ignored)} item(s): {skipped_summary}")
 
-        if delete_source and video.is_file():
-            try:
-                video.unlink()
-                if multiple:
-                    message_cb("Deleted source file.")
-                else:
-                    message_cb(f"Deleted source file: {video}")
-            except OSError as exc:
-                message_cb(f"Failed to delete source file ({exc}).")
+        for video, error in zip(submitted, scheduler.results()):
+            if error is None and outcomes.get(video) == "up to date":
+                up_to_date += 1
+            elif error is None:
+                completed += 1
+            else:
+                reason = _failure_reason(error)
+                failures.append((video, reason))
+                outcomes[video] = f"failed: {reason}"
+
+    PROBE_CACHE.flush()
+    completed += up_to_date
+    videos.sort()
+    failures.sort()
+    if manifest is not None:
+        _write_batch_manifest(manifest, videos, journal, log)
 
     if multiple:
+        if up_to_date:
+            log(f"{up_to_date} video(s) were already split by an earlier run and were skipped.")
         log(f"Finished processing {completed} of {total} video(s).")
+        write_order_report(output_dir, source, outcomes, log)
 
     if failures:
         if len(failures) == 1 and completed == 0:
@@ -815,116 +3990,694 @@ def split_source(
 
 CONVERSION_FORMATS = ("mp4", "mkv", "webm")
 
+MP4_MOVFLAGS = {
+    "faststart": "+faststart",
+    # Fragmented mp4 writes the moov up front, so no second rewrite pass is needed.
+    "fragmented": "frag_keyframe+empty_moov+default_base_moof",
+}
+MP4_FASTSTART_SUFFIXES = {".mp4", ".m4v", ".mov"}
+MP4_MOOV_PATH_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+MP4_COPY_BUFFER = 16 * 1024 * 1024
+
+
+def build_conversion_command(
+    video: pathlib.Path,
+    target_format: str,
+    destination: pathlib.Path,
+    *,
+    prefer_fast: bool = True,
+    log: Optional[Callable[[str], None]] = None,
+    video_bitrate: Optional[int] = None,
+    plan: Optional[dict[str, object]] = None,
+    mp4_layout: str = "faststart",
+) -> list[str]:
+    """
+    Build an ffmpeg command that copies every stream the target container can
+    hold and transcodes only the streams that it cannot. With
+    ``prefer_fast=False`` audio and video are always re-encoded.
+    """
+    if target_format not in CONVERSION_FORMATS:
+        raise RuntimeError(f"Unsupported format: {target_format}")
+
+    if plan is None or not prefer_fast:
+        plan = plan_stream_copy(video, target_format, force_transcode=not prefer_fast)
+    actions = plan.get("streams") or []
+
+    cmd = ["ffmpeg", "-hide_banner", "-y", "-i", str(video)]
+
+    if not actions:
+        # Stream layout unknown (probe failed); fall back to mapping everything.
+        if log and plan.get("reason"):
+            log(f"Stream plan unavailable: {plan['reason']}. Re-encoding all streams.")
+        actions = [
+            {"index": None, "codec_type": "video", "action": "transcode",
+             "encoder": STREAM_ENCODERS.get(target_format, {}).get("video")},
+            {"index": None, "codec_type": "audio", "action": "transcode",
+             "encoder": STREAM_ENCODERS.get(target_format, {}).get("audio")},
+        ]
+
+    if log:
+        if plan.get("use_copy"):
+            log("Using stream copy — no re-encoding needed.")
+        elif plan.get("copy_video"):
+            log(f"Copying video; transcoding only incompatible streams ({plan.get('reason')}).")
+        elif plan.get("reason"):
+            log(f"Stream copy unavailable: {plan['reason']}. Re-encoding video.")
+        if plan.get("drop_subtitles"):
+            dropped = plan.get("dropped_subtitle_codecs", [])
+            detail = f" ({', '.join(dropped)})" if dropped else ""
+            log(f"Dropping subtitle stream(s) for compatibility{detail}.")
+
+    encodes = _append_stream_args(cmd, actions)
+    if "video" in encodes:
+        cmd.extend(video_encoder_args(target_format, video_bitrate, log))
+    if "audio" in encodes:
+        cmd.extend(audio_encoder_args(target_format))
+    if encodes:
+        cmd.extend(encoder_thread_args())
+
+    if target_format == "mp4":
+        cmd.extend(["-movflags", MP4_MOVFLAGS[mp4_layout]])
+
+    cmd.append(str(destination))
+    return cmd
+
+
+def _append_stream_args(
+    cmd: list[str],
+    actions: list[dict[str, object]],
+    *,
+    input_index: int = 0,
+    output_index: int = 0,
+    skip_types: tuple[str, ...] = (),
+) -> set[str]:
+    """Append ``-map``/``-c`` pairs for every kept stream; return the stream types being encoded."""
+    encodes: set[str] = set()
+    for item in actions:
+        codec_type = str(item["codec_type"])
+        if item["action"] == "drop" or codec_type in skip_types:
+            continue
+        if item["index"] is None:
+            cmd.extend(["-map", f"{input_index}:{codec_type[0]}:0?"])
+        else:
+            cmd.extend(["-map", f"{input_index}:{item['index']}"])
+        if item["action"] == "copy" or not item.get("encoder"):
+            cmd.extend([f"-c:{output_index}", "copy"])
+        else:
+            cmd.extend([f"-c:{output_index}", str(item["encoder"])])
+            encodes.add(codec_type)
+        output_index += 1
+    return encodes
+
+
+def video_encoder_args(
+    target_format: str,
+    video_bitrate: Optional[int],
+    log: Optional[Callable[[str], None]] = None,
+) -> list[str]:
+    """Rate-control options for the target format's video encoder."""
+    args: list[str] = []
+    if target_format == "mp4":
+        args.extend(["-preset", "ultrafast"])
+        fallback = ["-crf", "23"]
+        fallback_label = "CRF 23"
+    elif target_format == "webm":
+        args.extend(["-speed", "8"])
+        fallback = ["-b:v", "0", "-crf", "32"]
+        fallback_label = "CRF 32"
+    else:
+        return args
+
+    if video_bitrate and video_bitrate > 0:
+        bitrate_kbps = video_bitrate // 1000
+        args.extend(["-b:v", f"{bitrate_kbps}k"])
+        if log:
+            log(f"Using source video bitrate: {bitrate_kbps} kbps")
+    else:
+        args.extend(fallback)
+        if log:
+            log(f"Source bitrate unavailable, using {fallback_label}")
+    return args
+
+
+def audio_encoder_args(target_format: str) -> list[str]:
+    return ["-b:a", "160k" if target_format == "mp4" else "128k"]
+
+
+def plan_chunk_bounds(keyframes: list[float], duration: float, chunks: int) -> list[tuple[float, float]]:
+    """Pick keyframes nearest to even shares of ``duration`` and return the chunk time ranges."""
+    cuts: list[float] = []
+    for k in range(1, chunks):
+        ideal = duration * k / chunks
+        position = bisect.bisect_left(keyframes, ideal)
+        candidates = keyframes[max(position - 1, 0) : position + 1]
+        if not candidates:
+            continue
+        nearest = min(candidates, key=lambda value: abs(value - ideal))
+        if 0 < nearest < duration and (not cuts or nearest > cuts[-1]):
+            cuts.append(nearest)
+    bounds = [0.0, *cuts, duration]
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+
+def _concat_list_line(path: pathlib.Path) -> str:
+    escaped = str(path).replace("'", "'\\''")
+    return f"file '{escaped}'\n"
+
+
+def encode_in_chunks(
+    video: pathlib.Path,
+    destination: pathlib.Path,
+    target_format: str,
+    *,
+    chunks: int,
+    plan: dict[str, object],
+    duration: float,
+    log: Callable[[str], None],
+    video_bitrate: Optional[int] = None,
+    progress_cb: Optional[Callable[[float, float], None]] = None,
+    table: Optional[PacketTable] = None,
+    mp4_layout: str = "faststart",
+) -> int:
+    """
+    Re-encode the video stream as ``chunks`` keyframe-aligned pieces on parallel
+    ffmpeg workers, join them losslessly with the concat demuxer while copying
+    or transcoding the remaining streams from the source once, and confirm the
+    joined duration matches the source. Returns the suppressed line count.
+    """
+    video_action = next(
+        (
+            item
+            for item in plan.get("streams") or []  # type: ignore[union-attr]
+            if item["codec_type"] == "video" and item["action"] == "transcode"
+        ),
+        None,
+    )
+    if video_action is None or not video_action.get("encoder"):
+        raise RuntimeError("Chunked encoding only applies when the video stream is re-encoded.")
+
+    if table is None:
+        table = read_packet_table(video)
+    ranges = plan_chunk_bounds(table.keyframe_times(), duration, chunks)
+    if len(ranges) < 2:
+        raise RuntimeError("Not enough keyframes to cut the source into chunks.")
+
+    work_dir = destination.parent / f".{destination.stem}.chunks"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    threads_per_chunk = max(1, (GOVERNOR.thread_budget() or os.cpu_count() or 1) // len(ranges))
+    log(
+        f"Encoding {len(ranges)} chunk(s) in parallel with {threads_per_chunk} thread(s) each "
+        f"(cuts at {', '.join(format_timespan(start) for start, _ in ranges[1:])})."
+    )
+
+    chunk_progress = [0.0] * len(ranges)
+    progress_lock = threading.Lock()
+    chunk_paths = [work_dir / f"chunk-{i:03d}.mkv" for i in range(len(ranges))]
+
+    def encode_chunk(i: int) -> int:
+        start, end = ranges[i]
+        cmd = ["ffmpeg", "-hide_banner", "-y", "-ss", f"{start:.6f}"]
+        if i < len(ranges) - 1:
+            cmd.extend(["-t", f"{end - start:.6f}"])
+        cmd.extend(
+            [
+                "-i",
+                str(video),
+                "-map",
+                f"0:{video_action['index']}",
+                "-an",
+                "-sn",
+                "-dn",
+                "-c:v",
+                str(video_action["encoder"]),
+                *video_encoder_args(target_format, video_bitrate, log if i == 0 else None),
+                "-threads",
+                str(threads_per_chunk),
+                str(chunk_paths[i]),
+            ]
+        )
+
+        def on_progress(processed: float, _total: float) -> None:
+            if progress_cb is None:
+                return
+            with progress_lock:
+                chunk_progress[i] = processed
+                done = sum(chunk_progress)
+            progress_cb(min(done, duration), duration)
+
+        return run_ffmpeg_command(
+            cmd,
+            lambda message: log(f"[chunk {i + 1}/{len(ranges)}] {message}"),
+            suppress_tokens=(),
+            total_duration=end - start,
+            progress_cb=on_progress if progress_cb else None,
+        )
+
+    suppressed = 0
+    try:
+        errors: list[str] = []
+        with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="mm-chunk") as pool:
+            futures = [pool.submit(encode_chunk, i) for i in range(len(ranges))]
+            for i, future in enumerate(futures):
+                try:
+                    suppressed += future.result()
+                except Exception as exc:  # noqa: BLE001
+                    errors.append(f"chunk {i + 1}: {exc}")
+        if errors:
+            raise RuntimeError("Chunked encode failed — " + "; ".join(errors))
+
+        concat_list = work_dir / "chunks.txt"
+        concat_list.write_text("".join(_concat_list_line(path) for path in chunk_paths), encoding="utf-8")
+        cmd = [
+            "ffmpeg",
+            "-hide_banner",
+            "-y",
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            str(concat_list),
+            "-i",
+            str(video),
+            "-map",
+            "0:v:0",
+            "-c:0",
+            "copy",
+        ]
+        encodes = _append_stream_args(
+            cmd,
+            plan.get("streams") or [],  # type: ignore[arg-type]
+            input_index=1,
+            output_index=1,
+            skip_types=("video",),
+        )
+        if "audio" in encodes:
+            cmd.extend(audio_encoder_args(target_format))
+        if target_format == "mp4":
+            cmd.extend(["-movflags", MP4_MOVFLAGS[mp4_layout]])
+        cmd.append(str(destination))
+        log("Joining chunks with the concat demuxer.")
+        suppressed += run_ffmpeg_command(cmd, log, suppress_tokens=())
+    finally:
+        for leftover in work_dir.glob("*"):
+            try:
+                leftover.unlink()
+            except OSError:
+                pass
+        try:
+            work_dir.rmdir()
+        except OSError:
+            pass
+
+    joined = probe_media(destination, use_cache=False).duration
+    tolerance = max(CHUNK_DURATION_TOLERANCE, duration * 0.001)
+    if joined < 0 or abs(joined - duration) > tolerance:
+        raise RuntimeError(
+            f"Joined output duration {joined:.2f}s does not match the source ({duration:.2f}s)."
+        )
+    log(f"Joined duration {joined:.2f}s matches the source ({duration:.2f}s).")
+    if progress_cb:
+        progress_cb(duration, duration)
+    return suppressed
+
+
+SEGMENT_MUXER_FORMATS = {"mp4": "mp4", "mkv": "matroska", "webm": "webm"}
+
+
+def estimate_audio_bit_rate(plan: dict[str, object], probe: MediaProbe, target_format: str) -> int:
+    """Sum the output bitrate of every kept audio stream (encoder rate or copied source rate)."""
+    stream_rates = {
+        int(stream.get("index", -1)): _parse_bit_rate(stream.get("bit_rate"))  # type: ignore[arg-type]
+        for stream in probe.streams
+    }
+    transcoded_bps = 160_000 if target_format == "mp4" else 128_000
+    total = 0
+    for item in plan.get("streams") or []:  # type: ignore[union-attr]
+        if item["codec_type"] != "audio" or item["action"] == "drop":
+            continue
+        if item["action"] == "transcode":
+            total += transcoded_bps
+        else:
+            total += stream_rates.get(int(item["index"])) or 192_000
+    return total
+
+
+class TargetSizeExceeded(RuntimeError):
+    """A target-size encode finished but the output is still above the overshoot limit."""
+
+    def __init__(self, message: str, size_bytes: int) -> None:
+        super().__init__(message)
+        self.size_bytes = size_bytes
+
+
+def encode_to_target_size(
+    video: pathlib.Path,
+    destination: pathlib.Path,
+    target_format: str,
+    target_size_mb: float,
+    *,
+    plan: dict[str, object],
+    duration: float,
+    log: Callable[[str], None],
+    progress_cb: Optional[Callable[[float, float], None]] = None,
+    two_pass: bool = True,
+    mp4_layout: str = "faststart",
+) -> int:
+    """
+    Encode ``video`` so the single output file lands under ``target_size_mb``.
+    The video bitrate is derived from the duration and the audio budget, then
+    hit with a two-pass encode (or a capped-VBV single pass). One corrective
+    pass runs if the first result overshoots; after that
+    ``TargetSizeExceeded`` is raised. Returns the suppressed line count.
+    """
+    if duration <= 0:
+        raise RuntimeError("Target-size encoding needs a known source duration.")
+
+    actions = [dict(item) for item in plan.get("streams") or []]  # type: ignore[union-attr]
+    encoder = STREAM_ENCODERS.get(target_format, {}).get("video")
+    if encoder is None:
+        raise RuntimeError(f"Target-size encoding is not available for {target_format}.")
+    video_actions = [item for item in actions if item["codec_type"] == "video" and item["action"] != "drop"]
+    if not video_actions:
+        raise RuntimeError("No video stream to encode.")
+    for item in video_actions:
+        item["action"] = "transcode"
+        item["encoder"] = encoder
+
+    probe = probe_media(video)
+    audio_bps = estimate_audio_bit_rate(plan, probe, target_format)
+    target_bytes = target_size_mb * 1024 * 1024
+    budget_bytes = target_bytes * SPLIT_PLAN_FILL_RATIO
+    video_bps = int(budget_bytes * 8 / duration) - audio_bps
+    suppressed = 0
+
+    for attempt in (1, 2):
+        if video_bps < 100_000:
+            raise RuntimeError(
+                f"{target_size_mb:.2f} MB leaves only {max(video_bps, 0) // 1000} kbps for "
+                f"{format_timespan(duration)} of video; increase the target size."
+            )
+        log(
+            f"Target-size encode (attempt {attempt}): video {video_bps // 1000} kbps, "
+            f"audio {audio_bps // 1000} kbps, {'two-pass' if two_pass else 'capped VBV'}."
+        )
+        rate_args = [
+            "-b:v",
+            f"{video_bps // 1000}k",
+            "-maxrate",
+            f"{int(video_bps * 1.5) // 1000}k",
+            "-bufsize",
+            f"{video_bps * 2 // 1000}k",
+        ]
+        speed_args = ["-preset", "ultrafast"] if target_format == "mp4" else ["-speed", "4"]
+        passlog = destination.parent / f".{destination.stem}.passlog"
+        try:
+            if two_pass:
+                first_pass = [
+                    "ffmpeg",
+                    "-hide_banner",
+                    "-y",
+                    "-i",
+                    str(video),
+                    "-map",
+                    f"0:{video_actions[0]['index']}",
+                    "-c:v",
+                    encoder,
+                    *speed_args,
+                    *rate_args,
+                    *encoder_thread_args(),
+                    "-pass",
+                    "1",
+                    "-passlogfile",
+                    str(passlog),
+                    "-an",
+                    "-sn",
+                    "-f",
+                    "null",
+                    os.devnull,
+                ]
+                suppressed += run_ffmpeg_command(
+                    first_pass,
+                    log,
+                    suppress_tokens=(),
+                    total_duration=duration,
+                    progress_cb=(lambda done, total: progress_cb(done / 2, total)) if progress_cb else None,
+                )
+            cmd = ["ffmpeg", "-hide_banner", "-y", "-i", str(video)]
+            encodes = _append_stream_args(cmd, actions)
+            cmd.extend([*speed_args, *rate_args, *encoder_thread_args()])
+            if two_pass:
+                cmd.extend(["-pass", "2", "-passlogfile", str(passlog)])
+            if "audio" in encodes:
+                cmd.extend(audio_encoder_args(target_format))
+            if target_format == "mp4":
+                cmd.extend(["-movflags", MP4_MOVFLAGS[mp4_layout]])
+            cmd.append(str(destination))
+            suppressed += run_ffmpeg_command(
+                cmd,
+                log,
+                suppress_tokens=(),
+                total_duration=duration,
+                progress_cb=(
+                    (lambda done, total: progress_cb((total + done) / 2 if two_pass else done, total))
+                    if progress_cb
+                    else None
+                ),
+            )
+        finally:
+            for leftover in passlog.parent.glob(f"{passlog.name}*"):
+                try:
+                    leftover.unlink()
+                except OSError:
+                    pass
+
+        size_bytes = destination.stat().st_size
+        log(f"Target-size result: {size_bytes / (1024 * 1024):.2f} MB (target {target_size_mb:.2f} MB).")
+        if size_bytes <= target_bytes * MAX_SEGMENT_OVERSHOOT_RATIO:
+            return suppressed
+        video_bps = int(video_bps * (target_bytes / size_bytes) * SPLIT_PLAN_FILL_RATIO)
+
+    raise TargetSizeExceeded(
+        f"Output is {size_bytes / (1024 * 1024):.2f} MB, above the {target_size_mb:.2f} MB target.",
+        size_bytes,
+    )
+
+
+def convert_and_split_video(
+    video: pathlib.Path,
+    target_format: str,
+    target_size_mb: float,
+    output_dir: pathlib.Path,
+    *,
+    plan: dict[str, object],
+    duration: float,
+    log: Callable[[str], None],
+    video_bitrate: Optional[int] = None,
+    progress_cb: Optional[Callable[[float, float], None]] = None,
+    mp4_layout: str = "faststart",
+) -> tuple[list[SplitSegment], int]:
+    """
+    Re-encode once and write ``Part_#NNN`` segments straight from the encoder.
+    Keyframes are forced at evenly spaced cut points and the video rate is
+    capped so a full part fits the target. Returns the parts and the number
+    of suppressed ffmpeg lines.
+    """
+    if plan.get("copy_video"):
+        raise RuntimeError("Fused convert+split only applies when the video stream is re-encoded.")
+
+    probe = probe_media(video)
+    actions: list[dict[str, object]] = plan.get("streams") or []  # type: ignore[assignment]
+    audio_bps = estimate_audio_bit_rate(plan, probe, target_format)
+
+    if not video_bitrate:
+        video_bitrate = max(int(probe.size * 8 / max(duration, 1.0)) - audio_bps, 500_000)
+
+    budget_bytes = target_size_mb * 1024 * 1024 * SPLIT_PLAN_FILL_RATIO
+    predicted_bytes = (video_bitrate + audio_bps) * duration / 8
+    part_count = max(1, math.ceil(predicted_bytes / budget_bytes))
+    segment_seconds = duration / part_count
+    # Highest sustained video rate that still lets a full-length part fit the budget.
+    cap_bps = int(budget_bytes * 8 / segment_seconds) - audio_bps
+    if cap_bps <= 100_000:
+        raise RuntimeError(
+            f"A {target_size_mb:.2f} MB part cannot hold {format_timespan(segment_seconds)} of video "
+            "after the audio budget; increase the target size."
+        )
+    rate_bps = min(video_bitrate, int(cap_bps * 0.9))
+    cut_times = [segment_seconds * k for k in range(1, part_count)]
+    log(
+        f"Fused plan: {part_count} part(s) of ~{format_timespan(segment_seconds)}; "
+        f"video {rate_bps // 1000} kbps (cap {cap_bps // 1000} kbps), audio {audio_bps // 1000} kbps."
+    )
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_pattern = output_dir / f"Part_#%03d.{target_format}"
+    segment_list = output_dir / f".{video.stem}.segments.csv"
+
+    cmd = ["ffmpeg", "-hide_banner", "-y", "-i", str(video)]
+    encodes = _append_stream_args(cmd, actions)
+    if target_format == "mp4":
+        cmd.extend(["-preset", "ultrafast"])
+    elif target_format == "webm":
+        cmd.extend(["-speed", "8"])
+    cmd.extend(
+        [
+            "-b:v",
+            f"{rate_bps // 1000}k",
+            "-maxrate",
+            f"{cap_bps // 1000}k",
+            "-bufsize",
+            f"{cap_bps // 1000}k",
+        ]
+    )
+    if cut_times:
+        cmd.extend(["-force_key_frames", ",".join(f"{cut:.3f}" for cut in cut_times)])
+    cmd.extend(encoder_thread_args())
+    if "audio" in encodes:
+        cmd.extend(audio_encoder_args(target_format))
+    cmd.extend(["-f", "segment", "-segment_format", SEGMENT_MUXER_FORMATS[target_format]])
+    if cut_times:
+        cmd.extend(["-segment_times", ",".join(f"{cut:.3f}" for cut in cut_times)])
+    else:
+        cmd.extend(["-segment_time", f"{duration + 1:.0f}"])
+    if target_format == "mp4":
+        cmd.extend(["-segment_format_options", f"movflags={MP4_MOVFLAGS[mp4_layout]}"])
+    cmd.extend(segment_list_args(segment_list))
+    cmd.extend(["-reset_timestamps", "1", "-segment_start_number", "1", str(output_pattern)])
+
+    suppressed = run_ffmpeg_command(
+        cmd,
+        log,
+        suppress_tokens=(),
+        total_duration=duration,
+        progress_cb=progress_cb,
+    )
+    listed = _finish_segment_list(segment_list, log, duration)
+    if not listed:
+        raise RuntimeError("The fused encode produced no parts.")
+
+    parts, repaired = enforce_segment_sizes(
+        video,
+        [segment.path for segment in listed],
+        target_size_mb=target_size_mb,
+        output_pattern=output_pattern,
+        duration=duration,
+        log=log,
+        planned_cuts=cut_times,
+        recut_from_part=True,
+        segments=listed,
+    )
+    return parts, suppressed + repaired
+
 
-def build_conversion_command(
+def convert_to_parts(
     video: pathlib.Path,
     target_format: str,
-    destination: pathlib.Path,
+    target_size_mb: float,
+    parts_dir: pathlib.Path,
     *,
-    prefer_fast: bool = True,
-    log: Optional[Callable[[str], None]] = None,
+    duration: float,
+    log: Callable[[str], None],
     video_bitrate: Optional[int] = None,
-) -> list[str]:
-    base_cmd = ["ffmpeg", "-hide_banner", "-y", "-i", str(video)]
-
-    def append_pruning_flags(cmd_list: list[str], *, drop_subtitles: bool = False) -> None:
-        cmd_list.extend(["-map", "-0:d?", "-map", "-0:t?"])
-        if drop_subtitles:
-            cmd_list.extend(["-map", "-0:s?"])
-
-    plan: Optional[dict[str, object]] = None
-
-    if prefer_fast:
-        plan = plan_stream_copy(video, target_format)
-        if plan.get("use_copy"):
-            if log:
-                log("Using stream copy — no re-encoding needed.")
-            cmd = base_cmd.copy()
-            cmd.extend(["-map", "0"])
-            append_pruning_flags(cmd, drop_subtitles=bool(plan.get("drop_subtitles")))
-            if plan.get("drop_subtitles") and log:
-                dropped = plan.get("dropped_subtitle_codecs", [])
-                detail = f" ({', '.join(dropped)})" if dropped else ""
-                log(f"Dropping subtitle stream(s) for compatibility{detail}.")
-            cmd.extend(["-c", "copy"])
-            if target_format == "mp4":
-                cmd.extend(["-movflags", "+faststart"])
-            cmd.append(str(destination))
-            return cmd
-        if log and plan.get("reason"):
-            log(f"Stream copy unavailable: {plan['reason']}. Falling back to re-encode.")
-    else:
-        plan = plan_stream_copy(video, target_format)
-
-    cmd = base_cmd.copy()
-
-    if target_format == "mp4":
-        cmd.extend(["-map", "0"])
-        append_pruning_flags(cmd, drop_subtitles=False)
-        cmd.extend(["-c:v", "libx264", "-preset", "ultrafast"])
-        
-        if video_bitrate and video_bitrate > 0:
-            bitrate_kbps = video_bitrate // 1000
-            cmd.extend(["-b:v", f"{bitrate_kbps}k"])
-            if log:
-                log(f"Using source video bitrate: {bitrate_kbps} kbps")
-        else:
-            cmd.extend(["-crf", "23"])
-            if log:
-                log("Source bitrate unavailable, using CRF 23")
-        
-        cmd.extend(
-            [
-                "-c:a",
-                "aac",
-                "-b:a",
-                "160k",
-                "-c:s",
-                "mov_text",
-                "-movflags",
-                "+faststart",
-            ]
+    progress_cb: Optional[Callable[[float, float], None]] = None,
+    mp4_layout: str = "faststart",
+) -> list[SplitSegment]:
+    """
+    Produce size-bounded ``Part_#NNN`` files in the target format. Video that
+    needs re-encoding goes through the fused encoder; video that can be copied
+    is remuxed once and then split with stream copy.
+    """
+    plan = plan_stream_copy(video, target_format)
+    if not plan.get("copy_video"):
+        parts, suppressed = convert_and_split_video(
+            video,
+            target_format,
+            target_size_mb,
+            parts_dir,
+            plan=plan,
+            duration=duration,
+            log=log,
+            video_bitrate=video_bitrate,
+            progress_cb=progress_cb,
+            mp4_layout=mp4_layout,
         )
-    elif target_format == "mkv":
-        cmd.extend(["-map", "0"])
-        append_pruning_flags(cmd, drop_subtitles=False)
-        cmd.extend(["-c", "copy"])
-    elif target_format == "webm":
-        cmd.extend(["-map", "0:v:0", "-map", "0:a:0?"])
-        append_pruning_flags(cmd, drop_subtitles=True)
-        cmd.extend(["-c:v", "libvpx-vp9", "-speed", "8"])
-        
-        if video_bitrate and video_bitrate > 0:
-            bitrate_kbps = video_bitrate // 1000
-            cmd.extend(["-b:v", f"{bitrate_kbps}k"])
-            if log:
-                log(f"Using source video bitrate: {bitrate_kbps} kbps")
-        else:
-            cmd.extend(["-b:v", "0", "-crf", "32"])
-            if log:
-                log("Source bitrate unavailable, using CRF 32")
-        
-        cmd.extend(["-c:a", "libopus", "-b:a", "128k"])
-    else:
-        raise RuntimeError(f"Unsupported format: {target_format}")
+        if suppressed:
+            log(f"Suppressed {suppressed} informational ffmpeg lines.")
+        return parts
 
-    cmd.append(str(destination))
-    return cmd
+    log("Video can be stream copied; remuxing once, then splitting the result.")
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    staged = parts_dir / f".{video.stem}.convert.{target_format}"
+    try:
+        run_ffmpeg_command(
+            build_conversion_command(video, target_format, staged, log=log, plan=plan, mp4_layout=mp4_layout),
+            log,
+            suppress_tokens=(),
+            total_duration=duration,
+            progress_cb=progress_cb,
+        )
+        if staged.stat().st_size <= target_size_mb * 1024 * 1024:
+            single = parts_dir / f"Part_#001.{target_format}"
+            staged.rename(single)
+            return [SplitSegment(single, 0.0, duration)]
+        return split_video(staged, target_size_mb, parts_dir, status_cb=log)
+    finally:
+        if staged.exists():
+            staged.unlink()
 
 
 def convert_source(
-    source: pathlib.Path,
+    source: pathlib.Path | RemoteMedia,
     target_format: str,
     output_dir: Optional[pathlib.Path],
     status_cb: StatusCallback = None,
     progress_cb: Optional[Callable[[pathlib.Path, float, float], None]] = None,
     replace_existing: bool = False,
+    jobs: int = 1,
+    parallel_chunks: int = 0,
+    split_size_mb: Optional[float] = None,
+    target_size_mb: Optional[float] = None,
+    mp4_layout: str = "faststart",
+    resume: bool = True,
+    manifest: Optional[ManifestOptions] = None,
+    scan: Optional[ScanFilter] = None,
 ) -> None:
-    """Convert a single video or all videos in a directory to a new format."""
+    """
+    Convert a single video or all videos in a directory to a new format,
+    running up to ``jobs`` files at once. When ``parallel_chunks`` is above 1,
+    long videos that need a video re-encode are encoded as that many
+    keyframe-aligned chunks in parallel. With ``split_size_mb`` each video is
+    written as ``Part_#NNN`` files of at most that size in a single encode.
+    With ``target_size_mb`` each video becomes one file encoded to fit that
+    size, and is split only if the encode still overshoots. ``mp4_layout``
+    picks between a faststart mp4 (moov moved to the front in a second write
+    pass) and a fragmented mp4 that streams progressively without that pass.
+    Progress is journaled in the output directory (the source directory when
+    replacing); with ``resume`` a rerun skips files that were already
+    converted and keeps the output names it picked before. ``manifest``
+    writes a Media-Manager fragment for the converted files. Files are
+    queued while ``scan`` is still walking the directory; in a recursive
+    scan the outputs mirror the source folders. A ``RemoteMedia`` source is
+    read straight from its URL and needs ``output_dir``.
+    """
 
     target_format = target_format.lower()
     if target_format not in CONVERSION_FORMATS:
         raise RuntimeError(f"Target format must be one of: {', '.join(CONVERSION_FORMATS)}")
+    if split_size_mb is not None and split_size_mb <= 0:
+        raise RuntimeError("Split size must be greater than zero.")
+    if split_size_mb and (replace_existing or output_dir is None):
+        raise RuntimeError("Converting into parts needs an output directory and cannot replace files.")
+    if target_size_mb is not None and target_size_mb <= 0:
+        raise RuntimeError("Target size must be greater than zero.")
+    if split_size_mb and target_size_mb:
+        raise RuntimeError("Choose either a split size or a target size, not both.")
+    if mp4_layout not in MP4_MOVFLAGS:
+        raise RuntimeError(f"MP4 layout must be one of: {', '.join(MP4_MOVFLAGS)}")
+    remote = isinstance(source, RemoteMedia)
+    if remote and (replace_existing or output_dir is None):
+        raise RuntimeError("Converting a URL needs an output directory and cannot replace the source.")
 
     def log(message: str) -> None:
         if status_cb:
@@ -932,8 +4685,14 @@ def convert_source(
         else:
             print(message)
 
-    videos, ignored = collect_video_files(source)
-    if not videos:
+    ignored: list[IgnoredReason] = []
+    # Everything this batch writes, so a scan of the same tree never takes it for input.
+    written: set[pathlib.Path] = set()
+    if isinstance(source, pathlib.Path) and output_dir is not None and output_dir.resolve() != source.resolve():
+        written.add(output_dir.resolve())
+    multiple, found = stream_video_files(source, scan, ignored, written)
+    first = next(found, None)
+    if first is None:
         if ignored:
             skipped_summary = ", ".join(f"{path.name} ({reason})" for path, reason in ignored[:5])
             if len(ignored) > 5:
@@ -941,36 +4700,51 @@ def convert_source(
             raise RuntimeError(f"No valid video files to convert. Skipped {len(ignored)} item(s): {skipped_summary}")
         raise RuntimeError("No video files to convert.")
 
-    source_type = "directory" if source.exists() and source.is_dir() else "file"
+    source_type = "URL" if remote else "directory" if source.exists() and source.is_dir() else "file"
     log(f"Preparing to convert {source_type}: {source}")
     log(f"Target format: {target_format}; replace existing: {'yes' if replace_existing else 'no'}")
     if output_dir is not None:
         log(f"Output base directory: {output_dir}")
 
-    total = len(videos)
-    multiple = total > 1
-
-    if ignored:
-        skipped_summary = ", ".join(f"{path.name} ({reason})" for path, reason in ignored[:5])
-        if len(ignored) > 5:
-            skipped_summary += f", ... ({len(ignored) - 5} more)"
-        log(f"Skipped {len(ignored)} item(s): {skipped_summary}")
-
     if multiple:
-        log(f"Found {total} videos to process in {source}.")
+        log(f"Scanning {source} and starting jobs as videos are found.")
     else:
-        log(f"Processing single video: {videos[0].name}")
+        log(f"Processing single video: {first.name}")
 
     if not replace_existing and output_dir is not None:
         output_dir.mkdir(parents=True, exist_ok=True)
 
+    journal_dir = output_dir if output_dir is not None else source if source.is_dir() else source.parent
+    journal = JobJournal(
+        journal_dir,
+        {
+            "mode": "convert",
+            "format": target_format,
+            "replace_existing": replace_existing,
+            "split_size_mb": split_size_mb,
+            "target_size_mb": target_size_mb,
+            "mp4_layout": mp4_layout,
+            "encoders": STREAM_ENCODERS.get(target_format),
+            "video_args": video_encoder_args(target_format, None),
+            "audio_args": audio_encoder_args(target_format),
+        },
+        resume=resume,
+    )
+    total: Optional[int] = None  # Known once the scan finishes.
     failures: list[tuple[pathlib.Path, str]] = []
+    outcomes: dict[pathlib.Path, str] = {}
     completed = 0
-    used_output_names: set[pathlib.Path] = set()
+    used_output_names = journal.reserved_targets()
+    written.update(used_output_names)
 
-    for index, video in enumerate(videos, start=1):
+    if jobs > 1 and multiple:
+        log(f"Running up to {jobs} conversion job(s) in parallel.")
+
+    def convert_one(
+        index: int, video: pathlib.Path, reserved_path: Optional[pathlib.Path], fingerprint: Optional[str]
+    ) -> None:
         if multiple:
-            log(f"[{index}/{total}] Processing {video.name}")
+            log(f"[{index}/{total}] Processing {video.name}" if total else f"[{index}] Processing {video.name}")
             def child_cb(message: str, name: str = video.name) -> None:
                 log(f"{name}: {message}")
         else:
@@ -983,6 +4757,17 @@ def convert_source(
             else:
                 log(message)
 
+        if fingerprint is None:
+            # New or touched input: hash it here rather than on the scanning thread.
+            fingerprint = journal.fingerprint(video)
+            done = journal.finished(video, fingerprint)
+            if done is not None:
+                message_cb(f"Already converted to {len(done)} file(s) by an earlier run; skipping.")
+                outcomes[video] = "up to date"
+                return
+
+        journal.recover(video, message_cb)
+
         try:
             size_mb = video.stat().st_size / (1024 * 1024)
             message_cb(f"Input size: {size_mb:.2f} MB")
@@ -1013,6 +4798,24 @@ def convert_source(
             if progress_wrapper and duration > 0:
                 progress_wrapper(0.0, duration)
             message_cb(f"Source duration: {format_timespan(duration)} ({duration:.2f}s).")
+            if split_size_mb:
+                assert reserved_path is not None
+                message_cb(f"Writing {split_size_mb:.2f} MB parts to: {reserved_path}")
+                journal.record(video, "started", fingerprint, reserved_path)
+                parts = convert_to_parts(
+                    video,
+                    target_format,
+                    split_size_mb,
+                    reserved_path,
+                    duration=duration,
+                    log=child_log,
+                    video_bitrate=video_bitrate,
+                    progress_cb=progress_wrapper,
+                    mp4_layout=mp4_layout,
+                )
+                journal.record(video, "done", fingerprint, reserved_path, parts)
+                child_log(f"Done! {len(parts)} part(s) saved under: {reserved_path}")
+                return
             if replace_existing:
                 current_ext = video.suffix.lower().lstrip(".")
                 if current_ext == target_format:
@@ -1031,38 +4834,85 @@ def convert_source(
                 if output_dir is None:
                     dest_dir = video.parent if not multiple else video.parent
                 else:
-                    dest_dir = output_dir
+                    dest_dir = reserved_path.parent if reserved_path is not None else output_dir
 
                 dest_dir.mkdir(parents=True, exist_ok=True)
                 message_cb(f"Using output directory: {dest_dir}")
-                candidate = dest_dir / f"{video.stem}.{target_format}"
-                counter = 1
-                while candidate in used_output_names or candidate.exists():
-                    candidate = dest_dir / f"{video.stem}_{counter}.{target_format}"
-                    counter += 1
-                used_output_names.add(candidate)
-                final_path = candidate
+                assert reserved_path is not None
+                final_path = reserved_path
+                candidate = reserved_path
                 destination = candidate
                 message_cb(f"Destination path: {destination}")
                 if destination != final_path:
                     message_cb(f"Final output path will be: {final_path}")
 
             destination.parent.mkdir(parents=True, exist_ok=True)
-            cmd = build_conversion_command(
-                video,
-                target_format,
-                destination,
-                prefer_fast=True,
-                log=child_log,
-                video_bitrate=video_bitrate,
-            )
-            suppressed = run_ffmpeg_command(
-                cmd,
-                child_log,
-                suppress_tokens=(),
-                total_duration=duration,
-                progress_cb=progress_wrapper,
-            )
+            journal.record(video, "started", fingerprint, destination)
+            plan = plan_stream_copy(video, target_format)
+            suppressed: Optional[int] = None
+            if target_size_mb and (
+                not plan.get("copy_video") or video.stat().st_size > target_size_mb * 1024 * 1024
+            ):
+                try:
+                    suppressed = encode_to_target_size(
+                        video,
+                        destination,
+                        target_format,
+                        target_size_mb,
+                        plan=plan,
+                        duration=duration,
+                        log=child_log,
+                        progress_cb=progress_wrapper,
+                        mp4_layout=mp4_layout,
+                    )
+                except TargetSizeExceeded as exc:
+                    if replace_existing:
+                        raise
+                    parts_dir = destination.parent / destination.stem
+                    child_log(f"{exc} Falling back to splitting into: {parts_dir}")
+                    parts = split_video(destination, target_size_mb, parts_dir, status_cb=child_log)
+                    pathlib.Path(destination).unlink()
+                    journal.record(video, "done", fingerprint, parts_dir, parts)
+                    child_log(f"Done! Parts saved under: {parts_dir}")
+                    return
+            elif (
+                parallel_chunks > 1
+                and not plan.get("copy_video")
+                and duration >= CHUNKED_ENCODE_MIN_SECONDS
+            ):
+                try:
+                    suppressed = encode_in_chunks(
+                        video,
+                        destination,
+                        target_format,
+                        chunks=parallel_chunks,
+                        plan=plan,
+                        duration=duration,
+                        log=child_log,
+                        video_bitrate=video_bitrate,
+                        progress_cb=progress_wrapper,
+                        mp4_layout=mp4_layout,
+                    )
+                except Exception as exc:  # noqa: BLE001
+                    child_log(f"Chunked encode unavailable ({exc}); running a single encode instead.")
+            if suppressed is None:
+                cmd = build_conversion_command(
+                    video,
+                    target_format,
+                    destination,
+                    prefer_fast=True,
+                    log=child_log,
+                    video_bitrate=video_bitrate,
+                    plan=plan,
+                    mp4_layout=mp4_layout,
+                )
+                suppressed = run_ffmpeg_command(
+                    cmd,
+                    child_log,
+                    suppress_tokens=(),
+                    total_duration=duration,
+                    progress_cb=progress_wrapper,
+                )
 
             if replace_existing:
                 if final_path == video:
@@ -1092,9 +4942,9 @@ def convert_source(
 
             if not replace_existing and final_path != destination:
                 pathlib.Path(destination).rename(final_path)
+            journal.record(video, "done", fingerprint, final_path, [SplitSegment(final_path, 0.0, duration)])
 
             child_log(f"Done! Converted file saved to: {final_path}")
-            completed += 1
         except Exception as exc:
             reason = str(exc) or exc.__class__.__name__
             log(f"Failed to convert {video}: {reason}")
@@ -1106,16 +4956,457 @@ def convert_source(
                         dest_path.unlink()
                 except Exception:
                     pass
-            failures.append((video, reason))
+            raise
+
+    videos: list[pathlib.Path] = []
+    submitted: list[pathlib.Path] = []
+    up_to_date = 0
+    with BatchScheduler(jobs, status_cb=log) as scheduler:
+        for index, video in enumerate(itertools.chain([first], found), start=1):
+            videos.append(video)
+            # Unchanged inputs are settled from a stat before any probing or scheduling;
+            # anything else is hashed by its own job.
+            fingerprint = journal.known_fingerprint(video)
+            done = journal.finished(video, fingerprint) if fingerprint is not None else None
+            if done is not None:
+                if not multiple:
+                    log(f"Already converted to {len(done)} file(s) by an earlier run; skipping.")
+                outcomes[video] = "up to date"
+                up_to_date += 1
+                continue
+            # Mirror the source tree so the same stem in different folders cannot collide.
+            subfolder = video.parent.relative_to(source) if multiple else pathlib.Path()
+            reserved_path: Optional[pathlib.Path] = None
+            reserved = journal.reserved(video)
+            if reserved is not None and not replace_existing:
+                reserved_path = reserved
+            elif split_size_mb and output_dir is not None:
+                reserved_path = output_dir
+                if multiple:
+                    folder_name = video.stem or video.name
+                    candidate = output_dir / subfolder / folder_name
+                    counter = 1
+                    while candidate.resolve() in used_output_names:
+                        candidate = output_dir / subfolder / f"{folder_name}_{counter}"
+                        counter += 1
+                    used_output_names.add(candidate.resolve())
+                    reserved_path = candidate
+            elif not replace_existing:
+                dest_dir = output_dir / subfolder if output_dir is not None else video.parent
+                candidate = dest_dir / f"{video.stem}.{target_format}"
+                counter = 1
+                while candidate.resolve() in used_output_names or candidate.exists():
+                    candidate = dest_dir / f"{video.stem}_{counter}.{target_format}"
+                    counter += 1
+                used_output_names.add(candidate.resolve())
+                reserved_path = candidate
+            if reserved_path is not None:
+                written.add(reserved_path.resolve())
+            elif replace_existing:
+                written.add(video.with_suffix(f".{target_format}").resolve())
+                written.add(video.with_name(f"{video.stem}.tmp_convert.{target_format}").resolve())
+            def classify(video: pathlib.Path = video) -> str:
+                # Jobs that keep the video stream are disk-bound; video encodes go to the CPU pool.
+                plan = plan_stream_copy(video, target_format)
+                return BATCH_IO if plan.get("copy_video") and not target_size_mb else BATCH_CPU
+
+            scheduler.submit_classified(
+                classify,
+                EVENTS.run_job,
+                "convert",
+                video,
+                convert_one,
+                index,
+                video,
+                reserved_path,
+                fingerprint,
+                source=video,
+            )
+            submitted.append(video)
+        total = len(videos)
+        if multiple:
+            log(f"Scan finished: found {total} videos to process in {source}.")
+        if ignored:
+            skipped_summary = ", ".join(f"{path.name} ({reason})" for path, reason in ignored[:5])
+            if len(ignored) > 5:
+                skipped_summary += f", ... ({len(ignored) - 5} more)"
+            log(f"Skipped {len(ignored)} item(s): {skipped_summary}")
+
+        for video, error in zip(submitted, scheduler.results()):
+            if error is None and outcomes.get(video) == "up to date":
+                up_to_date += 1
+            elif error is None:
+                completed += 1
+                outcomes[video] = "converted"
+            else:
+                reason = _failure_reason(error)
+                failures.append((video, reason))
+                outcomes[video] = f"failed: {reason}"
+
+    PROBE_CACHE.flush()
+    completed += up_to_date
+    videos.sort()
+    failures.sort()
+    if manifest is not None:
+        _write_batch_manifest(manifest, videos, journal, log)
 
     if multiple:
+        if up_to_date:
+            log(f"{up_to_date} video(s) were already converted by an earlier run and were skipped.")
         log(f"Finished processing {completed} of {total} video(s).")
+        write_order_report(journal_dir, source, outcomes, log)
+
+    if failures:
+        summary = "; ".join(f"{path.name}: {reason}" for path, reason in failures[:5])
+        if len(failures) > 5:
+            summary += f"; ... and {len(failures) - 5} more"
+        raise RuntimeError(f"{len(failures)} video(s) failed: {summary}")
+
+
+@dataclass
+class Mp4Box:
+    """A top-level MP4 box located by its header only."""
+
+    kind: bytes
+    offset: int
+    size: int
+
+
+def read_top_level_boxes(path: pathlib.Path) -> list[Mp4Box]:
+    """Walk the top-level box headers of an MP4/MOV file without reading payloads."""
+    boxes: list[Mp4Box] = []
+    file_size = path.stat().st_size
+    with path.open("rb") as handle:
+        offset = 0
+        while offset + 8 <= file_size:
+            handle.seek(offset)
+            header = handle.read(16)
+            size, kind = struct.unpack(">I4s", header[:8])
+            if size == 1:
+                if len(header) < 16:
+                    raise RuntimeError(f"Truncated box header at offset {offset}.")
+                size = struct.unpack(">Q", header[8:16])[0]
+            elif size == 0:
+                size = file_size - offset
+            if size < 8 or offset + size > file_size:
+                raise RuntimeError(f"Invalid {kind!r} box size at offset {offset}.")
+            boxes.append(Mp4Box(kind, offset, size))
+            offset += size
+    return boxes
+
+
+def _parse_boxes(data: bytes) -> list[list[object]]:
+    """Parse a run of boxes into ``[kind, payload]`` pairs, descending into the moov→stbl path."""
+    nodes: list[list[object]] = []
+    offset = 0
+    while offset + 8 <= len(data):
+        size, kind = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = len(data) - offset
+        if size < header or offset + size > len(data):
+            raise RuntimeError(f"Invalid {kind!r} box inside moov.")
+        payload = data[offset + header : offset + size]
+        nodes.append([kind, _parse_boxes(payload) if kind in MP4_MOOV_PATH_BOXES else payload])
+        offset += size
+    return nodes
+
+
+def _serialize_boxes(nodes: list[list[object]]) -> bytes:
+    chunks: list[bytes] = []
+    for kind, payload in nodes:
+        body = _serialize_boxes(payload) if isinstance(payload, list) else payload  # type: ignore[arg-type]
+        size = len(body) + 8
+        if size > 0xFFFFFFFF:
+            chunks.append(struct.pack(">I4sQ", 1, kind, size + 8) + body)  # type: ignore[arg-type]
+        else:
+            chunks.append(struct.pack(">I4s", size, kind) + body)  # type: ignore[arg-type]
+    return b"".join(chunks)
+
+
+def _shift_chunk_offsets(nodes: list[list[object]], shift: Callable[[int], int]) -> None:
+    """Map every stco/co64 entry through ``shift`` in place, promoting stco to co64 on overflow."""
+    for node in nodes:
+        kind, payload = node
+        if isinstance(payload, list):
+            _shift_chunk_offsets(payload, shift)
+        elif kind == b"stco":
+            count = struct.unpack_from(">I", payload, 4)[0]  # type: ignore[arg-type]
+            shifted = [shift(value) for value in struct.unpack_from(f">{count}I", payload, 8)]  # type: ignore[arg-type]
+            if shifted and max(shifted) > 0xFFFFFFFF:
+                node[0] = b"co64"
+                node[1] = payload[:8] + struct.pack(f">{count}Q", *shifted)  # type: ignore[index]
+            else:
+                node[1] = payload[:8] + struct.pack(f">{count}I", *shifted)  # type: ignore[index]
+        elif kind == b"co64":
+            count = struct.unpack_from(">I", payload, 4)[0]  # type: ignore[arg-type]
+            offsets = struct.unpack_from(f">{count}Q", payload, 8)  # type: ignore[arg-type]
+            node[1] = payload[:8] + struct.pack(f">{count}Q", *map(shift, offsets))  # type: ignore[index]
+
+
+def _copy_range(source: BinaryIO, destination: BinaryIO, offset: int, length: int) -> None:
+    """Copy ``length`` bytes from ``offset`` using the kernel when possible, else large buffers."""
+    copy_file_range = getattr(os, "copy_file_range", None)
+    destination.flush()
+    if copy_file_range is not None:
+        try:
+            position = offset
+            remaining = length
+            while remaining > 0:
+                copied = copy_file_range(
+                    source.fileno(), destination.fileno(), min(remaining, 1 << 30), position
+                )
+                if copied <= 0:
+                    break
+                position += copied
+                remaining -= copied
+            destination.seek(0, os.SEEK_END)
+            if remaining == 0:
+                return
+            offset, length = position, remaining
+        except OSError:
+            destination.seek(0, os.SEEK_END)
+    source.seek(offset)
+    remaining = length
+    while remaining > 0:
+        block = source.read(min(MP4_COPY_BUFFER, remaining))
+        if not block:
+            raise RuntimeError("Unexpected end of file while copying media data.")
+        destination.write(block)
+        remaining -= len(block)
+
+
+def relocate_moov(path: pathlib.Path, log: Optional[Callable[[str], None]] = None) -> bool:
+    """
+    Move the moov box in front of the media data and patch chunk offsets,
+    without decoding or invoking ffmpeg. Returns False (after reading only the
+    box headers) when the file is already progressive-playback friendly.
+    """
+    boxes = read_top_level_boxes(path)
+    kinds = [box.kind for box in boxes]
+    if b"moov" not in kinds:
+        raise RuntimeError("No moov box found; the file may be truncated.")
+    if b"moof" in kinds:
+        return False  # Fragmented mp4 already streams progressively.
+    moov_index = kinds.index(b"moov")
+    first_mdat = kinds.index(b"mdat") if b"mdat" in kinds else len(kinds)
+    if moov_index < first_mdat:
+        return False
+
+    moov = boxes[moov_index]
+    with path.open("rb") as handle:
+        handle.seek(moov.offset)
+        raw_moov = handle.read(moov.size)
+    header = 16 if struct.unpack_from(">I", raw_moov)[0] == 1 else 8
+    tree = _parse_boxes(raw_moov[header:])
+    if any(kind == b"cmov" for kind, _ in tree):
+        raise RuntimeError("Compressed moov boxes are not supported.")
+
+    # Boxes between the insertion point and the old moov shift forward by the
+    # whole new moov; boxes after the old moov only by how much it grew. The
+    # new size itself grows if 32-bit offset tables need co64.
+    insert_at = boxes[first_mdat].offset
+    moov_end = moov.offset + moov.size
+    original_tree = _serialize_boxes(tree)
+    new_size = len(original_tree) + 8
+
+    def shift(offset: int) -> int:
+        if offset >= moov_end:
+            return offset + new_size - moov.size
+        if offset >= moov.offset:
+            raise RuntimeError("A chunk offset points inside the moov box; the file looks corrupt.")
+        if offset >= insert_at:
+            return offset + new_size
+        return offset
+
+    while True:
+        candidate = _parse_boxes(original_tree)
+        _shift_chunk_offsets(candidate, shift)
+        patched = _serialize_boxes([[b"moov", candidate]])
+        if len(patched) == new_size:
+            break
+        new_size = len(patched)
+
+    ordered = boxes[:first_mdat] + [None] + [box for box in boxes[first_mdat:] if box is not moov]
+    temp_path = path.with_name(f".{path.name}.faststart.tmp")
+    try:
+        with path.open("rb") as source, temp_path.open("wb") as destination:
+            for box in ordered:
+                if box is None:
+                    destination.write(patched)
+                else:
+                    _copy_range(source, destination, box.offset, box.size)
+        shutil.copystat(path, temp_path)
+        os.replace(temp_path, path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+    PROBE_CACHE.discard(_probe_cache_key(path))
+    if log:
+        log(f"Moved moov ({len(patched) / 1024:.1f} KB) to the front of {path.name}.")
+    return True
+
+
+def index_source(
+    source: pathlib.Path,
+    status_cb: StatusCallback = None,
+    jobs: int = 1,
+) -> None:
+    """Build packet indexes for a file or every video in a directory ahead of planning."""
+
+    def log(message: str) -> None:
+        if status_cb:
+            status_cb(message)
+        else:
+            print(message)
+
+    videos, _ignored = collect_video_files(source)
+    if not videos:
+        raise RuntimeError("No video files to index.")
+    log(f"Indexing packets for {len(videos)} file(s).")
+
+    failures: list[tuple[pathlib.Path, str]] = []
+    with BatchScheduler(jobs, status_cb=log, total=len(videos)) as scheduler:
+        for video in videos:
+            scheduler.submit(BATCH_IO, EVENTS.run_job, "index", video, read_packet_table, video, source=video)
+        for video, error in zip(videos, scheduler.results()):
+            if error is not None:
+                reason = _failure_reason(error)
+                log(f"Failed to index {video}: {reason}")
+                failures.append((video, reason))
+
+    PROBE_CACHE.flush()
+    log(f"Indexed {len(videos) - len(failures)} of {len(videos)} file(s) in {default_packet_index_dir()}.")
+    if failures:
+        summary = "; ".join(f"{path.name}: {reason}" for path, reason in failures[:5])
+        if len(failures) > 5:
+            summary += f"; ... and {len(failures) - 5} more"
+        raise RuntimeError(f"{len(failures)} video(s) failed: {summary}")
+
+
+def faststart_source(
+    source: pathlib.Path,
+    status_cb: StatusCallback = None,
+    jobs: int = 1,
+) -> None:
+    """Relocate the moov box for a single MP4 or every MP4/MOV in a directory."""
+
+    def log(message: str) -> None:
+        if status_cb:
+            status_cb(message)
+        else:
+            print(message)
+
+    videos, _ignored = collect_video_files(source)
+    videos = [video for video in videos if video.suffix.lower() in MP4_FASTSTART_SUFFIXES]
+    if not videos:
+        raise RuntimeError("No mp4/m4v/mov files to process.")
+    log(f"Checking moov placement for {len(videos)} file(s).")
+
+    failures: list[tuple[pathlib.Path, str]] = []
+    relocated = 0
+    skipped = 0
+
+    with BatchScheduler(jobs, status_cb=log, total=len(videos)) as scheduler:
+        futures = [
+            scheduler.submit(
+                BATCH_IO,
+                EVENTS.run_job,
+                "faststart",
+                video,
+                relocate_moov,
+                video,
+                lambda msg, name=video.name: log(f"{name}: {msg}"),
+                source=video,
+            )
+            for video in videos
+        ]
+        for video, future, error in zip(videos, futures, scheduler.results()):
+            if error is not None:
+                reason = _failure_reason(error)
+                log(f"Failed to relocate moov in {video}: {reason}")
+                failures.append((video, reason))
+            elif future.result():
+                relocated += 1
+            else:
+                skipped += 1
 
+    log(f"Relocated {relocated} file(s); {skipped} already had moov at the front.")
     if failures:
         summary = "; ".join(f"{path.name}: {reason}" for path, reason in failures[:5])
         if len(failures) > 5:
             summary += f"; ... and {len(failures) - 5} more"
         raise RuntimeError(f"{len(failures)} video(s) failed: {summary}")
+
+
+def _child_blocks_written() -> Optional[int]:
+    """Total 512-byte blocks written by finished child processes, where the OS reports it."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_oublock
+
+
+def benchmark_mp4_layouts(
+    video: pathlib.Path,
+    work_dir: Optional[pathlib.Path] = None,
+    status_cb: StatusCallback = None,
+) -> list[dict[str, object]]:
+    """
+    Remux ``video`` to mp4 once per layout in ``MP4_MOVFLAGS`` and report wall
+    time, output size and bytes written by ffmpeg. Written bytes come from the
+    child-process block counters, so they include the faststart rewrite.
+    """
+
+    def log(message: str) -> None:
+        if status_cb:
+            status_cb(message)
+        else:
+            print(message)
+
+    scratch = work_dir or video.parent / ".mp4-layout-benchmark"
+    scratch.mkdir(parents=True, exist_ok=True)
+    results: list[dict[str, object]] = []
+    try:
+        for layout in MP4_MOVFLAGS:
+            destination = scratch / f"{video.stem}.{layout}.mp4"
+            cmd = build_conversion_command(video, "mp4", destination, mp4_layout=layout)
+            blocks_before = _child_blocks_written()
+            started_at = time.perf_counter()
+            run_ffmpeg_command(cmd, lambda _message: None, suppress_tokens=())
+            elapsed = time.perf_counter() - started_at
+            blocks_after = _child_blocks_written()
+            written = (
+                (blocks_after - blocks_before) * 512
+                if blocks_before is not None and blocks_after is not None
+                else None
+            )
+            output_size = destination.stat().st_size
+            results.append(
+                {
+                    "layout": layout,
+                    "seconds": round(elapsed, 3),
+                    "output_bytes": output_size,
+                    "written_bytes": written,
+                }
+            )
+            written_text = f"{written / (1024 * 1024):.1f} MB" if written is not None else "n/a"
+            log(
+                f"{layout:>10}: {elapsed:7.2f}s, output {output_size / (1024 * 1024):.1f} MB, "
+                f"written {written_text}"
+            )
+            destination.unlink()
+    finally:
+        if work_dir is None:
+            try:
+                scratch.rmdir()
+            except OSError:
+                pass
+    return results
+
+
 # ------------------------------- GUI helpers ------------------------------- #
 
 def launch_gui() -> None:  # pragma: no cover - GUI interaction is manual
@@ -1143,6 +5434,11 @@ def launch_gui() -> None:  # pragma: no cover - GUI interaction is manual
             self.entry_size = ttk.Entry(size_frame, width=12)
             self.entry_size.grid(row=0, column=1, sticky="w", padx=(8, 0))
             self.entry_size.insert(0, "180")
+            ttk.Label(size_frame, text="Parallel jobs:").grid(row=1, column=0, sticky="w", pady=(6, 0))
+            self.jobs_var = tk.StringVar(value="1")
+            ttk.Spinbox(size_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.jobs_var, width=6).grid(
+                row=1, column=1, sticky="w", padx=(8, 0), pady=(6, 0)
+            )
 
             source_frame = ttk.LabelFrame(self.frame, text="Source", style="Section.TLabelframe")
             source_frame.grid(row=2, column=0, sticky="ew", pady=(4, 8))
@@ -1299,6 +5595,13 @@ def launch_gui() -> None:  # pragma: no cover - GUI interaction is manual
             except ValueError:
                 messagebox.showerror("Invalid input", "Please enter a positive number for the target size.")
                 return
+            try:
+                jobs = int(self.jobs_var.get().strip())
+                if jobs < 1:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Invalid input", "Parallel jobs must be a whole number of at least 1.")
+                return
 
             raw_source = self.video_var.get().strip()
             if not raw_source:
@@ -1344,6 +5647,7 @@ def launch_gui() -> None:  # pragma: no cover - GUI interaction is manual
                             0, self.handle_progress, p.name, str(p), processed, total
                         ),
                         delete_source=self.delete_var.get(),
+                        jobs=jobs,
                     )
                     self.root.after(0, lambda: messagebox.showinfo("Complete", "Splitting finished successfully."))
                 except Exception as exc:
@@ -1371,6 +5675,11 @@ def launch_gui() -> None:  # pragma: no cover - GUI interaction is manual
             self.format_var = tk.StringVar(value=CONVERSION_FORMATS[0])
             self.format_menu = ttk.OptionMenu(format_frame, self.format_var, CONVERSION_FORMATS[0], *CONVERSION_FORMATS)
             self.format_menu.grid(row=0, column=1, sticky="w", padx=(8, 0))
+            ttk.Label(format_frame, text="Parallel jobs:").grid(row=1, column=0, sticky="w", pady=(6, 0))
+            self.jobs_var = tk.StringVar(value="1")
+            ttk.Spinbox(format_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.jobs_var, width=6).grid(
+                row=1, column=1, sticky="w", padx=(8, 0), pady=(6, 0)
+            )
 
             source_frame = ttk.LabelFrame(self.frame, text="Source", style="Section.TLabelframe")
             source_frame.grid(row=2, column=0, sticky="ew", pady=(4, 8))
@@ -1404,6 +5713,13 @@ def launch_gui() -> None:  # pragma: no cover - GUI interaction is manual
                 command=self.update_output_state,
             ).grid(row=2, column=0, columnspan=2, sticky="w", pady=(6, 0))
 
+            self.fragmented_var = tk.BooleanVar(value=False)
+            ttk.Checkbutton(
+                output_frame,
+                text="Fragmented MP4 (skip the faststart rewrite)",
+                variable=self.fragmented_var,
+            ).grid(row=3, column=0, columnspan=2, sticky="w", pady=(6, 0))
+
             self.status_var = tk.StringVar(value="Ready")
             ttk.Label(self.frame, textvariable=self.status_var, style="Status.TLabel").grid(
                 row=4, column=0, sticky="w", pady=(8, 0)
@@ -1511,6 +5827,13 @@ def launch_gui() -> None:  # pragma: no cover - GUI interaction is manual
             if target_format not in CONVERSION_FORMATS:
                 messagebox.showerror("Invalid format", f"Please choose one of: {', '.join(CONVERSION_FORMATS)}.")
                 return
+            try:
+                jobs = int(self.jobs_var.get().strip())
+                if jobs < 1:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Invalid input", "Parallel jobs must be a whole number of at least 1.")
+                return
 
             raw_source = self.video_var.get().strip()
             if not raw_source:
@@ -1552,6 +5875,8 @@ def launch_gui() -> None:  # pragma: no cover - GUI interaction is manual
                             0, self.handle_progress, p.name, str(p), processed, total
                         ),
                         replace_existing=replace_existing,
+                        jobs=jobs,
+                        mp4_layout="fragmented" if self.fragmented_var.get() else "faststart",
                     )
                     self.root.after(0, lambda: messagebox.showinfo("Complete", "Conversion finished successfully."))
                 except Exception as exc:
@@ -1606,7 +5931,7 @@ def ask_conversion_format(default: Optional[str] = None) -> str:
         print(f"Please choose one of: {options}.")
 
 
-def run_split_cli(delete_source_default: bool = False) -> None:
+def run_split_cli(delete_source_default: bool = False, jobs: int = 1) -> None:
     target_mb = ask_target_size_mb()
     source_path = ask_path("Path to the source video or folder: ")
     output_path = ask_path("Output directory for parts (created if missing): ", expect_file=False)
@@ -1684,12 +6009,15 @@ def run_split_cli(delete_source_default: bool = False) -> None:
         output_path,
         progress_cb=progress_callback,
         delete_source=delete_source,
+        jobs=jobs,
     )
 
 
 def run_convert_cli(
     default_format: Optional[str] = None,
     replace_default: bool = False,
+    jobs: int = 1,
+    parallel_chunks: int = 0,
 ) -> None:
     source_path = ask_path("Path to the source video or folder: ")
     target_format = ask_conversion_format(default_format)
@@ -1771,6 +6099,8 @@ def run_convert_cli(
         output_path,
         progress_cb=progress_callback,
         replace_existing=replace_existing,
+        jobs=jobs,
+        parallel_chunks=parallel_chunks,
     )
 
 
@@ -1779,6 +6109,8 @@ def run_cli(
     delete_source_default: bool = False,
     convert_format_default: Optional[str] = None,
     replace_existing_default: bool = False,
+    jobs: int = 1,
+    parallel_chunks: int = 0,
 ) -> None:
     selected_mode = mode
     if selected_mode not in {"split", "convert"}:
@@ -1793,11 +6125,13 @@ def run_cli(
             print("Please enter 'split' or 'convert'.")
 
     if selected_mode == "split":
-        run_split_cli(delete_source_default=delete_source_default)
+        run_split_cli(delete_source_default=delete_source_default, jobs=jobs)
     else:
         run_convert_cli(
             default_format=convert_format_default,
             replace_default=replace_existing_default,
+            jobs=jobs,
+            parallel_chunks=parallel_chunks,
         )
 
 
@@ -1805,9 +6139,13 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="MM Media Tool")
     parser.add_argument("--cli", action="store_true", help="Force CLI mode even if Tkinter is available.")
     parser.add_argument("--mode", choices=["split", "convert"], help="Select the tool mode to run.")
-    parser.add_argument("--video", type=pathlib.Path, help="Source video file or directory.")
+    parser.add_argument("--video", type=media_source, help="Source video file, directory or http(s) URL.")
     parser.add_argument("--output", type=pathlib.Path, help="Output directory.")
-    parser.add_argument("--size", type=float, help="Target size per chunk (MB) for splitting.")
+    parser.add_argument(
+        "--size",
+        type=float,
+        help="Target size per chunk (MB) for splitting; with --mode convert, split while converting.",
+    )
     parser.add_argument("--format", choices=CONVERSION_FORMATS, help="Target format for conversion.")
     parser.add_argument(
         "--delete-source",
@@ -1819,6 +6157,109 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
         action="store_true",
         help="Replace source file(s) after conversion.",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of files to process in parallel (re-encodes use half as many workers).",
+    )
+    parser.add_argument(
+        "--parallel-chunks",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Re-encode long videos as N keyframe-aligned chunks in parallel, then join them.",
+    )
+    parser.add_argument(
+        "--target-size",
+        type=float,
+        metavar="MB",
+        help="Encode each video as a single file under this size; split only if it still overshoots.",
+    )
+    parser.add_argument(
+        "--mp4-layout",
+        choices=tuple(MP4_MOVFLAGS),
+        default="faststart",
+        help="faststart rewrites the file to move the moov atom; fragmented streams without the rewrite.",
+    )
+    parser.add_argument(
+        "--benchmark-mp4-layout",
+        action="store_true",
+        help="Remux --video with each mp4 layout and report wall time and bytes written.",
+    )
+    parser.add_argument(
+        "--faststart-existing",
+        action="store_true",
+        help="Move the moov atom to the front of --video (file or directory) in place, without ffmpeg.",
+    )
+    parser.add_argument(
+        "--stall-timeout",
+        type=float,
+        default=FFMPEG_STALL_SECONDS,
+        metavar="SECONDS",
+        help="Kill ffmpeg when its output time stops advancing for this long (0 disables).",
+    )
+    parser.add_argument(
+        "--no-tolerant-retry",
+        action="store_true",
+        help="After a stall, fail the file instead of retrying once with tolerant demux flags.",
+    )
+    parser.add_argument(
+        "--recursive",
+        action="store_true",
+        help="Descend into subfolders of --video; outputs mirror the folder layout.",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="Only process files whose name or relative path matches GLOB (repeatable).",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="Skip files and folders whose name or relative path matches GLOB (repeatable).",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=pathlib.Path,
+        metavar="JSON",
+        help="Write (or update) a Media-Manager manifest fragment for the split/converted files.",
+    )
+    parser.add_argument(
+        "--manifest-title",
+        default="",
+        help="Series title for --manifest (defaults to the existing title or the file name).",
+    )
+    parser.add_argument(
+        "--manifest-category",
+        default="Season 1",
+        help="Category the --manifest episodes are filed under.",
+    )
+    parser.add_argument(
+        "--no-resume",
+        action="store_true",
+        help="Redo every file instead of skipping ones the output directory's job journal marks as finished.",
+    )
+    parser.add_argument(
+        "--no-governor",
+        action="store_true",
+        help="Start batch jobs as soon as a worker is free, ignoring host load, memory and disk activity.",
+    )
+    parser.add_argument(
+        "--events",
+        choices=("text", "jsonl"),
+        default="text",
+        help="jsonl prints one JSON event per line on stdout (job start/end, progress, warnings, segments).",
+    )
+    parser.add_argument(
+        "--build-index",
+        action="store_true",
+        help="Store packet indexes for --video (file or directory) so later split planning skips ffprobe.",
+    )
     return parser.parse_args(argv)
 
 
@@ -1832,16 +6273,75 @@ def main(argv: Optional[list[str]] = None) -> None:
         elif args.format:
             mode = "convert"
 
-    if mode == "split" and args.size is not None and args.size <= 0:
+    if args.size is not None and args.size <= 0:
         print("Target size must be positive.", file=sys.stderr)
         sys.exit(1)
 
+    if args.jobs < 1:
+        print("--jobs must be at least 1.", file=sys.stderr)
+        sys.exit(1)
+
+    if args.stall_timeout < 0:
+        print("--stall-timeout cannot be negative.", file=sys.stderr)
+        sys.exit(1)
+    STALL_POLICY.timeout = args.stall_timeout
+    STALL_POLICY.retry_tolerant = not args.no_tolerant_retry
+    GOVERNOR.enabled = not args.no_governor
+
+    manifest = (
+        ManifestOptions(args.manifest.expanduser(), args.manifest_title, args.manifest_category)
+        if args.manifest
+        else None
+    )
+
+    scan = ScanFilter(args.recursive, tuple(args.include), tuple(args.exclude))
+
+    status_cb: StatusCallback = None
+    if args.events == "jsonl":
+        EVENTS.open(sys.stdout)
+        status_cb = EVENTS.log
+
+    if isinstance(args.video, RemoteMedia) and (
+        args.benchmark_mp4_layout or args.faststart_existing or args.build_index
+    ):
+        print("Benchmarks, faststart rewrites and index builds need a local --video.", file=sys.stderr)
+        sys.exit(1)
+
+    if args.benchmark_mp4_layout:
+        if not args.video or not args.video.expanduser().is_file():
+            print("Please provide --video pointing to a file to benchmark.", file=sys.stderr)
+            sys.exit(1)
+        benchmark_mp4_layouts(args.video.expanduser(), status_cb=status_cb)
+        return
+
+    if args.faststart_existing:
+        if not args.video or not args.video.expanduser().exists():
+            print("Please provide --video pointing to an mp4 file or directory.", file=sys.stderr)
+            sys.exit(1)
+        faststart_source(args.video.expanduser(), status_cb=status_cb, jobs=args.jobs)
+        return
+
+    if args.build_index:
+        if not args.video or not args.video.expanduser().exists():
+            print("Please provide --video pointing to a video file or directory.", file=sys.stderr)
+            sys.exit(1)
+        if default_packet_index_dir() is None:
+            print("Packet indexes are disabled by MM_PACKET_INDEX.", file=sys.stderr)
+            sys.exit(1)
+        index_source(args.video.expanduser(), status_cb=status_cb, jobs=args.jobs)
+        return
+
     if mode == "split" and args.video and args.output and args.size:
         split_source(
-            args.video.expanduser(),
+            args.video,
             args.size,
             args.output.expanduser(),
+            status_cb=status_cb,
             delete_source=args.delete_source,
+            jobs=args.jobs,
+            resume=not args.no_resume,
+            manifest=manifest,
+            scan=scan,
         )
         return
 
@@ -1855,19 +6355,34 @@ def main(argv: Optional[list[str]] = None) -> None:
                 sys.exit(1)
             output_dir = args.output.expanduser()
         convert_source(
-            args.video.expanduser(),
+            args.video,
             args.format,
             output_dir,
+            status_cb=status_cb,
             replace_existing=args.replace_existing,
+            jobs=args.jobs,
+            parallel_chunks=args.parallel_chunks,
+            split_size_mb=args.size,
+            target_size_mb=args.target_size,
+            mp4_layout=args.mp4_layout,
+            resume=not args.no_resume,
+            manifest=manifest,
+            scan=scan,
         )
         return
 
+    if status_cb is not None:
+        print("--events jsonl needs a non-interactive invocation (--video plus mode options).", file=sys.stderr)
+        sys.exit(1)
+
     if args.cli:
         run_cli(
             mode=mode,
             delete_source_default=args.delete_source,
             convert_format_default=args.format,
             replace_existing_default=args.replace_existing,
+            jobs=args.jobs,
+            parallel_chunks=args.parallel_chunks,
         )
         return
 
@@ -0,0 +1,853 @@
+"""Unit tests for MediaTool's planning, repair, scan and journal helpers (no ffmpeg needed)."""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+import MediaTool as M  # noqa: E402
+
+
+def _write_pieces(cmd: list[str], count: int = 2) -> None:
+    """Stand-in for a segment muxer run: write ``count`` pieces and their CSV list."""
+    pattern = cmd[-1]
+    list_path = pathlib.Path(cmd[cmd.index("-segment_list") + 1])
+    rows = []
+    for number in range(1, count + 1):
+        piece = pathlib.Path(pattern % number)
+        piece.write_bytes(b"p" * 10)
+        rows.append(f"{piece.name},{(number - 1) * 5.0:.6f},{number * 5.0:.6f}")
+    list_path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+
+
+def _table(sizes: list[int], keyframe_every: int = 4, step: float = 0.5, start: float = 0.0) -> M.PacketTable:
+    """Video-only packet table: one packet per ``step`` seconds, a keyframe every ``keyframe_every`` packets."""
+    return M.PacketTable(
+        pts=M.array("d", [start + i * step for i in range(len(sizes))]),
+        size=M.array("q", sizes),
+        keyframe=M.array("b", [int(i % keyframe_every == 0) for i in range(len(sizes))]),
+        stream=M.array("i", [0] * len(sizes)),
+        video_stream=0,
+        start_time=start,
+    )
+
+
+class HelpersTest(unittest.TestCase):
+    def test_format_timespan(self) -> None:
+        self.assertEqual(
+            [M.format_timespan(value) for value in (-3, 59.4, 59.6, 3599, 3600, 86399)],
+            ["0:00", "0:59", "1:00", "59:59", "1:00:00", "23:59:59"],
+        )
+
+    def test_tolerant_input_goes_before_the_first_input(self) -> None:
+        cmd = M.with_tolerant_input(["ffmpeg", "-y", "-i", "a", "-i", "b", "out"])
+        self.assertEqual(cmd[:2], ["ffmpeg", "-y"])
+        self.assertEqual(cmd[2 : 2 + len(M.TOLERANT_INPUT_ARGS)], list(M.TOLERANT_INPUT_ARGS))
+        self.assertEqual(M.with_tolerant_input(["ffmpeg", "-version"]), ["ffmpeg", "-version"])
+
+    def test_segment_list_is_rebased_and_tolerates_junk(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            listing = pathlib.Path(tmp) / "parts.csv"
+            listing.write_text("Part_#001.mp4,10.0,20.5\nbroken\nPart_#002.mp4,x,y\nPart_#002.mp4,20.5,31\n")
+            parts = M.read_segment_list(listing)
+            self.assertEqual(
+                [(part.path.name, part.start, part.end) for part in parts],
+                [("Part_#001.mp4", 0.0, 10.5), ("Part_#002.mp4", 10.5, 21.0)],
+            )
+            self.assertEqual(M.read_segment_list(pathlib.Path(tmp) / "missing.csv"), [])
+
+
+class PlanKeyframeCutsTest(unittest.TestCase):
+    def test_parts_fit_the_budget_and_cut_on_keyframes(self) -> None:
+        table = _table([100] * 40, start=5.0)
+        plan = M.plan_keyframe_cuts(table, 1000, fill_ratio=1.0)
+        self.assertEqual(plan.part_count, 5)
+        self.assertEqual(plan.part_sizes, [800] * 5)
+        self.assertEqual(plan.cut_times, [4.0, 8.0, 12.0, 16.0])
+        self.assertTrue(set(plan.cut_times) <= set(table.keyframe_times()))
+
+    def test_cuts_are_rebalanced(self) -> None:
+        plan = M.plan_keyframe_cuts(_table([100] * 40), 1200, fill_ratio=1.0)
+        self.assertEqual(plan.part_sizes, [1200, 800, 1200, 800])
+        plan = M.plan_keyframe_cuts(_table([100] * 40), 3000, fill_ratio=1.0)
+        self.assertEqual(plan.part_sizes, [2000, 2000])
+
+    def test_oversized_keyframe_interval_is_reported(self) -> None:
+        plan = M.plan_keyframe_cuts(_table([100] * 8 + [900] * 4 + [100] * 8), 2000, fill_ratio=1.0)
+        self.assertEqual(plan.oversize_intervals, [(4.0, 3600)])
+
+    def test_fill_ratio_leaves_headroom(self) -> None:
+        plan = M.plan_keyframe_cuts(_table([100] * 40), 4000, fill_ratio=0.9)
+        self.assertEqual(plan.budget_bytes, 3600)
+        self.assertTrue(all(size <= 3600 for size in plan.part_sizes))
+        self.assertEqual(plan.part_count, 2)
+
+
+def _probe(name: str, size: int = 10) -> M.MediaProbe:
+    return M.MediaProbe(name, size, 1, 5.0, {"format_name": "matroska"}, [])
+
+
+class ProbeCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp.name) / "probe.json"
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def stored(self) -> list[str]:
+        return sorted(entry["path"] for entry in json.loads(self.path.read_text(encoding="utf-8"))["entries"])
+
+    def test_concurrent_flushes_keep_each_others_entries(self) -> None:
+        first, second = M.ProbeCache(self.path), M.ProbeCache(self.path)
+        first.get("warm", 1, 1)
+        second.get("warm", 1, 1)
+        first.put(_probe("a"))
+        second.put(_probe("b"))
+        first.flush()
+        second.flush()
+        self.assertEqual(self.stored(), ["a", "b"])
+        self.assertIsNotNone(second.get("a", 10, 1))
+
+    def test_discard_before_first_lookup_is_honoured(self) -> None:
+        seed = M.ProbeCache(self.path)
+        seed.put(_probe("a"))
+        seed.put(_probe("b"))
+        seed.flush()
+        cache = M.ProbeCache(self.path)
+        cache.discard("a")
+        cache.flush()
+        self.assertEqual(self.stored(), ["b"])
+        self.assertIsNone(cache.get("a", 10, 1))
+
+    def test_discard_removes_an_entry_another_process_wrote(self) -> None:
+        cache = M.ProbeCache(self.path)
+        cache.get("warm", 1, 1)
+        other = M.ProbeCache(self.path)
+        other.put(_probe("a"))
+        other.flush()
+        cache.discard("a")
+        cache.flush()
+        self.assertFalse(self.path.exists() and "a" in self.stored())
+
+
+class PacketIndexTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"MM_PACKET_INDEX": self.tmp.name})
+        self.env.start()
+        # Decode order: a swapped pair of non-key frames in every GOP.
+        self.table = _table([100 + i for i in range(40)], start=2.0)
+        for i in range(1, 39, 4):
+            self.table.pts[i], self.table.pts[i + 1] = self.table.pts[i + 1], self.table.pts[i]
+
+    def tearDown(self) -> None:
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def brute_window(self, start: float, end: float) -> list[tuple[float, int]]:
+        lower, upper = self.table.start_time + start - 1e-6, self.table.start_time + end - 1e-6
+        return sorted((t, s) for t, s in zip(self.table.pts, self.table.size) if lower <= t < upper)
+
+    def test_loaded_index_is_mapped_not_copied(self) -> None:
+        expected = self.brute_window(0, 100)
+        self.assertIsNotNone(M.save_packet_index(self.table, b"f" * 16))
+        loaded = M.load_packet_index(b"f" * 16)
+        self.assertIsInstance(loaded.pts, memoryview)
+        self.assertEqual(list(zip(loaded.pts, loaded.size)), expected)
+        self.assertEqual(loaded.keyframe_times(), [2.0 * n for n in range(10)])
+        self.assertIsNone(M.load_packet_index(b"g" * 16))
+
+    def test_window_matches_a_full_scan(self) -> None:
+        for start, end in ((0, 100), (3.2, 7.0), (4.0, 8.0), (19.5, 30), (9, 9)):
+            sub = self.table.window(start, end)
+            self.assertEqual(list(zip(sub.pts, sub.size)), self.brute_window(start, end))
+        self.table.keyframe_times()
+        sub = self.table.window(3.0, 11.0)
+        self.assertEqual(sub.keyframe_times(), [1.0, 3.0, 5.0, 7.0])
+        fresh = M.PacketTable(sub.pts, sub.size, sub.keyframe, sub.stream, 0, sub.start_time)
+        self.assertEqual(fresh.keyframe_times(), sub.keyframe_times())
+
+
+class JobJournalTest(unittest.TestCase):
+    settings = {"mode": "convert", "format": "mp4"}
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp.name)
+        self.source = self.root / "clip.mkv"
+        self.source.write_bytes(b"source" * 100)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def journal(self, **settings: object) -> M.JobJournal:
+        return M.JobJournal(self.root, {**self.settings, **settings})
+
+    def convert(self, output: pathlib.Path) -> str:
+        journal = self.journal()
+        fingerprint = journal.fingerprint(self.source)
+        journal.record(self.source, "started", fingerprint, output)
+        output.write_bytes(b"converted" * 100)
+        journal.record(self.source, "done", fingerprint, output, [M.SplitSegment(output, 0.0, 12.0)])
+        return fingerprint
+
+    def test_finished_job_is_skipped_until_its_output_changes(self) -> None:
+        output = self.root / "clip.mp4"
+        self.convert(output)
+        rerun = self.journal()
+        self.assertEqual(rerun.finished(self.source, rerun.fingerprint(self.source)), [output.resolve()])
+        self.assertEqual(rerun.reserved(self.source), output.resolve())
+        self.assertEqual(rerun.outputs(self.source), [(output.resolve(), 12.0)])
+        output.write_bytes(b"truncated")
+        self.assertIsNone(self.journal().finished(self.source, rerun.fingerprint(self.source)))
+
+    def test_other_settings_start_fresh(self) -> None:
+        self.convert(self.root / "clip.mp4")
+        rerun = self.journal(format="mkv")
+        self.assertIsNone(rerun.finished(self.source, rerun.fingerprint(self.source)))
+        self.assertIsNone(rerun.reserved(self.source))
+
+    def test_changed_source_is_redone(self) -> None:
+        self.convert(self.root / "clip.mp4")
+        self.source.write_bytes(b"edited" * 100)
+        rerun = self.journal()
+        self.assertIsNone(rerun.finished(self.source, rerun.fingerprint(self.source)))
+
+    def test_in_place_conversion_counts_as_finished(self) -> None:
+        # Same-extension replace: the converted file is written over the source.
+        fingerprint = self.journal().fingerprint(self.source)
+        journal = self.journal()
+        journal.record(self.source, "started", fingerprint, self.source)
+        self.source.write_bytes(b"converted" * 100)
+        journal.record(self.source, "done", fingerprint, self.source, [M.SplitSegment(self.source, 0.0, 12.0)])
+        rerun = self.journal()
+        self.assertEqual(rerun.finished(self.source, rerun.fingerprint(self.source)), [self.source.resolve()])
+
+    def test_converted_output_found_by_a_rescan_is_finished(self) -> None:
+        output = self.root / "clip.mp4"
+        self.convert(output)
+        rerun = self.journal()
+        self.assertEqual(rerun.finished(output, rerun.fingerprint(output)), [output.resolve()])
+
+    def test_recover_removes_half_written_output_only(self) -> None:
+        journal = self.journal()
+        output = self.root / "clip.mp4"
+        journal.record(self.source, "started", journal.fingerprint(self.source), output)
+        output.write_bytes(b"partial")
+        messages: list[str] = []
+        self.journal().recover(self.source, messages.append)
+        self.assertFalse(output.exists())
+        self.assertEqual(len(messages), 1)
+
+        journal.record(self.source, "started", journal.fingerprint(self.source), self.source)
+        self.journal().recover(self.source, messages.append)
+        self.assertTrue(self.source.exists())
+
+    def test_recover_clears_parts_of_an_interrupted_split(self) -> None:
+        parts = self.root / "clip"
+        parts.mkdir()
+        for name in ("Part_#001.mkv", ".clip.segments.csv", "notes.txt"):
+            (parts / name).write_bytes(b"x")
+        journal = self.journal()
+        journal.record(self.source, "started", journal.fingerprint(self.source), parts)
+        self.journal().recover(self.source, lambda _message: None)
+        self.assertEqual([path.name for path in parts.iterdir()], ["notes.txt"])
+
+    def test_torn_last_line_is_ignored(self) -> None:
+        output = self.root / "clip.mp4"
+        self.convert(output)
+        with (self.root / M.JOURNAL_NAME).open("a", encoding="utf-8") as handle:
+            handle.write('{"source": "trunc')
+        rerun = self.journal()
+        self.assertEqual(rerun.finished(self.source, rerun.fingerprint(self.source)), [output.resolve()])
+
+
+class SplitSourceResumeTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = pathlib.Path(self.tmp.name) / "src"
+        self.source.mkdir()
+        for name in ("a.mkv", "b.mkv"):
+            (self.source / name).write_bytes(name.encode() * 500)
+        self.output = pathlib.Path(self.tmp.name) / "out"
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def split(self) -> tuple[list[str], list[str]]:
+        hashed: list[str] = []
+        messages: list[str] = []
+        real = M.content_fingerprint
+
+        def fingerprint(path: pathlib.Path) -> bytes:
+            if path.parent == self.source:
+                hashed.append(threading.current_thread().name)
+            return real(path)
+
+        def fake_split(video: pathlib.Path, _size: float, out: pathlib.Path, **_kwargs: object) -> list:
+            out.mkdir(parents=True, exist_ok=True)
+            part = out / f"Part_#001{video.suffix}"
+            part.write_bytes(b"p")
+            return [M.SplitSegment(part, 0.0, 1.0)]
+
+        with mock.patch.object(M, "content_fingerprint", fingerprint), mock.patch.object(
+            M, "split_video", fake_split
+        ), mock.patch.object(M.GOVERNOR, "enabled", False):
+            M.split_source(self.source, 1, self.output, status_cb=messages.append, jobs=2)
+        return hashed, messages
+
+    def test_new_inputs_are_hashed_by_their_jobs(self) -> None:
+        hashed, _messages = self.split()
+        self.assertEqual(len(hashed), 2)
+        self.assertTrue(all(name.startswith("mm-io") for name in hashed))
+
+    def test_rerun_settles_unchanged_and_touched_inputs(self) -> None:
+        self.split()
+        hashed, messages = self.split()
+        self.assertEqual(hashed, [])
+        os.utime(self.source / "a.mkv", (1000.0, 1000.0))
+        hashed, messages = self.split()
+        self.assertEqual(len(hashed), 1)
+        self.assertIn("2 video(s) were already split by an earlier run and were skipped.", messages)
+
+
+class ManifestTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp.name)
+        self.options = M.ManifestOptions(self.root / "manifest" / "Show.json", "Show")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def output(self, name: str, size: int) -> pathlib.Path:
+        path = self.root / "out" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"v" * size)
+        return path
+
+    def test_single_and_split_episodes(self) -> None:
+        base = self.options.path.parent
+        single = M.manifest_episode("Ep 1", [(self.output("ep1.mp4", 100), 61.6)], base)
+        self.assertEqual(
+            single, {"title": "Ep 1", "src": "../out/ep1.mp4", "fileSizeBytes": 100, "durationSeconds": 62}
+        )
+        parts = [(self.output("Part_#001.mp4", 30), 10.0), (self.output("Part_#002.mp4", 20), None)]
+        split = M.manifest_episode("Ep 2", parts, base)
+        self.assertEqual((split["separated"], split["fileSizeBytes"], split["ItemfileSizeBytes"]), (1, 50, 50))
+        self.assertNotIn("durationSeconds", split)
+        self.assertEqual([entry["title"] for entry in split["sources"]], ["Part 1", "Part 2"])
+        self.assertEqual(split["sources"][0]["src"], "../out/Part_#001.mp4")
+
+    def test_fragment_round_trip_merges_by_title(self) -> None:
+        base = self.options.path.parent
+        self.options.path.parent.mkdir(parents=True)
+        self.options.path.write_text(
+            json.dumps(
+                {
+                    "title": "Old",
+                    "extra": "kept",
+                    "categories": [
+                        {"category": "Specials", "episodes": [{"title": "OVA", "fileSizeBytes": 5}]},
+                        {"category": "Season 1", "episodes": [{"title": "Ep 1", "fileSizeBytes": 1}]},
+                    ],
+                }
+            ),
+            encoding="utf-8",
+        )
+        first = M.manifest_episode("Ep 1", [(self.output("ep1.mp4", 100), 60.0)], base)
+        second = M.manifest_episode("Ep 2", [(self.output("ep2.mp4", 200), 90.0)], base)
+        M.write_manifest_fragment(self.options, [first, second])
+        data = json.loads(self.options.path.read_text(encoding="utf-8"))
+        self.assertEqual((data["title"], data["extra"]), ("Show", "kept"))
+        season = next(group for group in data["categories"] if group["category"] == "Season 1")
+        self.assertEqual(season["episodes"], [first, second])
+        self.assertEqual(data["totalFileSizeBytes"], 305)
+        self.assertNotIn("totalDurationSeconds", data)  # The OVA has no duration.
+
+        M.write_manifest_fragment(M.ManifestOptions(self.options.path, "", "Specials"), [])
+        self.assertEqual(json.loads(self.options.path.read_text(encoding="utf-8"))["title"], "Show")
+        self.assertEqual([path.name for path in base.iterdir()], ["Show.json"])
+
+    def test_total_duration_when_every_episode_has_one(self) -> None:
+        base = self.options.path.parent
+        episodes = [
+            M.manifest_episode(f"Ep {n}", [(self.output(f"ep{n}.mp4", 10), 30.4)], base) for n in (1, 2)
+        ]
+        M.write_manifest_fragment(self.options, episodes)
+        data = json.loads(self.options.path.read_text(encoding="utf-8"))
+        self.assertEqual((data["totalDurationSeconds"], data["categories"][0]["category"]), (60, "Season 1"))
+
+
+class RepairOversizeSegmentsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = pathlib.Path(self.tmp.name)
+        self.pattern = self.out / "Part_#%03d.mp4"
+        self.segments = []
+        for number, payload in enumerate((b"a" * 10, b"b" * 100, b"c" * 100), start=1):
+            path = pathlib.Path(str(self.pattern) % number)
+            path.write_bytes(payload)
+            self.segments.append(M.SplitSegment(path, (number - 1) * 10.0, number * 10.0))
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def repair(self) -> tuple[list[M.SplitSegment], int]:
+        return M.repair_oversize_segments(
+            self.out / "source.mp4",
+            self.segments,
+            {"Part_#002.mp4", "Part_#003.mp4"},
+            50,
+            self.pattern,
+            lambda _message: None,
+        )
+
+    def test_success_renumbers_contiguously(self) -> None:
+        with mock.patch.object(M, "run_ffmpeg_command", side_effect=lambda cmd, log: _write_pieces(cmd) or 0):
+            repaired, _suppressed = self.repair()
+        self.assertEqual([segment.path.name for segment in repaired], [f"Part_#{n:03d}.mp4" for n in range(1, 6)])
+        self.assertEqual(sorted(path.name for path in self.out.iterdir()), [s.path.name for s in repaired])
+        self.assertEqual(repaired[0].path.read_bytes(), b"a" * 10)
+
+    def test_failed_recut_keeps_originals(self) -> None:
+        calls = []
+
+        def fake(cmd: list[str], log: object) -> int:
+            calls.append(cmd)
+            if len(calls) == 2:
+                raise RuntimeError("ffmpeg failed")
+            _write_pieces(cmd)
+            return 0
+
+        with mock.patch.object(M, "run_ffmpeg_command", side_effect=fake):
+            with self.assertRaises(RuntimeError):
+                self.repair()
+        self.assertEqual(
+            {path.name: path.read_bytes() for path in self.out.iterdir()},
+            {"Part_#001.mp4": b"a" * 10, "Part_#002.mp4": b"b" * 100, "Part_#003.mp4": b"c" * 100},
+        )
+
+    def test_failed_rename_restores_parts(self) -> None:
+        real_rename = pathlib.Path.rename
+
+        def flaky_rename(path: pathlib.Path, target: pathlib.Path) -> pathlib.Path:
+            if pathlib.Path(target).name == "Part_#004.mp4":
+                raise OSError("disk full")
+            return real_rename(path, target)
+
+        with mock.patch.object(M, "run_ffmpeg_command", side_effect=lambda cmd, log: _write_pieces(cmd) or 0):
+            with mock.patch.object(pathlib.Path, "rename", flaky_rename):
+                with self.assertRaises(OSError):
+                    self.repair()
+        self.assertEqual(
+            {path.name: path.read_bytes() for path in self.out.iterdir()},
+            {"Part_#001.mp4": b"a" * 10, "Part_#002.mp4": b"b" * 100, "Part_#003.mp4": b"c" * 100},
+        )
+
+
+FAKE_FFMPEG = """#!{python}
+import sys, time
+for step in range(1, 5):
+    time.sleep(0.3)
+    print(f"out_time_us={{step * 1000000}}\\nprogress=continue", flush=True)
+print("progress=end", flush=True)
+"""
+
+
+FAKE_FFMPEG_MS = """#!{python}
+import sys, time
+for step in range({steps}):
+    time.sleep(0.3)
+    print(f"out_time_ms={{{advance} * 1000000}}\\nout_time=00:00:0{{{advance}}}.000000\\nprogress=continue", flush=True)
+print("progress=end", flush=True)
+"""
+
+
+class ProcessEngineTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = M.ProcessEngine(max_processes=1)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_lines_are_split_across_chunks_and_overlong_lines_dropped(self) -> None:
+        script = (
+            "import sys; w = sys.stdout.write; w('a' * 70000 + '\\n'); "
+            "w('x' * (2 * 1024 * 1024) + '\\n'); w('tail\\nlast')"
+        )
+        lines: list[str] = []
+        result = self.engine.run([sys.executable, "-c", script], stdout_line=lines.append)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual([len(line) for line in lines], [70000, 4, 4])
+        self.assertEqual(lines[1:], ["tail", "last"])
+
+    def test_stop_checks_run_off_the_loop_thread(self) -> None:
+        threads: list[str] = []
+
+        def check_stop() -> str:
+            threads.append(threading.current_thread().name)
+            return "enough"
+
+        result = self.engine.run(
+            [sys.executable, "-c", "import time; time.sleep(5)"], check_stop=check_stop, poll_interval=0.1
+        )
+        self.assertEqual(result.stop_reason, "enough")
+        self.assertTrue(threads and all(name.startswith("mm-pipe") for name in threads))
+
+    def test_slot_wait_does_not_count_as_stall(self) -> None:
+        fake = pathlib.Path(self.tmp.name) / "ffmpeg"
+        fake.write_text(FAKE_FFMPEG.format(python=sys.executable), encoding="utf-8")
+        fake.chmod(0o755)
+        errors: list[BaseException] = []
+
+        def encode() -> None:
+            try:
+                M.run_ffmpeg_command([str(fake), "-hide_banner", "-i", "in", "out"], lambda _message: None)
+            except BaseException as exc:  # noqa: BLE001
+                errors.append(exc)
+
+        with mock.patch.object(M, "ENGINE", self.engine), mock.patch.object(M.STALL_POLICY, "timeout", 1.0):
+            workers = [threading.Thread(target=encode) for _ in range(2)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        self.assertEqual(errors, [])
+
+    def fake_ffmpeg(self, steps: int, advance: str) -> list[str]:
+        fake = pathlib.Path(self.tmp.name) / "ffmpeg"
+        fake.write_text(FAKE_FFMPEG_MS.format(python=sys.executable, steps=steps, advance=advance), encoding="utf-8")
+        fake.chmod(0o755)
+        return [str(fake), "-hide_banner", "-i", "in", "out"]
+
+    def test_out_time_ms_counts_as_progress(self) -> None:
+        cmd = self.fake_ffmpeg(8, "step")
+        with mock.patch.object(M, "ENGINE", self.engine), mock.patch.object(M.STALL_POLICY, "timeout", 1.0):
+            self.assertEqual(M.run_ffmpeg_command(cmd, lambda _message: None), 0)
+
+    def test_stall_is_retried_once_then_reported(self) -> None:
+        cmd = self.fake_ffmpeg(8, "0")
+        logged: list[str] = []
+        with mock.patch.object(M, "ENGINE", self.engine), mock.patch.object(M.STALL_POLICY, "timeout", 1.0):
+            with self.assertRaises(M.FFmpegStalled) as caught:
+                M.run_ffmpeg_command(cmd, logged.append)
+        self.assertEqual(caught.exception.attempts, 2)
+        self.assertEqual(sum(message.startswith("Retrying once") for message in logged), 1)
+
+
+class BatchSchedulerTest(unittest.TestCase):
+    def test_classification_runs_off_the_submitting_thread(self) -> None:
+        probed = threading.Event()
+        release = threading.Event()
+        ran: list[tuple[str, str]] = []
+
+        def classify() -> str:
+            probed.set()
+            release.wait(5)
+            return M.BATCH_CPU
+
+        def job(name: str) -> str:
+            ran.append((name, threading.current_thread().name))
+            if name == "bad":
+                raise RuntimeError("encode failed")
+            return name
+
+        with mock.patch.object(M.GOVERNOR, "enabled", False), M.BatchScheduler(jobs=2) as scheduler:
+            scheduler.submit_classified(classify, job, "slow")
+            scheduler.submit_classified(lambda: M.BATCH_IO, job, "bad")
+            self.assertTrue(probed.wait(5))
+            release.set()
+            errors = scheduler.results()
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], RuntimeError)
+        self.assertEqual(
+            sorted((name, thread.split("_")[0]) for name, thread in ran), [("bad", "mm-io"), ("slow", "mm-cpu")]
+        )
+
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return M.struct.pack(">I4s", len(payload) + 8, kind) + payload
+
+
+class RelocateMoovTest(unittest.TestCase):
+    def test_offsets_on_both_sides_of_the_moov_follow_their_chunks(self) -> None:
+        ftyp = _box(b"ftyp", b"isom\0\0\0\0")
+        first = _box(b"mdat", b"A" * 64)
+        first_at = len(ftyp) + 8
+
+        def moov_with(offsets: list[int]) -> bytes:
+            stco = _box(b"stco", M.struct.pack(f">II{len(offsets)}I", 0, len(offsets), *offsets))
+            return _box(b"moov", _box(b"trak", _box(b"mdia", _box(b"minf", _box(b"stbl", stco)))))
+
+        second_at = len(ftyp) + len(first) + len(moov_with([0, 0])) + 8
+        data = ftyp + first + moov_with([first_at, second_at]) + _box(b"mdat", b"B" * 64)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / "clip.mp4"
+            path.write_bytes(data)
+            self.assertTrue(M.relocate_moov(path))
+            self.assertEqual([box.kind for box in M.read_top_level_boxes(path)], [b"ftyp", b"moov", b"mdat", b"mdat"])
+            moved = path.read_bytes()
+        stco = moved.index(b"stco")
+        offsets = M.struct.unpack_from(">2I", moved, stco + 12)
+        self.assertEqual([moved[offset : offset + 4] for offset in offsets], [b"AAAA", b"BBBB"])
+
+
+def _ebml(element_id: int, data: bytes) -> bytes:
+    """EBML element with an 8-byte size field."""
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + b"\x01" + len(data).to_bytes(7, "big") + data
+
+
+def _uint(value: int) -> bytes:
+    return value.to_bytes(4, "big")
+
+
+def _sample_mp4(video_fourcc: bytes = b"avc1") -> bytes:
+    pack = M.struct.pack
+
+    def trak(handler: bytes, entry: bytes, samples: int) -> bytes:
+        stbl = _box(b"stsd", pack(">II", 0, 1) + entry) + _box(b"stsz", pack(">III", 0, 1000, samples))
+        mdia = (
+            _box(b"mdhd", pack(">IIIII", 0, 0, 0, 1000, 10_000))
+            + _box(b"hdlr", pack(">II4s", 0, 0, handler) + bytes(12))
+            + _box(b"minf", _box(b"stbl", stbl))
+        )
+        return _box(b"trak", _box(b"mdia", mdia))
+
+    video_entry = pack(">I4s", 86, video_fourcc) + bytes(24) + pack(">HH", 640, 360) + bytes(50)
+    audio_entry = pack(">I4s", 36, b"ac-3") + bytes(16) + pack(">HHHHI", 2, 16, 0, 0, 48000 << 16)
+    moov = _box(b"mvhd", pack(">IIIII", 0, 0, 0, 600, 6000) + bytes(80))
+    moov += trak(b"vide", video_entry, 50) + trak(b"soun", audio_entry, 10)
+    return _box(b"ftyp", b"isom\0\0\0\0") + _box(b"moov", moov) + _box(b"mdat", b"m" * 64)
+
+
+def _sample_mkv() -> bytes:
+    picture = _ebml(0xE0, _ebml(0xB0, _uint(1920)) + _ebml(0xBA, _uint(1080)))
+    sound = _ebml(0xE1, _ebml(0xB5, M.struct.pack(">d", 48000.0)) + _ebml(0x9F, b"\x02"))
+    video = _ebml(0xAE, _ebml(0x83, b"\x01") + _ebml(0x86, b"V_MPEG4/ISO/AVC") + picture)
+    audio = _ebml(0xAE, _ebml(0x83, b"\x02") + _ebml(0x86, b"A_OPUS") + sound)
+    segment = (
+        _ebml(0x1549A966, _ebml(0x2AD7B1, _uint(1_000_000)) + _ebml(0x4489, M.struct.pack(">d", 12_000.0)))
+        + _ebml(0x1654AE6B, video + audio)
+        + _ebml(0x1941A469, _ebml(0x61A7, _ebml(0x466E, b"font.ttf")))
+        + _ebml(0x1F43B675, b"\xff" * 32)
+    )
+    return _ebml(0x1A45DFA3, _ebml(0x4282, b"matroska")) + _ebml(0x18538067, segment)
+
+
+class ContainerHeaderTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def write(self, name: str, data: bytes) -> pathlib.Path:
+        path = pathlib.Path(self.tmp.name) / name
+        path.write_bytes(data)
+        return path
+
+    def test_mp4_moov_is_read_natively(self) -> None:
+        probe = M.read_container_header(self.write("clip.mp4", _sample_mp4()))
+        self.assertEqual(probe.duration, 10.0)
+        self.assertEqual(
+            [(s["codec_type"], s["codec_name"]) for s in probe.streams], [("video", "h264"), ("audio", "ac3")]
+        )
+        video, audio = probe.streams
+        self.assertEqual((video["width"], video["height"], video["bit_rate"]), (640, 360, "40000"))
+        self.assertEqual((audio["channels"], audio["sample_rate"]), (2, "48000"))
+        self.assertEqual(probe.video_bit_rate, 40000)
+
+    def test_matroska_info_and_tracks_are_read_natively(self) -> None:
+        probe = M.read_container_header(self.write("clip.mkv", _sample_mkv()))
+        self.assertEqual(probe.duration, 12.0)
+        self.assertEqual(probe.format["format_name"], "matroska,webm")
+        self.assertEqual(
+            [(s["codec_type"], s["codec_name"]) for s in probe.streams],
+            [("video", "h264"), ("audio", "opus"), ("attachment", "none")],
+        )
+        self.assertEqual((probe.streams[0]["width"], probe.streams[0]["height"]), (1920, 1080))
+        self.assertEqual((probe.streams[1]["channels"], probe.streams[1]["sample_rate"]), (2, "48000"))
+
+    def test_unknown_codecs_and_junk_defer_to_ffprobe(self) -> None:
+        self.assertIsNone(M.read_container_header(self.write("odd.mp4", _sample_mp4(b"xxxx"))))
+        self.assertIsNone(M.read_container_header(self.write("junk.mkv", b"not a video" * 10)))
+        self.assertIsNone(M.read_container_header(self.write("cut.mkv", _sample_mkv()[:40])))
+        self.assertIsNone(M.read_container_header(self.write("empty.mp4", b"")))
+
+    def test_probe_header_prefers_cache_then_native_then_ffprobe(self) -> None:
+        native = self.write("clip.mkv", _sample_mkv())
+        odd = self.write("odd.mp4", _sample_mp4(b"xxxx"))
+        fallback = M.MediaProbe(str(odd), 1, 1, 3.0, {}, [])
+        with mock.patch.object(M, "PROBE_CACHE", M.ProbeCache(None)), mock.patch.object(
+            M, "probe_media", return_value=fallback
+        ) as probe_media:
+            self.assertEqual(M.probe_header(native).duration, 12.0)
+            self.assertIs(M.probe_header(odd), fallback)
+            stat = native.stat()
+            cached = M.MediaProbe(M._probe_cache_key(native), stat.st_size, stat.st_mtime_ns, 99.0, {}, [])
+            M.PROBE_CACHE.put(cached)
+            self.assertIs(M.probe_header(native), cached)
+        probe_media.assert_called_once_with(odd)
+
+
+class ResourceGovernorTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = mock.patch.object(M, "_cache_root", lambda: pathlib.Path(self.tmp.name))
+        self.cache.start()
+        self.governor = M.ResourceGovernor(enabled=True)
+        self.governor.cores = 16
+
+    def tearDown(self) -> None:
+        self.cache.stop()
+        self.tmp.cleanup()
+
+    def test_lone_encode_is_not_capped_by_its_own_load(self) -> None:
+        with mock.patch.object(M, "_load_average", return_value=16.0):
+            with self.governor.admit(M.BATCH_CPU):
+                self.assertIsNone(self.governor.thread_budget())
+
+    def test_parallel_encodes_share_idle_cores(self) -> None:
+        with mock.patch.object(M, "_load_average", return_value=0.0):
+            with self.governor.admit(M.BATCH_CPU, concurrency=2):
+                self.assertEqual(self.governor.thread_budget(), 8)
+
+    def test_enabled_by_default(self) -> None:
+        self.assertTrue(M.ResourceGovernor().enabled)
+
+    def test_peer_tickets_are_read_once_per_poll_outside_the_lock(self) -> None:
+        held: list[bool] = []
+
+        def peers() -> list[dict[str, object]]:
+            held.append(self.governor._cond._is_owned())  # type: ignore[attr-defined]
+            return []
+
+        with mock.patch.object(self.governor, "_peer_slots", side_effect=peers):
+            for _ in range(3):
+                with self.governor.admit(M.BATCH_CPU):
+                    pass
+        self.assertEqual(held, [False])
+
+    def test_ticket_of_reused_pid_is_discarded(self) -> None:
+        slots = pathlib.Path(self.tmp.name) / "slots"
+        slots.mkdir()
+        parent = os.getppid()
+        stale = slots / f"{parent}-1.json"
+        stale.write_text(json.dumps({"kind": M.BATCH_CPU, "threads": 16, "started": -1}), encoding="utf-8")
+        live = slots / f"{parent}-2.json"
+        live.write_text(
+            json.dumps({"kind": M.BATCH_CPU, "threads": 4, "started": M._process_start(parent)}), encoding="utf-8"
+        )
+        peers = self.governor._peer_slots()
+        self.assertEqual([peer["threads"] for peer in peers], [4])
+        self.assertFalse(stale.exists())
+
+
+class IterVideoFilesTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.tmp.name)
+        (self.root / "a").mkdir()
+        (self.root / "a" / "x.mkv").write_bytes(b"x")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def scan(self, outputs: frozenset[pathlib.Path] = frozenset()) -> list[str]:
+        found = M.iter_video_files(self.root, M.ScanFilter(recursive=True), [], outputs)
+        return sorted(path.relative_to(self.root).as_posix() for path in found)
+
+    def test_symlink_loop_is_scanned_once(self) -> None:
+        (self.root / "a" / "loop").symlink_to("..")
+        self.assertEqual(self.scan(), ["a/x.mkv"])
+
+    def test_symlinked_directory_is_followed(self) -> None:
+        (self.root / "b").symlink_to(self.root / "a")
+        self.assertEqual(len(self.scan()), 1)
+
+    def test_output_directory_is_not_scanned(self) -> None:
+        out = self.root / "out"
+        out.mkdir()
+        (out / "Part_#001.mkv").write_bytes(b"p")
+        (self.root / "a" / "x.mp4").write_bytes(b"c")
+        outputs = frozenset({out.resolve(), (self.root / "a" / "x.mp4").resolve()})
+        self.assertEqual(self.scan(outputs), ["a/x.mkv"])
+
+
+class StallReportingTest(unittest.TestCase):
+    def stall(self) -> M.FFmpegStalled:
+        return M.FFmpegStalled("FFmpeg stalled.", out_time=12.5, timeout=30.0, attempts=2)
+
+    def test_job_end_carries_stall_details(self) -> None:
+        stream = io.StringIO()
+        with mock.patch.object(M.EVENTS, "_stream", stream):
+            with self.assertRaises(M.FFmpegStalled):
+                with M.EVENTS.job("convert", pathlib.Path("in.mkv")):
+                    raise self.stall()
+        end = json.loads(stream.getvalue().splitlines()[-1])
+        self.assertEqual(
+            (end["status"], end["out_time"], end["timeout"], end["attempts"]), ("failed", 12.5, 30.0, 2)
+        )
+
+    def test_wrapped_stall_keeps_details_in_summary(self) -> None:
+        try:
+            try:
+                raise self.stall()
+            except M.FFmpegStalled as exc:
+                raise RuntimeError("Chunk 3 failed.") from exc
+        except RuntimeError as exc:
+            reason = M._failure_reason(exc)
+        self.assertIn("Chunk 3 failed.", reason)
+        self.assertIn("2 attempt(s), 30s timeout", reason)
+        self.assertEqual(M._failure_reason(self.stall()), "FFmpeg stalled.")
+
+
+class StderrCaptureTest(unittest.TestCase):
+    def test_events_mode_emits_each_line_once(self) -> None:
+        stream = io.StringIO()
+        with mock.patch.object(M.EVENTS, "_stream", stream):
+            capture = M.StderrCapture(M.EVENTS.log, (), job=7)
+            capture.feed("[h264 @ 0x1] corrupt macroblock")
+            capture.close(failed=False)
+        events = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([(event["event"], event.get("job")) for event in events], [("warning", 7)])
+
+    def test_text_mode_logs_each_line_once(self) -> None:
+        lines: list[str] = []
+        capture = M.StderrCapture(lines.append, ())
+        capture.feed("[h264 @ 0x1] corrupt macroblock")
+        self.assertEqual(lines, ["[h264 @ 0x1] corrupt macroblock"])
+
+    def test_spill_files_are_capped_and_pruned(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            logs = pathlib.Path(tmp) / "logs"
+            logs.mkdir()
+            for number in range(30):
+                old = logs / f"ffmpeg-old{number:02d}.log"
+                old.write_text("old\n", encoding="utf-8")
+                os.utime(old, (1000.0 + number, 1000.0 + number))
+            with mock.patch.object(M, "_cache_root", lambda: pathlib.Path(tmp)), mock.patch.object(
+                M, "FFMPEG_SPILL_MAX_BYTES", 4096
+            ):
+                capture = M.StderrCapture(lambda _message: None, (), tail_lines=2)
+                for number in range(2000):
+                    capture.feed(f"line {number}")
+                capture.close(failed=True)
+            self.assertEqual(list(logs.iterdir()), [capture.spill_path])
+            self.assertLess(capture.spill_path.stat().st_size, 4096 + 200)
+
+
+if __name__ == "__main__":
+    unittest.main()